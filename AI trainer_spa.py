@@ -1,227 +1,432 @@
 # Importing necessary Libraries
+import time
+
+# Start of the application, the startup time is measured from here
+started = time.perf_counter()
+
+import argparse
+import bisect
+import os
+import sys
 import threading
 from tkinter import *
 from tkinter.ttk import Progressbar
-from PIL import Image, ImageTk, ImageSequence
-import time
 from tkinter import filedialog
-import cv2
-import mediapipe as mp
-import math
-import numpy as np
-import pygame
 
-# Initializing pygame Module
-pygame.mixer.init()
+import assets
+from playback import DEFAULT_SPEED, PLAYBACK_SPEEDS, PlaybackClock
+
+# OpenCV, pygame and the pose modules (which import Mediapipe) take more than a second to import and the pose
+# model takes a while to create. They are loaded by load_engine() in the background while the menus are shown.
+engine_thread = None
+
+# Whether load_engine() finished, everything it creates is ready to be used
+engine_ready = False
+
+# Folder the landmark tracks of the Live sessions are recorded to with --record-dir, for replaying them later
+RECORDINGS_DIR = "./recordings"
+
+# Database the sessions shown on the Results screen are stored in, see session_store.py
+SESSIONS_DB = "./sessions.db"
+
 
-# Configuring the very First appearing Window
+def parse_options():
+    '''
+    This function reads the command line options of the trainer, which concern the cameras of the Live screen,
+    the instrumentation of the Video and Live loops and the results served to other displays.
+
+    '''
+
+    parser = argparse.ArgumentParser(description='AI Gym Trainer')
+    parser.add_argument('--cameras', nargs='+', default=['0'], metavar='SOURCE',
+                        help='capture sources of the Live screen, camera indices or video files standing in for '
+                             'cameras; several are analysed at once and shown in a grid (default: 0)')
+    parser.add_argument('--priority', type=float, nargs='+', metavar='P',
+                        help='share of the inference threads of every camera, in the same order (default: 1 for all)')
+    parser.add_argument('--overlay', action='store_true',
+                        help='show the frame rate and stage latencies over the picture (F3 toggles it)')
+    parser.add_argument('--metrics-file', metavar='PATH',
+                        help='write the loop metrics to this file every few seconds, as Prometheus text if it ends '
+                             'with .prom and as JSON otherwise')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='serve the loop metrics as Prometheus text on http://127.0.0.1:PORT/metrics')
+    parser.add_argument('--results-port', type=int, metavar='PORT',
+                        help='stream the results as JSON lines to the clients of 127.0.0.1:PORT')
+    parser.add_argument('--results-socket', metavar='PATH',
+                        help='stream the results as JSON lines to the clients of this UNIX socket')
+    parser.add_argument('--sessions-db', default=SESSIONS_DB, metavar='PATH',
+                        help=f'store the finished sessions in this SQLite database (default: {SESSIONS_DB})')
+    parser.add_argument('--record-dir', nargs='?', const=RECORDINGS_DIR, metavar='DIR',
+                        help=f'record the landmarks of every Live session into DIR for replaying them later, about '
+                             f'60 MB per camera and hour (DIR defaults to {RECORDINGS_DIR}; default: no recording)')
+
+    args = parser.parse_args()
+
+    # The inference threads are shared in proportion to the priorities, see multi_camera.py.
+    if args.priority is not None and len(args.priority) != len(args.cameras):
+        parser.error('--priority needs one value per camera')
+
+    if args.priority is not None and min(args.priority) <= 0:
+        parser.error('--priority values must be positive')
+
+    return args
+
+
+options = parse_options()
+
+# Configuring the only Window, every screen is a Frame shown inside it
 win = Tk()
 win.geometry("1000x600")
 win.title("AI Gym Trainer")
 
-# Initiating Pose Solutions of Mediapipe
-mp_pose = mp.solutions.pose
+# Frame of the screen currently shown
+screen = None
+
+# Pose Class with the default profile, it can be changed on the Live and Video screens
+pose_profile = None
+pose_video = None
+
+# Capture and inference threads of the Live screen, while it is open
+pipeline = None
+
+# Repetition counting state of the person in front of the camera or in the video
+counter = None
+
+# Landmark buffer reused by detect_pose for every frame of a video
+landmarks_buffer = None
+
+# Landmarks of the videos played before, a video played again is not analysed a second time
+landmark_cache = None
+
+# Landmarks of the video playing on the Video screen, recorded into the landmark cache
+video_track = None
+
+# Stage latencies and frame rate of the Video and Live loops, and whether they are shown over the picture
+video_metrics = None
+live_metrics = None
+overlay_shown = options.overlay
+
+# Name of the playback speed of the Video screen, see PLAYBACK_SPEEDS
+playback_speed = DEFAULT_SPEED
+
+# Server of the results streamed to other displays, see results_stream.py
+results_publisher = None
+
+# Store of the finished sessions, see session_store.py
+session_store = None
+
+
+def load_engine():
+    '''
+    This function imports the libraries needed to analyse frames, initializes pygame and creates the pose
+    model with the default profile.
+
+    '''
+
+    global cv2, pygame
+    global AdaptiveScheduler, detect_pose_adaptive, frame_budget, FrameDisplay, to_rgb, FpsMeter, LivePipeline
+    global POSE_PROFILES, pose_settings, create_pose, classify_pose, EXERCISES
+    global TRACK_EXTENSION, TrackWriter, read_track, track_metadata, create_smoother, RegionTracker
+    global pose_profile, pose_video, counter, landmarks_buffer, landmark_cache
+    global overlay_text, draw_pose, video_metrics, live_metrics, RepCounter, CameraGrid, CameraStream, open_streams
+    global open_source
+    global results_publisher, session_store, engine_ready
+
+    start = time.perf_counter()
+
+    import cv2
+    import pygame
+
+    from adaptive_inference import AdaptiveScheduler, detect_pose_adaptive, frame_budget
+    from exercises import EXERCISES
+    from frame_display import FrameDisplay, to_rgb
+    from instrumentation import MetricsFileWriter, StageMetrics, overlay_text, serve_metrics
+    from landmark_cache import LandmarkCache
+    from landmark_smoothing import create_smoother
+    from landmark_track import TRACK_EXTENSION, TrackWriter, read_track
+    from live_pipeline import FpsMeter, LivePipeline
+    from multi_camera import CameraGrid, CameraStream, open_source, open_streams
+    from pose_estimation import (POSE_PROFILES, RepCounter, pose_settings, create_landmarks, create_pose,
+                                 classify_pose, draw_pose)
+    from region_tracking import RegionTracker
+    from results_stream import NULL_PUBLISHER, ResultPublisher
+    from session_store import NULL_SESSION_STORE, SessionStore
+    from video_analysis import track_metadata
+
+    # Initializing pygame Module
+    pygame.mixer.init()
+
+    counter = RepCounter()
+    landmarks_buffer = create_landmarks()
+    landmark_cache = LandmarkCache()
+
+    pose_profile = pose_settings()
+    pose_video = create_pose(pose_profile)
+
+    video_metrics = StageMetrics('video')
+    live_metrics = StageMetrics('live')
+
+    if options.metrics_file:
+        MetricsFileWriter((video_metrics, live_metrics), options.metrics_file).start()
+
+    # A port which is taken or a socket which cannot be created only costs the metrics or the results served.
+    if options.metrics_port:
+        try:
+            serve_metrics((video_metrics, live_metrics), options.metrics_port)
+        except OSError as error:
+            print(f'Not serving the metrics on port {options.metrics_port}: {error}', file=sys.stderr)
+
+    results_publisher = NULL_PUBLISHER
+
+    if options.results_port is not None or options.results_socket:
+        try:
+            results_publisher = ResultPublisher(options.results_port, options.results_socket).start()
+        except OSError as error:
+            print(f'Not streaming the results: {error}', file=sys.stderr)
+
+    try:
+        session_store = SessionStore(options.sessions_db)
+    except (OSError, RuntimeError) as error:
+        print(f'Not storing the sessions: {error}', file=sys.stderr)
+        session_store = NULL_SESSION_STORE
+
+    engine_ready = True
+
+    print(f'Pose engine loaded in {time.perf_counter() - start:.2f} s', file=sys.stderr)
+
+
+def start_engine():
+    '''
+    This function starts loading the pose engine in a background thread.
+
+    '''
+
+    global engine_thread
+
+    engine_thread = threading.Thread(target=load_engine, name='load_engine', daemon=True)
+    engine_thread.start()
+
+
+def wait_for_engine():
+    '''
+    This function waits until the pose engine is loaded, it is called by the screens which analyse frames.
+
+    '''
+
+    if engine_ready:
+        return
+
+    win.title("Loading...")
+    win.config(cursor="watch")
+    win.update_idletasks()
 
+    engine_thread.join()
 
-def detect_pose(image, pose, display=True):
+    win.config(cursor="")
+
+    # Loading again in this thread if the background thread failed, so that the error is raised here.
+    if not engine_ready:
+        load_engine()
+
+
+def new_track(name, source):
     '''
-    This function performs pose detection on an image.
+    This function starts recording the landmark track of a Live session into the folder of --record-dir.
     Args:
-        image: The input image with a prominent person whose pose landmarks need to be detected.
-        pose: The pose setup function required to perform the pose detection.
-        display: A boolean value that is if set to true the function displays the original input image, the resultant image, 
-                 and the pose landmarks in 3D plot and returns nothing.
+        name: The beginning of the file name, which continues with the date and time.
+        source: The video file or the camera analysed in the session.
     Returns:
-        output_image: The input image with the detected pose landmarks drawn.
-        landmarks: A list of detected landmarks converted into their original scale.
+        track: The TrackWriter of the session, or None if the sessions are not recorded.
     '''
 
-    # Convert the image from BGR into RGB format.
-    imageRGB = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    if options.record_dir is None:
+        return None
+
+    os.makedirs(options.record_dir, exist_ok=True)
 
-    # Perform the Pose Detection.
-    results = pose.process(imageRGB)
+    path = os.path.join(options.record_dir, f'{name}-{time.strftime("%Y%m%d-%H%M%S")}{TRACK_EXTENSION}')
 
-    # Retrieve the height and width of the input image.
-    height, width, _ = image.shape
+    return TrackWriter(path, track_metadata(source, pose_profile))
 
-    # Check if any landmarks are detected.
-    if results.pose_landmarks:
-        landmarks = [(int(landmark.x * width), int(landmark.y * height), (landmark.z * width))
-                     for landmark in results.pose_landmarks.landmark]
 
-        # Return the output image and the found landmarks.
-        return image, landmarks
+def startup_finished():
+    '''
+    This function reports how long it took until the first screen was shown and ready for input.
+
+    '''
 
+    print(f'Menu ready after {time.perf_counter() - started:.2f} s', file=sys.stderr)
 
-def calculate_angle(landmark1, landmark2, landmark3):
+
+def show_screen(title):
     '''
-    This function calculates angle between three different landmarks.
+    This function replaces the screen shown in the window by a new, empty one.
     Args:
-        landmark1: The first landmark containing the x,y and z coordinates.
-        landmark2: The second landmark containing the x,y and z coordinates.
-        landmark3: The third landmark containing the x,y and z coordinates.
+        title: The title of the window while the new screen is shown.
     Returns:
-        angle: The calculated angle between the three landmarks.
+        screen: The Frame on which the widgets of the new screen are placed.
+    '''
+
+    global screen
+
+    # Stopping the loops (video, live stream, timer, gif) scheduled by the previous screen.
+    for after_id in win.tk.splitlist(win.tk.call('after', 'info')):
+        win.after_cancel(after_id)
+
+    if screen is not None:
+        screen.destroy()
+
+    screen = Frame(win, width=1000, height=600)
+    screen.place(x=0, y=0)
 
+    win.title(title)
+
+    return screen
+
+
+def change_profile(name):
     '''
+    This function switches the pose model profile (lite, full or heavy) chosen in the Model menu.
 
-    # Get the required landmarks coordinates.
-    x1, y1, _ = landmark1
-    x2, y2, _ = landmark2
-    x3, y3, _ = landmark3
+    '''
 
-    # Calculate the angle between the three points
-    angle = math.degrees(math.atan2(y3 - y2, x3 - x2) - math.atan2(y1 - y2, x1 - x2))
+    global pose_profile
+    global pose_video
+    global video_track
 
-    # Check if the angle is less than zero.
-    if angle < 0:
-        # Add 360 to the found angle.
-        angle += 360
+    # The landmarks of a video being played would be stored with the settings of another profile.
+    if video_track is not None:
+        video_track.discard()
+        video_track = None
 
-    # Return the calculated angle.
-    return angle
+    pose_profile = pose_settings(name)
+    new_pose = create_pose(pose_profile)
 
+    if isinstance(pipeline, CameraGrid):
+        # Every camera of the grid has a pose of its own, they all switch to the new profile.
+        pipeline.set_profile(pose_profile)
 
-# Initial Value of Reps and flags for updating the data
-reps = 0
-flag_1 = 0
-flag_2 = 0
-bar_1 = 0
-bar_2 = 0
-right_shoulder_per_1 = 0
-right_shoulder_per_2 = 0
+    if isinstance(pipeline, LivePipeline) and pipeline.worker.is_alive():
+        # The live worker is using the current pose, let it switch and close the old one itself.
+        pipeline.worker.set_pose(new_pose, pose_profile['scale'])
+    else:
+        pose_video.close()
 
+    pose_video = new_pose
 
-def classify_pose(landmarks, output_image, display=False):
+
+def show_overlay(window, metrics, x, y):
     '''
-    This function classifies yoga poses depending upon the angles of various body joints.
-    Args:
-        landmarks: A list of detected landmarks of the person whose pose needs to be classified.
-        output_image: A image of the person with the detected pose landmarks drawn.
-        display: A boolean value that is if set to true the function displays the resultant image with the pose label 
-        written on it and returns nothing.
-    Returns:
-        output_image: The image with the detected pose landmarks drawn and pose label written.
-        label: The classified pose label of the person in the output_image.
-        reps: Number of correct repetitions.
+    This function places the overlay showing the frame rate and the stage latencies of a loop on a screen. It is
+    refreshed twice a second while the screen is shown, and only visible while overlay_shown is true.
+
+    '''
+
+    overlay = Label(window, text='', bg='black', fg='white', font='Courier 10', justify=LEFT, anchor='nw')
+
+    def refresh():
+        if overlay_shown:
+            overlay.config(text=overlay_text(metrics.snapshot()))
+            overlay.place(x=x, y=y)
+        else:
+            overlay.place_forget()
+
+        window.after(500, refresh)
+
+    refresh()
+
+
+def toggle_overlay(event=None):
+    '''
+    This function shows or hides the instrumentation overlay, bound to the F3 key.
 
     '''
-    cv2.line(output_image, (landmarks[16][0], landmarks[16][1]), (landmarks[14][0], landmarks[14][1]), (255, 0, 0), 3)
-    cv2.line(output_image, (landmarks[12][0], landmarks[12][1]), (landmarks[14][0], landmarks[14][1]), (255, 0, 0), 3)
 
-    cv2.line(output_image, (landmarks[15][0], landmarks[15][1]), (landmarks[13][0], landmarks[13][1]), (0, 255, 0), 3)
-    cv2.line(output_image, (landmarks[13][0], landmarks[13][1]), (landmarks[11][0], landmarks[11][1]), (0, 255, 0), 3)
+    global overlay_shown
+
+    overlay_shown = not overlay_shown
 
-    cv2.circle(output_image, (landmarks[12][0], landmarks[12][1]), 10, (255, 0, 0), cv2.FILLED)
-    cv2.circle(output_image, (landmarks[12][0], landmarks[12][1]), 15, (0, 0, 255), 2)
 
-    cv2.circle(output_image, (landmarks[14][0], landmarks[14][1]), 10, (255, 0, 0), cv2.FILLED)
-    cv2.circle(output_image, (landmarks[14][0], landmarks[14][1]), 15, (0, 0, 255), 2)
+def profile_menu(window, x, y):
+    '''
+    This function places the Model menu choosing the pose profile on a window.
+    Returns:
+        profile_var: The variable of the menu, which has to be kept referenced.
+    '''
 
-    cv2.circle(output_image, (landmarks[16][0], landmarks[16][1]), 10, (255, 0, 0), cv2.FILLED)
-    cv2.circle(output_image, (landmarks[16][0], landmarks[16][1]), 15, (0, 0, 255), 2)
+    profile_var = StringVar(window, value=pose_profile['profile'])
 
-    cv2.circle(output_image, (landmarks[11][0], landmarks[11][1]), 10, (0, 255, 0), cv2.FILLED)
-    cv2.circle(output_image, (landmarks[11][0], landmarks[11][1]), 15, (0, 0, 255), 2)
+    menu = OptionMenu(window, profile_var, *POSE_PROFILES, command=change_profile)
+    menu.config(bg="white", fg="black", font="Times 14 bold", relief="groove")
+    menu.place(x=x, y=y, width=160, height=30)
 
-    cv2.circle(output_image, (landmarks[13][0], landmarks[13][1]), 10, (0, 255, 0), cv2.FILLED)
-    cv2.circle(output_image, (landmarks[13][0], landmarks[13][1]), 15, (0, 0, 255), 2)
+    return profile_var
 
-    cv2.circle(output_image, (landmarks[15][0], landmarks[15][1]), 10, (0, 255, 0), cv2.FILLED)
-    cv2.circle(output_image, (landmarks[15][0], landmarks[15][1]), 15, (0, 0, 255), 2)
 
-    # Initialize the label of the pose. It is not known at this stage.
-    global label
-    global color
-    label = 'WRONG'
-    global reps
-    global flag_1
-    global flag_2
-    color = "red"
-    global bar_1
-    global right_shoulder_per_1
-    global bar_2
-    global right_shoulder_per_2
+def change_exercise(name):
+    '''
+    This function switches the exercise chosen in the Exercise menu and starts counting from zero.
 
-    # Calculate the required angles.
-    # ----------------------------------------------------------------------------------------------------------------
+    '''
 
-    # Get the angle between the left shoulder, elbow and wrist points. 
-    left_elbow_angle = calculate_angle(landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value],
-                                       landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value],
-                                       landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value])
+    for each in live_counters():
+        each.set_exercise(name)
 
-    # Get the angle between the right shoulder, elbow and wrist points. 
-    right_elbow_angle = calculate_angle(landmarks[mp_pose.PoseLandmark.RIGHT_WRIST.value],
-                                        landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW.value],
-                                        landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value])
 
-    # Get the angle between the left elbow, shoulder and hip points. 
-    left_shoulder_angle = calculate_angle(landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value],
-                                          landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value],
-                                          landmarks[mp_pose.PoseLandmark.LEFT_HIP.value])
+def live_counters():
+    '''
+    This function returns the counters of the trainees of the Live screen, one per camera. The first one is
+    counter, which the Video screen, the timer and the results use.
 
-    # Get the angle between the right hip, shoulder and elbow points. 
-    right_shoulder_angle = calculate_angle(landmarks[mp_pose.PoseLandmark.RIGHT_HIP.value],
-                                           landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value],
-                                           landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW.value])
+    '''
 
-    # ----------------------------------------------------------------------------------------------------------------
+    return pipeline.counters if pipeline is not None else (counter,)
 
-    if (80 < (right_shoulder_angle) < 195):
 
-        bar_1 = np.interp((right_shoulder_angle), (105, 160), (0, 100))
-        right_shoulder_per_1 = np.interp(right_shoulder_angle, (90, 160), (0, 100))
+def change_speed(name):
+    '''
+    This function switches the playback speed chosen in the Speed menu, also for the video being played.
 
-        bar_2 = np.interp((right_shoulder_angle), (105, 160), (0, 100))
-        right_shoulder_per_2 = np.interp(right_shoulder_angle, (90, 160), (0, 100))
+    '''
 
-    elif (80 < (360 - right_shoulder_angle) < 195):
+    global playback_speed
 
-        bar_1 = np.interp((360 - right_shoulder_angle), (105, 160), (0, 100))
-        right_shoulder_per_1 = np.interp((360 - right_shoulder_angle), (90, 160), (0, 100))
+    playback_speed = name
 
-        bar_2 = np.interp((right_shoulder_angle), (105, 160), (0, 100))
-        right_shoulder_per_2 = np.interp(right_shoulder_angle, (90, 160), (0, 100))
+    if video_after is not None:
+        start_video_clock()
 
-    # Check if the both side arms are at 90 degrees.
-    if (((80 < left_shoulder_angle < 110) and (80 < right_shoulder_angle < 110)) or
-            ((80 < (360 - left_shoulder_angle) < 110) and (80 < (360 - right_shoulder_angle) < 110))):
 
-        # Check if shoulders are at the required angle.
-        if (((50 < left_elbow_angle < 110) and (50 < right_elbow_angle < 110)) or
-                ((50 < (360 - left_elbow_angle) < 110) and (50 < (360 - right_elbow_angle) < 110))):
-            label = 'CORRECT'
-            flag_1 = 1
+def speed_menu(window, x, y):
+    '''
+    This function places the Speed menu choosing the playback speed of the videos on a window.
+    Returns:
+        speed_var: The variable of the menu, which has to be kept referenced.
+    '''
 
-    elif (((110 < left_shoulder_angle < 195) and (110 < right_shoulder_angle < 195)) or
-          ((110 < (360 - left_shoulder_angle) < 195) and (110 < (360 - right_shoulder_angle) < 195))):
+    speed_var = StringVar(window, value=playback_speed)
 
-        # Check if shoulders are at the required angle.
-        if (((40 < left_elbow_angle < 195) and (40 < right_elbow_angle < 195)) or
-                ((40 < (360 - left_elbow_angle) < 195) and (40 < (360 - right_elbow_angle) < 195))):
-            label = 'CORRECT'
-            flag_2 = 1
+    menu = OptionMenu(window, speed_var, *PLAYBACK_SPEEDS, command=change_speed)
+    menu.config(bg="white", fg="black", font="Times 14 bold", relief="groove")
+    menu.place(x=x, y=y, width=160, height=30)
 
-    if flag_1 == 1 and flag_2 == 1 and update_reps == 1:
-        reps += 0.5
-        flag_1 = 0
-        flag_2 = 0
+    return speed_var
 
-    # ----------------------------------------------------------------------------------------------------------------
 
-    # Check if the pose is classified successfully
-    if label != 'WRONG':
-        # Update the color (to green) with which the label will be written on the image.
-        color = "green"
+def exercise_menu(window, x, y):
+    '''
+    This function places the Exercise menu choosing the exercise whose repetitions are counted on a window.
+    Returns:
+        exercise_var: The variable of the menu, which has to be kept referenced.
+    '''
 
-    # Return the output image and the classified label.
-    return output_image, label
+    exercise_var = StringVar(window, value=counter.exercise)
 
+    menu = OptionMenu(window, exercise_var, *EXERCISES, command=change_exercise)
+    menu.config(bg="white", fg="black", font="Times 14 bold", relief="groove")
+    menu.place(x=x, y=y, width=160, height=30)
 
-# Initiating the Pose Class
-pose_video = mp_pose.Pose(static_image_mode=False, min_detection_confidence=0.5, model_complexity=1)
+    return exercise_var
 
 
 def proceed():
@@ -231,19 +436,19 @@ def proceed():
 
     '''
 
-    win.destroy()  # Destroying the previous window
-
     global show_result
     global burnt
 
-    global reps
     global hours
     global minutes
     global seconds
     global flag_3
     global good
 
-    reps = 0
+    # The counter does not exist yet while the pose engine is still loading.
+    if counter is not None:
+        counter.reps = 0
+
     hours = 0
     minutes = 0
     seconds = 0
@@ -253,57 +458,38 @@ def proceed():
     flag_3 = 0
     good = 0
 
-    # Displaying the new window
+    # Displaying the new screen
     global root
-    root = Tk()
-    root.geometry("1000x600")
-    root.title("Main Menu")
-
-    im = PhotoImage(file="./asset/img/big-shoulders.png")
+    root = show_screen("Main Menu")
 
     can1 = Canvas(root, width=1000, height=600)
     can1.place(x=0, y=0)
-    can1.create_image(0, 0, image=im, anchor="nw")
+    can1.create_image(0, 0, image=assets.image("big-shoulders.png"), anchor="nw")
 
-    # Opening in Threading Mode to allow parallel execution
-    threading.Thread(target=gif).start()
+    # Guide gif, animated by the Tk event loop
+    gif()
 
     # Live Button
-    li_photo = PhotoImage(file="./asset/img/camera.png")
-
-    Label(image=li_photo)
-
-    li_btn = Button(root, image=li_photo, width=105, height=90, borderwidth=0, relief="groove", command=live_bt)
+    li_btn = Button(root, image=assets.image("camera.png"), width=105, height=90, borderwidth=0, relief="groove",
+                    command=live_bt)
 
     can1.create_window(30, 30, anchor="nw", window=li_btn)
 
     # Video Button 
-    vid_photo = PhotoImage(file="./asset/img/vid.png")
-
-    Label(image=vid_photo)
-
-    vid_btn = Button(root, image=vid_photo, width=130, height=130, borderwidth=0, relief="groove", command=video_btn)
+    vid_btn = Button(root, image=assets.image("vid.png"), width=130, height=130, borderwidth=0, relief="groove",
+                     command=video_btn)
     can1.create_window(280, 15, anchor="nw", window=vid_btn)
 
     # Set Goal Button
-    goal_photo = PhotoImage(file="./asset/img/set.png")
-
-    Label(image=goal_photo)
-
-    goal_btn = Button(root, image=goal_photo, width=135, height=135, borderwidth=0, relief="groove", command=set_goal)
+    goal_btn = Button(root, image=assets.image("set.png"), width=135, height=135, borderwidth=0, relief="groove",
+                      command=set_goal)
     can1.create_window(140, 140, anchor="nw", window=goal_btn)
 
-    root.mainloop()
-
 
 def set_goal():
-    root.destroy()  # Destroying previous window
-
-    # Configuring new window
+    # Configuring new screen
     global goal
-    goal = Tk()
-    goal.geometry("1000x600")
-    goal.title("Set Your Goal")
+    goal = show_screen("Set Your Goal")
 
     # Making global variables to access them in other functions as well
 
@@ -316,11 +502,9 @@ def set_goal():
     global sg
 
     # Widgets
-    ima = PhotoImage(file="./asset/img/target.png")  # Background Image
-
-    can3 = Canvas(goal, width=1000, height=600)  # Creating a Canvas for the window
+    can3 = Canvas(goal, width=1000, height=600)  # Creating a Canvas for the screen
     can3.place(x=0, y=0)
-    can3.create_image(0, 0, image=ima, anchor="nw")
+    can3.create_image(0, 0, image=assets.image("target.png"), anchor="nw")  # Background Image
 
     # Taking Name of user
     name = Entry(goal, width=30, bg="white", fg="black", relief='groove')
@@ -378,9 +562,8 @@ def set_goal():
     sets.bind("<Button-1>", clear_sets)  # Clearing the content on Single Click
 
     # Back Button
-    back_bt = PhotoImage(file="./asset/img/back.png")
-
-    back_btn = Button(goal, image=back_bt, borderwidth=0, width=110, height=50, relief="groove", command=goal_proceed)
+    back_btn = Button(goal, image=assets.image("back.png"), borderwidth=0, width=110, height=50, relief="groove",
+                      command=goal_proceed)
     can3.create_window(30, 490, anchor="nw", window=back_btn)
 
     # Clear Button
@@ -396,8 +579,6 @@ def set_goal():
     show_result = 1
     sg = 1
 
-    goal.mainloop()
-
 
 def done():
     global temp_name
@@ -409,6 +590,7 @@ def done():
     global minutes
     global seconds
     global count_repititions
+    global goal_duration
 
     temp_name = str(name.get())
     temp_weight = int(weight.get())
@@ -423,23 +605,13 @@ def done():
     minutes = int(temp_2[1])
     seconds = int(temp_2[2])
 
-    goal.destroy()
-
-    global root
-    root = Tk()
-    root.geometry("1x1")
+    # The timer counts these down, the goal is kept for the session store.
+    goal_duration = hours * 3600 + minutes * 60 + seconds
 
     live_bt()
 
 
 def goal_proceed():
-    goal.destroy()  # Destroying previous window
-
-    # Creating Temporary window
-    global win
-    win = Tk()
-    win.geometry("1x1")
-
     # Calling the Proceed Function
     proceed()
 
@@ -470,12 +642,6 @@ def clear_sets(e):
 
 
 def clear():
-    goal.destroy()
-
-    global root
-    root = Tk()
-    root.geometry("1x1")
-
     set_goal()
 
 
@@ -487,30 +653,39 @@ def video_btn():
     
     '''
 
-    root.destroy()  # Destrying previous window
+    wait_for_engine()
 
-    # Configuring New Window
+    # Configuring New Screen
     global browse_btn
     global video
     global can2
     global bro
+    global label1
+    global video_after
+    global video_frame
+    global video_rgb
+    global video_track
+    global profile_var
+    global exercise_var
+    global speed_var
 
-    video = Tk()
-    video.geometry("1000x600")
-    video.title("Choose Video")
+    # The video widgets are created when the first video is played.
+    label1 = None
+    video_after = None
+    video_track = None
 
-    # Widgets
-    ima = PhotoImage(file="./asset/img/browse_back.png")
+    # Buffers for the decoded frame and its RGB conversion, reused for every frame of every video.
+    video_frame = None
+    video_rgb = None
+
+    video = show_screen("Choose Video")
 
+    # Widgets
     can2 = Canvas(video, width=1000, height=600)
     can2.place(x=0, y=0)
-    can2.create_image(0, 0, image=ima, anchor="nw")
-
-    browse_photo = PhotoImage(file="./asset/img/browse.png")
+    can2.create_image(0, 0, image=assets.image("browse_back.png"), anchor="nw")
 
-    Label(image=browse_photo)
-
-    browse_btn = Button(video, image=browse_photo, width=120, height=110, borderwidth=0, relief="groove",
+    browse_btn = Button(video, image=assets.image("browse.png"), width=120, height=110, borderwidth=0, relief="groove",
                         command=browse)
     can2.create_window(420, 450, anchor="nw", window=browse_btn)
 
@@ -521,13 +696,16 @@ def video_btn():
                       command=back_video)
     back_btn.place(x=50, y=30, width=100, height=30)
 
-    video.mainloop()
+    profile_var = profile_menu(video, 100, 360)
+
+    exercise_var = exercise_menu(video, 100, 440)
+
+    speed_var = speed_menu(video, 100, 480)
 
 
 def browse():
     global vid
-    global reps
-    reps = 0
+    counter.reps = 0
 
     bro.config(text="Change Video")
 
@@ -544,115 +722,248 @@ def play_video():
     global w
     global h
     global label1
+    global video_rep
+    global video_lab
+    global video_rect
+    global video_per
+    global video_fps
+    global video_display
+    global video_meter
+    global video_scheduler
+    global video_track
+    global video_cached
+    global video_index
+    global video_smoother
+    global video_region
+
+    # Stop the previous video, if the user changed it while it was playing.
+    stop_video()
+
+    w = 400
+    h = 400
+
+    if label1 is None:
+        # The widgets are created once per screen and then only updated for every frame.
+        label1 = Label(video, width=w, height=h)
+        label1.place(x=300, y=30)
+
+        # Every frame is pasted into the same image of the label.
+        video_display = FrameDisplay(label1, (w, h))
+
+        video_rep = Label(video, text='Reps:\n00', bg="white", fg="black", font="Times 20 bold")
+        video_rep.place(x=100, y=140, width=160, height=70)
+
+        pos = Label(video, text='Posture:', bg="white", fg="black", font="Times 20 bold")
+        pos.place(x=100, y=250, width=160, height=35)
+
+        video_lab = Label(video, text='', bg='white', fg='red', font='Times 20 bold')
+        video_lab.place(x=100, y=300, width=160, height=30)
+
+        video_rect = Progressbar(video, orient=VERTICAL, length=200, mode="determinate")
+        video_rect.place(x=830, y=80, width=50, height=450)
+
+        video_per = Label(video, text='0%', bg="white", fg="black", font="Times 20 bold")
+        video_per.place(x=820, y=30, width=80, height=40)
 
-    frame_1 = Frame(video, width=400, height=400).place(x=300, y=30)
+        video_fps = Label(video, text='FPS: --', bg="white", fg="black", font="Times 14 bold")
+        video_fps.place(x=100, y=400, width=160, height=30)
+
+        back_btn = Button(video, text='Back', bg="White", fg="black", font="Times 14 bold", relief="groove",
+                          borderwidth=2, command=back_browse)
+        back_btn.place(x=50, y=30, width=100, height=30)
+
+        show_overlay(video, video_metrics, 300, 30)
 
     cap = cv2.VideoCapture(vid)
 
-    w = 400
-    h = 400
+    video_meter = FpsMeter()
+    video_metrics.reset()
+
+    start_video_clock()
+
+    # A video analysed before, by video_analysis.py or on this screen, is replayed from the landmark cache.
+    key = landmark_cache.key(vid, pose_profile, True)
+    cached = landmark_cache.lookup(key)
+
+    video_index = 0
+
+    # Smooths the jitter of the landmarks before the classification, with a new state for every video
+    video_smoother = create_smoother()
+
+    # The model only sees the region around the person, the first frame is searched whole
+    video_region = RegionTracker() if pose_profile['roi'] else None
 
-    label1 = Label(frame_1, width=w, height=h)
-    label1.place(x=300, y=30)
+    if cached is not None:
+        video_cached = read_track(cached)[1]
+        video_track = None
+    else:
+        video_cached = None
+
+        # The tracking state of the previous video would otherwise carry over into this one.
+        pose_video.reset()
+        video_track = landmark_cache.begin(key, track_metadata(vid, pose_profile))
+
+    video_clock.start()
 
     select_img()
 
-    back_btn = Button(video, text='Back', bg="White", fg="black", font="Times 14 bold", relief="groove", borderwidth=2,
-                      command=back_browse)
-    back_btn.place(x=50, y=30, width=100, height=30)
 
+def start_video_clock():
+    '''
+    This function paces the video to its frame rate at the chosen playback speed.
 
-def select_img():
-    _, frame = cap.read()
+    '''
 
-    frame = cv2.flip(frame, 1)
+    global video_clock
+    global video_scheduler
 
-    frame, landmarks = detect_pose(frame, pose_video, display=False)
+    speed = PLAYBACK_SPEEDS[playback_speed]
+    budget = frame_budget(cap)
 
-    if landmarks:
-        # Perform the Pose Classification.
-        frame, _ = classify_pose(landmarks, frame, display=False)
+    video_clock = PlaybackClock(budget, speed)
+    video_clock.start()
 
-    rep = Label(video, text=f'Reps:\n{int(reps):02}', bg="white", fg="black", font="Times 20 bold")
-    rep.place(x=100, y=140, width=160, height=70)
+    # Skips pose inference on some frames when it cannot keep up with the time per frame, which is shorter when
+    # the video is played faster and unlimited when it is played as fast as possible.
+    video_scheduler = AdaptiveScheduler(budget / speed if speed else float('inf'))
 
-    pos = Label(video, text='Posture:', bg="white", fg="black", font="Times 20 bold")
-    pos.place(x=100, y=250, width=160, height=35)
 
-    if label == 'CORRECT':
-        lab = Label(video, text=f'{label}', bg='white', fg='green', font='Times 20 bold')
-    else:
-        lab = Label(video, text=f'{label}', bg='white', fg='red', font='Times 20 bold')
+def stop_video():
+    '''
+    This function stops the video which is currently played, if any, and releases the file.
 
-    lab.place(x=100, y=300, width=160, height=30)
+    '''
 
-    rect = Progressbar(video, orient=VERTICAL, length=200, mode="determinate")
-    rect.place(x=830, y=80, width=50, height=450)
-    rect['value'] = bar_1
+    global video_after
+    global video_track
 
-    per = Label(video, text=f'{int(right_shoulder_per_1)}%', bg="white", fg="black", font="Times 20 bold")
-    per.place(x=820, y=30, width=80, height=40)
+    if video_after is not None:
+        video.after_cancel(video_after)
+        video_after = None
+        cap.release()
 
-    frame = cv2.resize(frame, (w, h))
+    # The landmarks of a video stopped before its end are not added to the cache.
+    if video_track is not None:
+        video_track.discard()
+        video_track = None
 
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
-    image = Image.fromarray(rgb)
-    finalImage = ImageTk.PhotoImage(image)
-    label1.configure(image=finalImage)
-    label1.image = finalImage
+def select_img():
+    global video_after
+    global video_frame
+    global video_rgb
+    global video_track
+    global video_index
 
-    video.after(2, select_img)
+    start = time.perf_counter()
+    measure = video_metrics.measure
 
+    with measure('read'):
+        ok, video_frame = cap.read(video_frame)
 
-def live_stream():
-    _, frame = cap.read()
+    # Stop at the end of the video, the whole video was analysed and its landmarks can be cached.
+    if not ok:
+        video_after = None
+        cap.release()
+
+        if video_track is not None:
+            video_track.commit()
+            video_track = None
+
+        return
+
+    # The only colour conversion of the frame, the model, the drawing and the display all use RGB.
+    with measure('to_rgb'):
+        video_rgb = to_rgb(video_frame, video_rgb)
+
+    timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+
+    with measure('detect'):
+        if video_cached is not None:
+            frame, landmarks = video_rgb, None
 
-    frame = cv2.flip(frame, 1)
+            if video_index < len(video_cached) and video_cached['detected'][video_index]:
+                landmarks = video_cached['landmarks'][video_index]
+        else:
+            frame, landmarks = detect_pose_adaptive(video_rgb, pose_video, video_scheduler, out=landmarks_buffer,
+                                                    scale=pose_profile['scale'], rgb=True, region=video_region)
 
-    frame, landmarks = detect_pose(frame, pose_video, display=False)
+            # Which frames are estimated depends on the load of the machine and the playback speed, only the
+            # landmarks of a video analysed frame by frame are the same every time and can be cached.
+            if video_track is not None and video_scheduler.estimated:
+                video_track.discard()
+                video_track = None
 
-    if landmarks:
+            if video_track is not None:
+                video_track.write(timestamp, landmarks)
+
+    video_index += 1
+
+    if video_smoother is not None:
+        with measure('smooth'):
+            landmarks = video_smoother.filter(landmarks, timestamp)
+
+    if landmarks is not None:
         # Perform the Pose Classification.
-        frame, _ = classify_pose(landmarks, frame, display=False)
+        with measure('classify'):
+            classify_pose(landmarks, frame, counter, display=False, draw=False)
 
-    pos = Label(live, text='Posture:', bg="white", fg="black", font="Times 20 bold")
-    pos.place(x=800, y=150, width=160, height=35)
+        with measure('draw'):
+            draw_pose(landmarks, frame, counter, rgb=True)
 
-    if label == 'CORRECT':
-        lab = Label(live, text=f'{label}', bg='white', fg='green', font='Times 20 bold')
-    else:
-        lab = Label(live, text=f'{label}', bg='white', fg='red', font='Times 20 bold')
+    with measure('widgets'):
+        video_rep.config(text=f'Reps:\n{int(counter.reps):02}')
 
-    lab.place(x=800, y=200, width=160, height=30)
+        video_lab.config(text=f'{counter.label}', fg=counter.color)
 
-    rect = Progressbar(live, orient=VERTICAL, length=200, mode="determinate")
-    rect.place(x=50, y=140, width=50, height=350)
-    rect['value'] = bar_2
+        video_rect['value'] = counter.bar
 
-    per = Label(live, text=f'{int(right_shoulder_per_2)}%', bg="white", fg="black", font="Times 20 bold")
-    per.place(x=30, y=120, width=80, height=40)
+        video_per.config(text=f'{int(counter.percent)}%')
 
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        video_fps.config(text=f'FPS: {video_meter.tick():.1f}')
 
-    image = Image.fromarray(rgb)
-    finalImage = ImageTk.PhotoImage(image)
-    label1.configure(image=finalImage)
-    label1.image = finalImage
+        results_publisher.frame('video', counter)
 
-    live.after(2, live_stream)
+    with measure('display'):
+        video_display.show(frame)
 
+    video_metrics.add('frame', time.perf_counter() - start)
+    video_metrics.tick()
 
-def back_browse():
-    global reps
+    video_after = video.after(video_clock.delay(), select_img)
 
-    video.destroy()
 
-    global root
-    root = Tk()
-    root.geometry("1x1")
+def live_stream():
+    '''
+    This function shows the newest result of the live pipeline. Capturing and pose inference run in
+    their own threads, so this only copies the frame into the label and updates the Tk widgets.
+
+    '''
+
+    if pipeline.show(live_display):
+        live_lab.config(text=f'{counter.label}', fg=counter.color)
+
+        live_rect['value'] = counter.bar
+
+        live_per.config(text=f'{int(counter.percent)}%')
+
+        live_fps.config(text=f'FPS: {pipeline.fps:.1f}')
+
+        counters = live_counters()
+
+        # The cameras are named like their recordings.
+        for index, each in enumerate(counters):
+            results_publisher.frame("live" if len(counters) == 1 else f"live{index}", each)
 
-    reps = 0
+    # Looking for a new result once per camera frame, minus the time spent on this one.
+    live.after(live_clock.delay(), live_stream)
+
+
+def back_browse():
+
+    stop_video()
+
+    counter.reps = 0
 
     video_btn()
 
@@ -667,43 +978,94 @@ def live_bt():
     any of the options given.
     
     '''
-    root.destroy()  # Destorying previous window
+    wait_for_engine()
 
-    # Configuring New Window
     global start_btn
     global live
-    live = Tk()
-    live.geometry("1000x600")
-    live.title("Live Trainer")
-
-    ima = PhotoImage(file="./asset/img/browse_back.png")
-
-    can2 = Canvas(live, width=1000, height=600)
-    can2.place(x=0, y=0)
-    can2.create_image(0, 0, image=ima, anchor="nw")
-
-    # Widgets
-
-    global cap
+    global pipeline
     global w
     global h
     global label1
-    global reps
+    global live_lab
+    global live_rect
+    global live_per
+    global live_fps
+    global live_display
+    global live_clock
+    global profile_var
+    global exercise_var
     global se
     global hours
     global minutes
     global seconds
 
-    frame_1 = Frame(live, width=600, height=400).place(x=170, y=90)
-
-    cap = cv2.VideoCapture(0)
-
     w = 600
     h = 400
 
-    label1 = Label(frame_1, width=w, height=h)
+    # Capturing and pose inference run in background threads, the window only shows their results.
+    live_metrics.reset()
+
+    try:
+        if len(options.cameras) > 1:
+            streams = open_streams(camera_stream, len(options.cameras))
+
+            pipeline = CameraGrid(streams, (w, h))
+            budget = frame_budget(streams[0].cap)
+        else:
+            source = options.cameras[0]
+            cap, camera = open_source(source)
+            budget = frame_budget(cap)
+
+            # A video file standing in for the camera is read at its frame rate, as in the grid.
+            pipeline = LivePipeline(cap, pose_video, counter, scale=pose_profile['scale'],
+                                    scheduler=AdaptiveScheduler(budget),
+                                    track=new_track("live", f"camera {source}" if camera else source),
+                                    smoother=create_smoother(), metrics=live_metrics,
+                                    region=RegionTracker() if pose_profile['roi'] else None,
+                                    clock=None if camera else PlaybackClock(budget))
+
+    except IOError as error:
+        # Staying on the menu, the cameras opened before the one which failed are closed again.
+        print(f'Could not start the Live screen: {error}', file=sys.stderr)
+        return
+
+    # Configuring New Screen
+    live = show_screen("Live Trainer")
+
+    can2 = Canvas(live, width=1000, height=600)
+    can2.place(x=0, y=0)
+    can2.create_image(0, 0, image=assets.image("browse_back.png"), anchor="nw")
+
+    # Widgets
+
+    label1 = Label(live, width=w, height=h)
     label1.place(x=170, y=90)
 
+    # Every frame is pasted into the same image of the label.
+    live_display = FrameDisplay(label1, (w, h))
+
+    # Posture widgets, created once and updated by live_stream()
+    pos = Label(live, text='Posture:', bg="white", fg="black", font="Times 20 bold")
+    pos.place(x=800, y=150, width=160, height=35)
+
+    live_lab = Label(live, text='', bg='white', fg='red', font='Times 20 bold')
+    live_lab.place(x=800, y=200, width=160, height=30)
+
+    live_rect = Progressbar(live, orient=VERTICAL, length=200, mode="determinate")
+    live_rect.place(x=50, y=140, width=50, height=350)
+
+    live_per = Label(live, text='0%', bg="white", fg="black", font="Times 20 bold")
+    live_per.place(x=30, y=120, width=80, height=40)
+
+    exercise_var = exercise_menu(live, 800, 370)
+
+    profile_var = profile_menu(live, 800, 410)
+
+    show_overlay(live, live_metrics, 170, 90)
+
+    live_fps = Label(live, text='FPS: --', bg="white", fg="black", font="Times 14 bold")
+    live_fps.place(x=800, y=445, width=160, height=25)
+
     start_btn = Button(live, text='START', bg="white", fg="black", font="Times 14 bold", relief="groove", borderwidth=5,
                        command=start)
     start_btn.place(x=400, y=520, width=160, height=55)
@@ -712,13 +1074,57 @@ def live_bt():
                       command=back)
     back_btn.place(x=30, y=20, width=100, height=30)
 
-    music_btn_img = PhotoImage(file="./asset/img/music.png")
-    music_btn = Button(live, image=music_btn_img, width=120, height=100, relief="groove", command=play_music)
+    music_btn = Button(live, image=assets.image("music.png"), width=120, height=100, relief="groove",
+                       command=play_music)
     can2.create_window(840, 480, anchor="nw", window=music_btn)
 
-    threading.Thread(target=live_stream).start()
+    live_clock = PlaybackClock(budget)
+
+    pipeline.start()
+    live_clock.start()
+    live_stream()
+
+
+def camera_stream(index):
+    '''
+    This function opens one camera of the Live screen, when several are used.
+    Args:
+        index: The position of the camera in the --cameras option.
+    Returns:
+        stream: The CameraStream of the camera, recording its landmarks if --record-dir is given.
+    '''
+
+    source = options.cameras[index]
+    priority = options.priority[index] if options.priority else 1
 
-    live.mainloop()
+    track = new_track(f"live{index}", source)
+
+    # Every camera has a pose and a counter of its own and they share the inference threads. The first camera
+    # is the one of the posture widgets, the timer and the results.
+    try:
+        return CameraStream(source, pose_profile, counter if index == 0 else RepCounter(counter.exercise), priority,
+                            metrics=live_metrics if index == 0 else None, track=track)
+
+    except BaseException:
+        # No recording is kept of a camera which could not be opened.
+        if track is not None:
+            track.close()
+            os.remove(track.path)
+
+        raise
+
+
+def stop_pipeline():
+    '''
+    This function stops the capture and inference threads of the Live screen when it is left.
+
+    '''
+
+    global pipeline
+
+    if pipeline is not None:
+        pipeline.stop()
+        pipeline = None
 
 
 def gif():
@@ -728,22 +1134,26 @@ def gif():
     '''
 
     # Widgets and Variables
-    global img
-
-    img = Image.open("./asset/img/Dumbbell_Shoulder_Press.gif")
     w8 = Label(root)
     w8.place(x=100, y=280, width=200, height=300)
 
-    # Iterating over the gif images
-    for img in ImageSequence.Iterator(img):
-        img = img.resize((200, 300))
-        img = ImageTk.PhotoImage(img)
-        w8.configure(image=img)
-        root.update()
-        time.sleep(0.3)
+    # The frames are decoded the first time the Main Menu is shown and reused afterwards.
+    w8.frames = assets.animation("Dumbbell_Shoulder_Press.gif", (200, 300))
+
+    show_gif_frame(w8, 0)
+
+
+def show_gif_frame(w8, index):
+    '''
+    This function shows one frame of the guide gif and schedules the next one after the frame's own duration.
+
+    '''
+
+    photo, duration = w8.frames[index]
+    w8.configure(image=photo)
 
-    # Calling trhe function again and again to show the gif continuously.
-    root.after(0, gif)
+    # Calling the function again and again to show the gif continuously.
+    w8.after(duration, show_gif_frame, w8, (index + 1) % len(w8.frames))
 
 
 def back():
@@ -751,12 +1161,8 @@ def back():
     This function displays a Back Button which if pressed will get the user to the previous window.
     
     '''
-    # Destroying current window and getting back to previous one.
-    cap.release()
-    global win
-    live.destroy()
-    win = Tk()
-    win.geometry("1x1")
+    # Stopping the camera and getting back to the previous screen.
+    stop_pipeline()
     pygame.mixer.music.stop()
     proceed()
 
@@ -766,13 +1172,8 @@ def back_video():
     This function displays a Back Button which if pressed will get the user to the previous window.
     
     '''
-    # Destroying current window and getting back to previous one.
-
-    video.destroy()
-
-    global win
-    win = Tk()
-    win.geometry("1x1")
+    # Stopping the video and getting back to the previous screen.
+    stop_video()
 
     proceed()
 
@@ -784,7 +1185,6 @@ seconds = 0
 flag_3 = 0
 flag_4 = 0
 first_time = 0
-update_reps = 1
 good = 0
 sg = 0
 
@@ -802,32 +1202,19 @@ def timer():
     global first_time
     global clock
     global burnt
-    global update_reps
     global se
     global temp_sets
-    global reps
     global good
     global sg
-
-    # Widgets
+    global set_started
 
     if first_time == 0:
         seconds_2 = seconds
         hours_2 = hours
         minutes_2 = minutes
 
-    w9 = Label(live, text='Time:', bg="white", fg="black", font="Times 25 bold")
-    w9.place(x=790, y=40, width=170, height=25)
-
-    if flag_3 == 0:
-        clock = Label(live, text='00:00:00', height=2, bg='white', fg='black', font='Times 20')
-
-    if flag_3 == 1:
-        clock = Label(live, text='00:00:00', height=2, bg='white', fg='black', font='Times 20')
-
-    clock.place(x=790, y=80, width=170, height=25)
-
-    clock.config(text=f'{hours:02}:{minutes:02}:{seconds:02}')
+    clock_text = f'{hours:02}:{minutes:02}:{seconds:02}'
+    clock.config(text=clock_text)
 
     if flag_4 == 0:
 
@@ -874,19 +1261,39 @@ def timer():
 
     if sg == 1:
 
-        if reps == temp_sets:
+        # A set is done once the reps of a set the user chose in the goal are reached.
+        if counter.reps == count_repititions:
             se += 1
-            reps = 0
+
+            # The set ends here, its reps and duration are stored with the session.
+            session_sets.append((int(counter.reps), first_time - set_started))
+            set_ends.append(time.perf_counter())
+            set_started = first_time
+
+            counter.reps = 0
 
         if se == temp_sets:
             good = 1
             results()
+            return
 
-        shw_g = Label(live, text=f'Sets:  {se}/{temp_sets}', bg="white", fg="green", font="Times 20 bold")
-        shw_g.place(x=200, y=30, width=120, height=30)
+        shw_g.config(text=f'Sets:  {se}/{temp_sets}')
+
+    timer_rep.config(text=f'Reps:\n\n{int(counter.reps):02}')
+
+    if first_time:
+        # The goal, and the weight the calories are computed from, are only known once the user set a goal.
+        goal = burnt_kcal = None
+
+        if sg == 1:
+            calories()
 
-    rep = Label(live, text=f'Reps:\n\n{int(reps):02}', bg="white", fg="black", font="Times 20 bold")
-    rep.place(x=800, y=300, width=160, height=100)
+            goal = temp_sets
+            burnt_kcal = round(burnt_calories, 2)
+
+        results_publisher.publish({'type': 'timer', 't': round(time.time(), 3),
+                                   'clock': clock_text, 'sets': se, 'goal': goal,
+                                   'calories': burnt_kcal}, key='timer')
 
     live.after(1000, timer)
 
@@ -899,10 +1306,56 @@ def start():
 
     # Setting as Global variables to retain the value of timer
     global flag_3
-    global reps
+    global flag_4
+    global first_time
+    global burnt
+    global burnt_calories
+    global vari
     global show_result
     global se
     global good
+    global clock
+    global shw_g
+    global timer_rep
+    global session_started
+    global session_clock
+    global session_ticks
+    global session_sets
+    global set_ends
+    global set_started
+
+    # Nothing of the timer is left from the session before, e.g. the goal duration it captures on its first tick,
+    # the sets done or a pause.
+    first_time = 0
+    flag_3 = flag_4 = 0
+    vari = 1
+    burnt = burnt_calories = 0
+    se = 0
+
+    for each in live_counters():
+        each.update_reps = 1
+
+    # The session starts with the timer, the ticks of the timer are the seconds of workout without the pauses.
+    session_started = time.time()
+    session_clock = time.perf_counter()
+    session_ticks = set_started = first_time
+    session_sets = []
+    set_ends = []
+    counter.rep_times.clear()
+
+    # Timer widgets, created once and updated every second by timer()
+    w9 = Label(live, text='Time:', bg="white", fg="black", font="Times 25 bold")
+    w9.place(x=790, y=40, width=170, height=25)
+
+    clock = Label(live, text='00:00:00', height=2, bg='white', fg='black', font='Times 20')
+    clock.place(x=790, y=80, width=170, height=25)
+
+    if sg == 1:
+        shw_g = Label(live, text=f'Sets:  {se}/{temp_sets}', bg="white", fg="green", font="Times 20 bold")
+        shw_g.place(x=200, y=30, width=120, height=30)
+
+    timer_rep = Label(live, text='Reps:\n\n00', bg="white", fg="black", font="Times 20 bold")
+    timer_rep.place(x=800, y=300, width=160, height=100)
 
     timer()
 
@@ -930,7 +1383,6 @@ def pause_resume():
     global vari
     global flag_4
     global root
-    global update_reps
 
     vari += 1
 
@@ -939,16 +1391,16 @@ def pause_resume():
 
         start_btn.configure(text="Resume")
 
-        update_reps = 0
+        for each in live_counters():
+            each.update_reps = 0
 
     if vari % 2 != 0:
         flag_4 = 0
 
         start_btn.configure(text="Pause")
 
-        update_reps = 1
-
-    timer()
+        for each in live_counters():
+            each.update_reps = 1
 
 
 def reset():
@@ -963,13 +1415,14 @@ def reset():
     global minutes
     global seconds
     global clock
-    global reps
 
     # Giving the initial value of Timer and Reps
     hours = 0
     minutes = 0
     seconds = 0
-    reps = 0
+
+    for each in live_counters():
+        each.reps = 0
 
 
 burnt_calories = 0
@@ -1001,14 +1454,12 @@ def results():
     
     '''
 
-    # Destroying the current window and initializing the Timer again.
-    live.destroy()
+    # Leaving the live screen and initializing the Timer again.
     pygame.mixer.music.stop()
 
     global hours
     global minutes
     global seconds
-    global reps
     global good
     global burnt_calories
     global result
@@ -1020,20 +1471,23 @@ def results():
     global stop_music
 
     calories()
-    # Configuring the Results Window
-    result = Tk()
-    result.geometry("1000x600")
-    result.title("Result")
 
-    cap.release()
+    results_publisher.publish({'type': 'results', 't': round(time.time(), 3),
+                               'reps': int(se * count_repititions + counter.reps), 'sets': se, 'goal': temp_sets,
+                               'calories': round(burnt_calories, 2), 'achieved': good == 1})
 
-    # Widgets
+    save_session()
+
+    # Configuring the Results Screen
+    result = show_screen("Result")
 
-    bg_img = PhotoImage(file="./asset/img/result.png")
+    stop_pipeline()
+
+    # Widgets
 
     can4 = Canvas(result, width=1000, height=600)
     can4.place(x=0, y=0)
-    can4.create_image(0, 0, image=bg_img, anchor="nw")
+    can4.create_image(0, 0, image=assets.image("result.png"), anchor="nw")
 
     if good == 1:
 
@@ -1063,7 +1517,8 @@ def results():
     w14 = Label(result, text='Total Reps:', bg="white", fg="black", font="Times 15 bold italic underline")
     w14.place(x=40, y=320, width=230, height=35)
 
-    w15 = Label(result, text=f'{int(se * count_repititions + reps):02}', bg="white", fg="black", font="Times 10 bold")
+    w15 = Label(result, text=f'{int(se * count_repititions + counter.reps):02}', bg="white", fg="black",
+                font="Times 10 bold")
     w15.place(x=300, y=330, width=50, height=25)
 
     cal = Label(result, text='Calories Burnt:', bg="white", fg="black", font="Times 15 bold italic underline")
@@ -1080,7 +1535,23 @@ def results():
     minutes = 0
     seconds = 0
 
-    result.mainloop()
+
+def save_session():
+    '''
+    This function hands the session shown on the Results screen to the session store, which writes it in the
+    background.
+
+    '''
+
+    # Every repetition belongs to the set which had not ended yet when it was counted.
+    rep_times = [(bisect.bisect_left(set_ends, at), round(at - session_clock, 3)) for at in counter.rep_times
+                 if at >= session_clock]
+
+    session_store.save({'user': temp_name, 'exercise': counter.exercise, 'started': session_started,
+                        'duration_s': first_time - session_ticks, 'goal_sets': temp_sets,
+                        'goal_reps': count_repititions, 'goal_duration_s': goal_duration, 'weight_kg': temp_weight,
+                        'sets': se, 'reps': int(se * count_repititions + counter.reps),
+                        'calories': burnt_calories, 'achieved': good == 1}, session_sets, rep_times)
 
 
 def main_menu():
@@ -1089,13 +1560,7 @@ def main_menu():
     
     '''
 
-    # Destroying the current window and Displaying the Main Window
-    result.destroy()
-
-    global win
-    win = Tk()
-    win.geometry("1x1")
-
+    # Displaying the Main Menu
     proceed()
 
 
@@ -1119,14 +1584,14 @@ def stop_song():
     stop_music.configure(text=" ", bg="black", fg="black", borderwidth=0, width=0, height=0)
 
 
-# Widgets of the First Window
+# Widgets of the First Screen
 
-pre_im = PhotoImage(file="./asset/img/pic.png")
+welcome = show_screen("AI Gym Trainer")
 
-can = Canvas(win, width=1000, height=600)
+can = Canvas(welcome, width=1000, height=600)
 can.place(x=0, y=0)
 
-can.create_image(0, 0, image=pre_im, anchor="nw")
+can.create_image(0, 0, image=assets.image("pic.png"), anchor="nw")
 
 can.create_text(480, 30, text="WELCOME", font="Times 30 bold", fill="sky blue")
 
@@ -1140,17 +1605,23 @@ can.create_text(420, 220, text="Supervisor:", font="Times 21 underline", fill="s
 
 can.create_text(410, 290, text="Ms. ZHONGYI XU ", font="Times 15 bold italic", fill="sky blue")
 
-pro_bt = PhotoImage(file="./asset/img/im.png")
-
-pro_bt_lab = Label(image=pro_bt)
-proceed_btn = Button(win, image=pro_bt, borderwidth=0, width=116, height=116, relief="raised", command=proceed)
+proceed_btn = Button(welcome, image=assets.image("im.png"), borderwidth=0, width=116, height=116, relief="raised",
+                     command=proceed)
 can.create_window(420, 370, anchor="nw", window=proceed_btn)
 
 from about import about
 
-about_button = Button(win, text='About Me', bg='black', fg='white', font='Times 13 bold', borderwidth=2,
+about_button = Button(welcome, text='About Me', bg='black', fg='white', font='Times 13 bold', borderwidth=2,
                       relief="raised", command=about)
 about_button.place(x=20, y=540, width=100, height=50)
 
+# Showing or hiding the frame rate and stage latencies on the Video and Live screens
+win.bind('<F3>', toggle_overlay)
+
+# Loading the pose engine while the user looks at the menus
+start_engine()
+
+win.after_idle(startup_finished)
+
 # Applying looping on main window
 win.mainloop()
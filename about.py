@@ -1,9 +1,10 @@
-from tkinter import Tk, Label
+from tkinter import Toplevel, Label
 
 
 def about():
 
-    about = Tk()
+    # A second window on top of the trainer, which keeps running behind it
+    about = Toplevel()
     about.geometry('1000x330')
     about.title('About Me')
 
@@ -24,6 +25,4 @@ def about():
                                                                              'Under the guidance my superviosr ZHONGYI XU, and a number of open-source python libraries encompassing OpenCV, Mediapipe, NumPy, Tkinter, Pillow etc.\n '
                                                                              'A long series of strivings and struggles are there in order to make the software efficient and methodical both in terms of pace and space.\n'
                                                                              'Future Horizons in this regard includes addition of some more exercises and stretches.')
-    description.place(x=0, y=20)
-
-    about.mainloop()
\ No newline at end of file
+    description.place(x=0, y=20)
\ No newline at end of file
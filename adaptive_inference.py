@@ -0,0 +1,178 @@
+'''
+Adaptive inference rate for the live and video loops.
+
+Pose inference is the slowest step of a frame. When it takes longer than the time between two frames,
+AdaptiveScheduler runs it only on every Nth frame and estimates the landmarks of the frames in between
+from the last two detections, so the skeleton, the posture label and the rep counter are still updated
+for every frame that is shown.
+
+For recorded videos, interpolate_landmarks fills the frames between two analysed frames exactly, which
+is used by the fast scan mode of video_analysis.
+'''
+
+# Importing necessary Libraries
+import math
+import time
+
+import cv2
+import numpy as np
+
+from pose_estimation import create_landmarks
+from region_tracking import detect_pose_region
+
+# Frame rate assumed when a camera or video does not report its own
+DEFAULT_FPS = 30
+
+
+def frame_budget(cap):
+    '''
+    This function returns the time available per frame of a capture source.
+    Args:
+        cap: An opened cv2.VideoCapture.
+    Returns:
+        budget: 1 / frame rate of the source in seconds.
+    '''
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+
+    return 1 / (fps if fps and fps > 0 else DEFAULT_FPS)
+
+
+class AdaptiveScheduler:
+    '''
+    This class decides for every frame whether pose inference runs, and estimates the landmarks otherwise.
+    '''
+
+    def __init__(self, frame_budget=1 / 30, max_stride=4, smoothing=0.8):
+        '''
+        Args:
+            frame_budget: The time in seconds available per frame, i.e. 1 / frame rate of the source.
+            max_stride: The largest number of frames per inference, however slow the inference is.
+            smoothing: The weight of the past in the moving average of the inference time.
+        '''
+
+        self.frame_budget = frame_budget
+        self.max_stride = max_stride
+        self.smoothing = smoothing
+
+        self.stride = 1
+        self.inference_time = 0.0
+
+        # Whether the landmarks of the last frame were estimated instead of detected
+        self.estimated = False
+
+        self._last = create_landmarks()
+        self._previous = create_landmarks()
+        self._estimate = create_landmarks()
+        self._detections = 0
+        self._gap = 1
+        self._skipped = 0
+
+    def should_infer(self):
+        '''
+        This function tells whether pose inference has to run on the current frame.
+        Returns:
+            A boolean value that is true when the frame has to be analysed by the model.
+        '''
+
+        # Without a person to follow, search on every frame.
+        if self._detections == 0:
+            return True
+
+        return self._skipped + 1 >= self.stride
+
+    def update(self, landmarks, seconds):
+        '''
+        This function records the result of a pose inference and adapts the stride.
+        Args:
+            landmarks: The landmarks returned by detect_pose, or None if no person was found.
+            seconds: The time the inference took.
+        '''
+
+        self.estimated = False
+
+        if self.inference_time == 0:
+            self.inference_time = seconds
+        else:
+            self.inference_time = self.smoothing * self.inference_time + (1 - self.smoothing) * seconds
+
+        self.stride = min(self.max_stride, max(1, math.ceil(self.inference_time / self.frame_budget)))
+
+        if landmarks is None:
+            self._detections = 0
+        else:
+            # Keep copies, the caller reuses its landmark buffer for the next frame.
+            self._previous, self._last = self._last, self._previous
+            self._last[:] = landmarks
+            self._detections += 1
+
+        self._gap = self._skipped + 1
+        self._skipped = 0
+
+    def estimate(self):
+        '''
+        This function estimates the landmarks of a frame on which inference is skipped, continuing the
+        motion between the last two detections.
+        Returns:
+            landmarks: An array of shape (33, 4) valid until the next call, or None if no person is followed.
+        '''
+
+        self._skipped += 1
+        self.estimated = True
+
+        if self._detections == 0:
+            return None
+
+        if self._detections == 1:
+            return self._last
+
+        # Move every landmark further at the speed it had between the last two detections.
+        np.subtract(self._last, self._previous, out=self._estimate)
+        self._estimate *= self._skipped / self._gap
+        self._estimate += self._last
+
+        return self._estimate
+
+
+def detect_pose_adaptive(image, pose, scheduler, out=None, scale=1.0, rgb=False, region=None):
+    '''
+    This function runs detect_pose when the scheduler asks for it, and estimates the landmarks otherwise.
+    Args:
+        image: The input image with a prominent person whose pose landmarks need to be detected.
+        pose: The pose setup function required to perform the pose detection.
+        scheduler: The AdaptiveScheduler of the stream.
+        out: The landmark buffer passed on to detect_pose.
+        scale: The inference downscale factor passed on to detect_pose.
+        rgb: Whether the image is already in RGB order, passed on to detect_pose.
+        region: The RegionTracker of the stream, or None to always analyse the whole image.
+    Returns:
+        output_image: The input image.
+        landmarks: The detected or estimated landmarks, or None if no person is followed.
+    '''
+
+    if not scheduler.should_infer():
+        return image, scheduler.estimate()
+
+    start = time.perf_counter()
+
+    image, landmarks = detect_pose_region(image, pose, region, out=out, scale=scale, rgb=rgb)
+
+    scheduler.update(landmarks, time.perf_counter() - start)
+
+    return image, landmarks
+
+
+def interpolate_landmarks(start, end, steps):
+    '''
+    This function linearly interpolates the landmarks of the frames between two analysed frames.
+    Args:
+        start: The landmarks of the first analysed frame, an array of shape (33, 4).
+        end: The landmarks of the next analysed frame, an array of shape (33, 4).
+        steps: The number of frames in between.
+    Returns:
+        landmarks: An array of shape (steps, 33, 4) with the landmarks of every frame in between.
+    '''
+
+    weights = (np.arange(1, steps + 1, dtype=np.float32) / (steps + 1))[:, None, None]
+
+    return start + (end - start) * weights
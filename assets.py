@@ -0,0 +1,62 @@
+'''
+Lazily loaded images of the trainer's screens.
+
+Every picture is read from the asset folder and converted into a Tk image the first time a screen needs it.
+The same image is then reused every time a screen is shown again, so switching screens never reads or
+decodes a file twice. The images belong to the window of the trainer, which has to exist before the first
+call and lives as long as the application.
+'''
+
+# Importing necessary Libraries
+import os
+from tkinter import PhotoImage
+
+from PIL import Image, ImageTk, ImageSequence
+
+# Folder holding the pictures of the screens
+IMAGE_DIR = './asset/img'
+
+# Images already loaded, by file name, and the frames of animations, by (file name, size)
+_images = {}
+_animations = {}
+
+
+def image(name):
+    '''
+    This function returns a picture of the asset folder, loading it only the first time it is asked for.
+    Args:
+        name: The file name of the picture, e.g. "camera.png".
+    Returns:
+        photo: The PhotoImage of the picture.
+    '''
+
+    photo = _images.get(name)
+
+    if photo is None:
+        photo = _images[name] = PhotoImage(file=os.path.join(IMAGE_DIR, name))
+
+    return photo
+
+
+def animation(name, size):
+    '''
+    This function returns the frames of an animated gif of the asset folder, decoding and resizing them only
+    the first time they are asked for.
+    Args:
+        name: The file name of the gif.
+        size: The (width, height) in pixels the frames are resized to.
+    Returns:
+        frames: A list of (PhotoImage, duration in milliseconds) tuples.
+    '''
+
+    key = (name, size)
+    frames = _animations.get(key)
+
+    if frames is None:
+        with Image.open(os.path.join(IMAGE_DIR, name)) as img:
+            frames = [(ImageTk.PhotoImage(frame.convert("RGBA").resize(size)), frame.info.get("duration", 300))
+                      for frame in ImageSequence.Iterator(img)]
+
+        _animations[key] = frames
+
+    return frames
@@ -0,0 +1,287 @@
+'''
+Parallel batch analysis of many recorded exercise videos.
+
+Every worker process owns its own Pose instance and its own repetition counter, so the videos are scored
+independently and the work scales with the number of cores.
+
+Recorded landmark tracks are scored too, by replaying them instead of analysing a video, so new angle thresholds
+can be checked against a whole archive in seconds.
+
+Usage:
+    python batch_analysis.py recordings/ extra_clip.mp4 -j 32 -o summary.csv --frames-dir frames/
+    python batch_analysis.py recordings/ --tracks-dir tracks/    (also record the landmarks of every video)
+    python batch_analysis.py tracks/ -o summary.csv    (replay the recorded tracks)
+    python batch_analysis.py recordings/ --cache    (only analyse the videos not analysed before)
+'''
+
+# Importing necessary Libraries
+import argparse
+import csv
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from exercises import DEFAULT_EXERCISE
+from landmark_smoothing import DEFAULT_SMOOTHING
+from landmark_track import TRACK_EXTENSION, TrackWriter, read_track
+from pose_estimation import RepCounter, create_pose, pose_settings
+from video_analysis import (add_cache_arguments, add_pose_arguments, analyse_video, analyse_video_cached,
+                            cache_from_arguments, replay_track, result_fields, settings_from_arguments, track_metadata)
+
+# File extensions picked up when a directory is given
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm', TRACK_EXTENSION)
+
+# Columns of the per-file summary
+SUMMARY_FIELDS = ('video', 'frames', 'reps', 'correct_frames', 'wrong_frames', 'no_pose_frames', 'seconds', 'fps',
+                  'profile', 'exercise', 'error')
+
+# Pose instance, pose settings and landmark cache of the current worker process, set once by init_worker
+_worker_pose = None
+_worker_settings = None
+_worker_cache = None
+
+
+def find_videos(paths):
+    '''
+    This function expands the given files and directories into a sorted list of video files.
+    Args:
+        paths: A list of video file paths and/or directories containing videos.
+    Returns:
+        videos: The list of video file paths found.
+    '''
+
+    videos = {}
+
+    for path in paths:
+        if os.path.isdir(path):
+            found = [os.path.join(folder, file) for folder, _, files in os.walk(path) for file in files
+                     if file.lower().endswith(VIDEO_EXTENSIONS)]
+        else:
+            found = [path]
+
+        # A video found twice, e.g. given on its own and inside its directory, is analysed once.
+        for video in found:
+            videos.setdefault(os.path.abspath(video), video)
+
+    return sorted(videos.values())
+
+
+def output_name(path):
+    '''
+    This function names the files written for a video, so that videos of the same name in different directories
+    do not overwrite each other's files.
+    Args:
+        path: The path of the video.
+    Returns:
+        name: The name of the video without its extension, followed by a short hash of its absolute path.
+    '''
+
+    digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:8]
+
+    return f'{os.path.splitext(os.path.basename(path))[0]}-{digest}'
+
+
+def init_worker(settings=None, cache=None):
+    '''
+    This function runs once in every worker process and creates the Pose instance of that process.
+    Args:
+        settings: The pose settings from pose_settings. The default profile is used if not given.
+        cache: The LandmarkCache shared by the workers, or None.
+
+    '''
+
+    global _worker_pose
+    global _worker_settings
+    global _worker_cache
+
+    _worker_cache = cache
+    _worker_settings = settings or pose_settings()
+    _worker_pose = create_pose(_worker_settings)
+
+
+def score_video(path, frames_dir=None, flip=True, sample_every=1, tracks_dir=None, smoothing=DEFAULT_SMOOTHING,
+                exercise=DEFAULT_EXERCISE):
+    '''
+    This function analyses one video, or replays one landmark track, inside a worker process and summarises the
+    result.
+    Args:
+        path: The path of the video or track file to be analysed.
+        frames_dir: A directory in which the per-frame CSV of the video is written, named by output_name, or None
+                    to skip it.
+        flip: A boolean value that is if set to true mirrors every frame the same way the Video screen does.
+        sample_every: Fast scan mode, see analyse_video.
+        tracks_dir: A directory in which the landmark track of the video is recorded, named by output_name, or None
+                    to skip it.
+        smoothing: The name of the filter smoothing the landmarks before the classification, see analyse_video.
+        exercise: The name of the exercise whose repetitions are counted.
+    Returns:
+        summary: A dictionary with the keys listed in SUMMARY_FIELDS.
+    '''
+
+    summary = dict.fromkeys(SUMMARY_FIELDS)
+    summary.update(video=path, frames=0, reps=0, correct_frames=0, wrong_frames=0, no_pose_frames=0,
+                   profile=_worker_settings['profile'], exercise=exercise)
+
+    start = time.perf_counter()
+
+    writer = None
+    output = None
+    track = None
+
+    counter = RepCounter(exercise)
+
+    name = output_name(path)
+
+    try:
+        if frames_dir:
+            output = open(os.path.join(frames_dir, name + '.csv'), 'w', newline='')
+            writer = csv.DictWriter(output, fieldnames=result_fields(exercise))
+            writer.writeheader()
+
+        if path.endswith(TRACK_EXTENSION):
+            # The profile the landmarks were recorded with
+            summary['profile'] = read_track(path)[0].get('settings', {}).get('profile')
+
+            rows = replay_track(path, counter, smoothing)
+        elif _worker_cache is not None:
+            rows = analyse_video_cached(path, _worker_cache, pose=_worker_pose, flip=flip, counter=counter,
+                                        settings=_worker_settings, sample_every=sample_every, smoothing=smoothing)
+        else:
+            if tracks_dir:
+                track = TrackWriter(os.path.join(tracks_dir, name + TRACK_EXTENSION),
+                                    track_metadata(path, _worker_settings, flip))
+
+            rows = analyse_video(path, pose=_worker_pose, flip=flip, counter=counter, settings=_worker_settings,
+                                 sample_every=sample_every, track=track, smoothing=smoothing)
+
+        for row in rows:
+            summary['frames'] += 1
+            summary['reps'] = row['reps']
+
+            if row['label'] == 'CORRECT':
+                summary['correct_frames'] += 1
+            elif row['label'] is None:
+                summary['no_pose_frames'] += 1
+            else:
+                summary['wrong_frames'] += 1
+
+            if writer:
+                writer.writerow(row)
+
+    except Exception as error:
+        # A broken file must not stop the rest of the batch.
+        summary['error'] = f'{type(error).__name__}: {error}'
+
+        # No track is kept of a video which could not be analysed.
+        if track:
+            track.close()
+            os.remove(track.path)
+            track = None
+
+    finally:
+        if output:
+            output.close()
+
+        if track:
+            track.close()
+
+    elapsed = time.perf_counter() - start
+
+    summary['seconds'] = round(elapsed, 3)
+    summary['fps'] = round(summary['frames'] / elapsed, 1) if elapsed else 0
+
+    return summary
+
+
+def analyse_batch(paths, workers=None, frames_dir=None, flip=True, settings=None, sample_every=1, tracks_dir=None,
+                  cache=None, smoothing=DEFAULT_SMOOTHING, exercise=DEFAULT_EXERCISE):
+    '''
+    This function scores many videos in parallel, one video per task, on a pool of worker processes.
+    Args:
+        paths: A list of video file paths and/or directories containing videos.
+        workers: The number of worker processes. Defaults to the number of CPU cores.
+        frames_dir: A directory in which the per-frame CSV of every video is written, or None to skip it.
+        flip: A boolean value that is if set to true mirrors every frame the same way the Video screen does.
+        settings: The pose settings from pose_settings used by every worker.
+        sample_every: Fast scan mode, see analyse_video.
+        tracks_dir: A directory in which the landmark track of every video is recorded, or None to skip it.
+        cache: A LandmarkCache from which the landmarks of videos analysed before are replayed, or None.
+        smoothing: The name of the filter smoothing the landmarks before the classification, see analyse_video.
+        exercise: The name of the exercise whose repetitions are counted in every video.
+    Returns:
+        A generator yielding the summary dictionary of every video as soon as it is finished.
+    '''
+
+    videos = find_videos(paths)
+
+    if not videos:
+        return
+
+    for folder in (frames_dir, tracks_dir):
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+    workers = min(workers or os.cpu_count() or 1, len(videos))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(settings, cache)) as executor:
+        futures = [executor.submit(score_video, video, frames_dir, flip, sample_every, tracks_dir, smoothing, exercise)
+                   for video in videos]
+
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score many exercise videos in parallel without the GUI.')
+    parser.add_argument('paths', nargs='+',
+                        help=f'video or {TRACK_EXTENSION} track files and/or directories containing them')
+    parser.add_argument('-j', '--workers', type=int, help='number of worker processes (default: CPU count)')
+    parser.add_argument('-o', '--output', help='CSV file for the per-video summary (default: standard output)')
+    parser.add_argument('--frames-dir', help='directory for the per-frame CSV of every video')
+    parser.add_argument('--tracks-dir', help='directory for the recorded landmark track of every video')
+    parser.add_argument('--no-flip', action='store_true', help='do not mirror the frames before analysis')
+    parser.add_argument('--sample-every', type=int, default=1, metavar='N',
+                        help='fast scan: run the pose model on every Nth frame only and interpolate the others')
+    add_cache_arguments(parser)
+    add_pose_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.cache and args.tracks_dir:
+        parser.error('--tracks-dir cannot be combined with --cache, the cache entries are landmark tracks already')
+
+    settings = settings_from_arguments(args)
+    cache = cache_from_arguments(args)
+
+    start = time.perf_counter()
+
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+
+    try:
+        writer = csv.DictWriter(output, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+
+        count = 0
+        frames = 0
+
+        for summary in analyse_batch(args.paths, args.workers, args.frames_dir, not args.no_flip, settings,
+                                     args.sample_every, args.tracks_dir, cache, args.smoothing, args.exercise):
+            writer.writerow(summary)
+            output.flush()
+
+            count += 1
+            frames += summary['frames']
+
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - start
+
+    print(f'{count} videos, {frames} frames in {elapsed:.1f} s '
+          f'({frames / elapsed if elapsed else 0:.1f} FPS overall)', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
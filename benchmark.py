@@ -0,0 +1,376 @@
+'''
+Benchmark of the per-frame hot path of the trainer.
+
+Replays a recorded video through every stage of a frame (decode, mirroring and colour conversion, pose
+detection, landmark smoothing, classification, drawing, resizing for the display and pasting into the Tk image)
+and a synthetic landmark stream through the smoother and the classifier alone, then reports latency percentiles
+per stage, the resulting FPS and the peak memory. The report can be written as JSON and compared with the report
+of an earlier release.
+
+Usage:
+    python benchmark.py -o bench.json
+    python benchmark.py --frames 100 --profile lite --compare bench.json
+'''
+
+# Importing necessary Libraries
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+from frame_display import FrameDisplay, to_rgb
+from landmark_smoothing import DEFAULT_SMOOTHING, SMOOTHING_FILTERS, create_smoother
+from pose_estimation import (POSE_PROFILES, DEFAULT_PROFILE, SHOULDER_PRESS_JOINTS, RepCounter, pose_settings,
+                             create_landmarks, create_pose, classify_pose, draw_arms, calculate_angles_batch)
+from region_tracking import RegionTracker, detect_pose_region
+
+# Size of the picture on the Video screen
+DISPLAY_SIZE = (400, 400)
+
+
+class StageTimer:
+    '''
+    This class collects the duration of every named stage of a frame.
+    '''
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    @contextmanager
+    def measure(self, stage):
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.samples[stage].append(time.perf_counter() - start)
+
+    def add(self, stage, seconds):
+        self.samples[stage].append(seconds)
+
+    def summary(self):
+        '''
+        This function summarises the collected durations.
+        Returns:
+            stages: A dictionary mapping every stage to its count and mean/p50/p90/p99/max latency in ms.
+        '''
+
+        stages = {}
+
+        for stage, samples in self.samples.items():
+            milliseconds = np.array(samples) * 1000
+            p50, p90, p99 = np.percentile(milliseconds, (50, 90, 99))
+
+            stages[stage] = {'count': len(samples), 'mean_ms': round(float(milliseconds.mean()), 4),
+                             'p50_ms': round(float(p50), 4), 'p90_ms': round(float(p90), 4),
+                             'p99_ms': round(float(p99), 4), 'max_ms': round(float(milliseconds.max()), 4)}
+
+        return stages
+
+
+def peak_rss_mb():
+    '''
+    This function returns the peak resident memory of the process in MB, or None where it is not available.
+
+    '''
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux reports kilobytes, macOS bytes.
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def tk_root():
+    '''
+    This function creates a hidden Tk root for the paste stage, or returns None without a display.
+
+    '''
+
+    try:
+        from tkinter import Tk, TclError
+    except ImportError:
+        return None
+
+    try:
+        root = Tk()
+    except TclError:
+        return None
+
+    root.withdraw()
+
+    return root
+
+
+def bench_video(path, settings, max_frames=None, tk=True, smoothing=DEFAULT_SMOOTHING):
+    '''
+    This function replays a video through every stage of the Video screen loop.
+    Args:
+        path: The path of the video file.
+        settings: The pose settings from pose_settings.
+        max_frames: The number of frames after which to stop, or None for the whole video.
+        tk: A boolean value that is if set to true also measures pasting the frame into the Tk image.
+        smoothing: The name of the landmark smoothing filter, see SMOOTHING_FILTERS.
+    Returns:
+        result: A dictionary with the stage summary, frame count and FPS of the whole loop.
+    '''
+
+    cap = cv2.VideoCapture(path)
+
+    if not cap.isOpened():
+        raise IOError(f'Could not open video: {path}')
+
+    root = tk_root() if tk else None
+
+    if root is not None:
+        from tkinter import Label
+
+    pose = create_pose(settings)
+    counter = RepCounter()
+    buffer = create_landmarks()
+    smoother = create_smoother(smoothing)
+    region = RegionTracker() if settings['roi'] else None
+    timer = StageTimer()
+
+    # The display buffers of the Video screen, reused for every frame
+    display = FrameDisplay(Label(root) if root is not None else None, DISPLAY_SIZE)
+    frame = None
+    rgb = None
+
+    frames = 0
+    start = time.perf_counter()
+
+    try:
+        while max_frames is None or frames < max_frames:
+            frame_start = time.perf_counter()
+
+            with timer.measure('decode'):
+                ok, frame = cap.read(frame)
+
+            if not ok:
+                break
+
+            with timer.measure('to_rgb'):
+                rgb = to_rgb(frame, rgb)
+
+            with timer.measure('detect_pose'):
+                _, landmarks = detect_pose_region(rgb, pose, region, out=buffer, scale=settings['scale'], rgb=True)
+
+            if smoother is not None:
+                timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+
+                with timer.measure('smooth'):
+                    landmarks = smoother.filter(landmarks, timestamp)
+
+            if landmarks is not None:
+                with timer.measure('classify_pose'):
+                    classify_pose(landmarks, rgb, counter, display=False, draw=False)
+
+                with timer.measure('draw'):
+                    draw_arms(landmarks, rgb, rgb=True)
+
+            with timer.measure('prepare'):
+                image = display.prepare(rgb)
+
+            if root is not None:
+                with timer.measure('paste'):
+                    display.photo.paste(image)
+
+            timer.add('frame', time.perf_counter() - frame_start)
+            frames += 1
+
+    finally:
+        cap.release()
+        pose.close()
+
+        if root is not None:
+            root.destroy()
+
+    elapsed = time.perf_counter() - start
+
+    return {'video': path, 'frames': frames, 'fps': round(frames / elapsed, 2) if elapsed else 0,
+            'paste_measured': root is not None, 'stages': timer.summary()}
+
+
+def synthetic_landmarks(frames, seed=0):
+    '''
+    This function generates a landmark stream of a person pressing both arms up and down, plus some noise.
+    Args:
+        frames: The number of frames to generate.
+        seed: The seed of the random noise.
+    Returns:
+        sequence: A float32 array of shape (frames, 33, 4).
+    '''
+
+    rng = np.random.default_rng(seed)
+
+    sequence = rng.normal(300, 50, (frames, 33, 4)).astype(np.float32)
+    sequence[..., 3] = 1
+
+    # One repetition every 60 frames: 0 with the elbows down at shoulder height, 1 with the arms stretched up.
+    phase = (1 - np.cos(np.arange(frames) * 2 * math.pi / 60)) / 2
+
+    for side, (shoulder, elbow, wrist, hip) in ((1, (11, 13, 15, 23)), (-1, (12, 14, 16, 24))):
+        x = 320 + side * 60
+        sequence[:, shoulder, :2] = (x, 200)
+        sequence[:, hip, :2] = (x, 400)
+        sequence[:, elbow, 0] = x + side * (80 - 60 * phase)
+        sequence[:, elbow, 1] = 200 - 100 * phase
+        sequence[:, wrist, 0] = x + side * (80 - 60 * phase)
+        sequence[:, wrist, 1] = 120 - 160 * phase
+
+    sequence[..., :2] += rng.normal(0, 1.5, (frames, 33, 2))
+
+    return sequence
+
+
+def bench_synthetic(frames, smoothing=DEFAULT_SMOOTHING):
+    '''
+    This function measures the classification stages alone on a synthetic landmark stream.
+    Args:
+        frames: The number of synthetic frames.
+        smoothing: The name of the landmark smoothing filter, see SMOOTHING_FILTERS.
+    Returns:
+        result: A dictionary with the stage summary and the reps counted.
+    '''
+
+    sequence = synthetic_landmarks(frames)
+    canvas = np.zeros((480, 640, 3), dtype=np.uint8)
+    counter = RepCounter()
+    smoother = create_smoother(smoothing)
+    timer = StageTimer()
+
+    for index, landmarks in enumerate(sequence):
+        if smoother is not None:
+            with timer.measure('smooth'):
+                landmarks = smoother.filter(landmarks, index / 30)
+
+        with timer.measure('classify_pose'):
+            classify_pose(landmarks, canvas, counter, display=False, draw=False)
+
+        with timer.measure('draw'):
+            draw_arms(landmarks, canvas)
+
+    with timer.measure('angles_batch'):
+        calculate_angles_batch(sequence, SHOULDER_PRESS_JOINTS)
+
+    return {'frames': frames, 'reps': counter.reps, 'stages': timer.summary()}
+
+
+def compare(report, baseline, tolerance):
+    '''
+    This function lists the stages which got slower than in a baseline report.
+    Args:
+        report: The report of this run.
+        baseline: The report of an earlier run.
+        tolerance: The allowed slowdown of the median latency, e.g. 0.1 for 10 %.
+    Returns:
+        regressions: A list of human readable lines, empty if nothing got slower.
+    '''
+
+    regressions = []
+
+    for section in ('video', 'synthetic'):
+        old_stages = baseline.get(section, {}).get('stages', {})
+
+        for stage, stats in report.get(section, {}).get('stages', {}).items():
+            old = old_stages.get(stage)
+
+            if old and old['p50_ms'] > 0 and stats['p50_ms'] > old['p50_ms'] * (1 + tolerance):
+                regressions.append(f'{section}/{stage}: p50 {old["p50_ms"]:.3f} ms -> {stats["p50_ms"]:.3f} ms')
+
+    return regressions
+
+
+def print_report(report):
+    for section in ('video', 'synthetic'):
+        if section not in report:
+            continue
+
+        print(f'\n{section}:', file=sys.stderr)
+        print(f'  {"stage":<14}{"count":>7}{"mean":>10}{"p50":>10}{"p90":>10}{"p99":>10}   (ms)', file=sys.stderr)
+
+        for stage, stats in report[section]['stages'].items():
+            print(f'  {stage:<14}{stats["count"]:>7}{stats["mean_ms"]:>10.3f}{stats["p50_ms"]:>10.3f}'
+                  f'{stats["p90_ms"]:>10.3f}{stats["p99_ms"]:>10.3f}', file=sys.stderr)
+
+    if 'video' in report:
+        print(f'\nvideo loop: {report["video"]["fps"]} FPS', file=sys.stderr)
+
+    print(f'peak memory: {report["peak_rss_mb"]} MB RSS', file=sys.stderr)
+
+    if report['peak_traced_mb'] is not None:
+        print(f'peak traced Python allocations: {report["peak_traced_mb"]} MB', file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the per-frame stages of the trainer.')
+    parser.add_argument('--video', default='./asset/vid/Shoulder_Press.mp4', help='video to replay')
+    parser.add_argument('--frames', type=int, help='stop the video after this many frames')
+    parser.add_argument('--synthetic-frames', type=int, default=3000, help='length of the synthetic stream')
+    parser.add_argument('--no-video', action='store_true', help='only run the synthetic landmark benchmark')
+    parser.add_argument('--no-tk', action='store_true', help='do not measure pasting the frame into the Tk image')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='also trace the peak of Python allocations (slows every stage down)')
+    parser.add_argument('--profile', choices=list(POSE_PROFILES), default=DEFAULT_PROFILE, help='pose model profile')
+    parser.add_argument('--smoothing', choices=list(SMOOTHING_FILTERS), default=DEFAULT_SMOOTHING,
+                        help='landmark smoothing filter')
+    parser.add_argument('--roi', action=argparse.BooleanOptionalAction,
+                        help='run the model on the region around the person only, overrides the profile')
+    parser.add_argument('-o', '--output', help='write the report as JSON to this file')
+    parser.add_argument('--compare', metavar='BASELINE', help='JSON report of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='allowed p50 slowdown for --compare (0.1 = 10%%)')
+    args = parser.parse_args(argv)
+
+    settings = pose_settings(args.profile, roi=args.roi)
+
+    report = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+              'platform': platform.platform(), 'opencv': cv2.__version__, 'numpy': np.__version__,
+              'settings': settings, 'smoothing': args.smoothing}
+
+    if args.trace_memory:
+        tracemalloc.start()
+
+    if not args.no_video:
+        report['video'] = bench_video(args.video, settings, args.frames, tk=not args.no_tk, smoothing=args.smoothing)
+
+    report['synthetic'] = bench_synthetic(args.synthetic_frames, args.smoothing)
+
+    report['peak_rss_mb'] = peak_rss_mb()
+    report['peak_traced_mb'] = None
+
+    if args.trace_memory:
+        report['peak_traced_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+        tracemalloc.stop()
+
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.tolerance)
+
+        for line in regressions:
+            print(f'REGRESSION {line}', file=sys.stderr)
+
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
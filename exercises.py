@@ -0,0 +1,235 @@
+'''
+Exercises classified by the trainer, described as data instead of code.
+
+An exercise is a table of the joint angles it looks at, the phases of a repetition as angle ranges of those
+joints, and the progress shown in the bar. Exercise compiles the table into index arrays once, so that
+classify_pose evaluates every phase of any exercise with the same handful of numpy operations per frame; an
+exercise with more joints or phases makes the arrays longer, not the loop.
+
+Every joint is a (first point, vertex, third point) triplet of Mediapipe landmark names. The triplets of the
+right side are written in the opposite order of the left side, so both sides measure their angles in the same
+direction of rotation. Whether that direction is clockwise depends on the side the person is seen from,
+therefore every requirement is also accepted with the angles mirrored (360 - angle), as long as all joints of
+the requirement are mirrored together.
+
+A phase is reached when all its requirements are met, the first phase reached is the posture shown as CORRECT,
+and a half repetition is counted each time all phases were reached since the last one.
+
+To add an exercise, add its table to EXERCISE_TABLES.
+'''
+
+# Importing necessary Libraries
+import mediapipe as mp
+import numpy as np
+
+PoseLandmark = mp.solutions.pose.PoseLandmark
+
+EXERCISE_TABLES = {
+    'shoulder_press': {
+        'joints': {
+            'left_elbow': ('left_shoulder', 'left_elbow', 'left_wrist'),
+            'right_elbow': ('right_wrist', 'right_elbow', 'right_shoulder'),
+            'left_shoulder': ('left_elbow', 'left_shoulder', 'left_hip'),
+            'right_shoulder': ('right_hip', 'right_shoulder', 'right_elbow'),
+        },
+        # Phase name: requirements, every requirement as ((joints), (lower, upper) bound of their angles)
+        'phases': {
+            'down': [(('left_shoulder', 'right_shoulder'), (80, 110)), (('left_elbow', 'right_elbow'), (50, 110))],
+            'up': [(('left_shoulder', 'right_shoulder'), (110, 195)), (('left_elbow', 'right_elbow'), (40, 195))],
+        },
+        # The joint shown in the progress bar, the angles it is shown for and the angles at 0 and 100 %
+        'progress': {'joint': 'right_shoulder', 'window': (80, 195), 'bar': (105, 160), 'percent': (90, 160)},
+        # The limbs drawn on the frame, the right one first
+        'limbs': (('right_wrist', 'right_elbow', 'right_shoulder'), ('left_wrist', 'left_elbow', 'left_shoulder')),
+    },
+    'squat': {
+        'joints': {
+            'left_knee': ('left_hip', 'left_knee', 'left_ankle'),
+            'right_knee': ('right_ankle', 'right_knee', 'right_hip'),
+            'left_hip': ('left_shoulder', 'left_hip', 'left_knee'),
+            'right_hip': ('right_knee', 'right_hip', 'right_shoulder'),
+        },
+        'phases': {
+            'down': [(('left_knee', 'right_knee'), (50, 110)), (('left_hip', 'right_hip'), (40, 130))],
+            'up': [(('left_knee', 'right_knee'), (160, 195)), (('left_hip', 'right_hip'), (150, 195))],
+        },
+        'progress': {'joint': 'right_knee', 'window': (40, 195), 'bar': (160, 90), 'percent': (170, 70)},
+        'limbs': (('right_ankle', 'right_knee', 'right_hip'), ('left_ankle', 'left_knee', 'left_hip')),
+    },
+    'curl': {
+        'joints': {
+            'left_elbow': ('left_shoulder', 'left_elbow', 'left_wrist'),
+            'right_elbow': ('right_wrist', 'right_elbow', 'right_shoulder'),
+        },
+        'phases': {
+            'down': [(('left_elbow', 'right_elbow'), (150, 195))],
+            'up': [(('left_elbow', 'right_elbow'), (15, 60))],
+        },
+        'progress': {'joint': 'right_elbow', 'window': (10, 195), 'bar': (150, 50), 'percent': (160, 40)},
+        'limbs': (('right_wrist', 'right_elbow', 'right_shoulder'), ('left_wrist', 'left_elbow', 'left_shoulder')),
+    },
+    'lateral_raise': {
+        'joints': {
+            'left_elbow': ('left_shoulder', 'left_elbow', 'left_wrist'),
+            'right_elbow': ('right_wrist', 'right_elbow', 'right_shoulder'),
+            'left_shoulder': ('left_elbow', 'left_shoulder', 'left_hip'),
+            'right_shoulder': ('right_hip', 'right_shoulder', 'right_elbow'),
+        },
+        'phases': {
+            'down': [(('left_shoulder', 'right_shoulder'), (0, 30)), (('left_elbow', 'right_elbow'), (140, 195))],
+            'up': [(('left_shoulder', 'right_shoulder'), (75, 110)), (('left_elbow', 'right_elbow'), (140, 195))],
+        },
+        'progress': {'joint': 'right_shoulder', 'window': (0, 120), 'bar': (20, 90), 'percent': (10, 90)},
+        'limbs': (('right_wrist', 'right_elbow', 'right_shoulder', 'right_hip'),
+                  ('left_wrist', 'left_elbow', 'left_shoulder', 'left_hip')),
+    },
+}
+
+DEFAULT_EXERCISE = 'shoulder_press'
+
+
+class Exercise:
+    '''
+    This class holds an exercise table compiled into the index arrays evaluated by match.
+    '''
+
+    def __init__(self, name, table):
+        '''
+        Args:
+            name: The name of the exercise.
+            table: The table of the exercise, see EXERCISE_TABLES.
+        '''
+
+        self.name = name
+        self.joint_names = list(table['joints'])
+        self.phase_names = list(table['phases'])
+
+        # (first, vertex, third) landmark indices of every joint, the input of calculate_angles
+        self.joints = np.array([landmark_indices(triplet) for triplet in table['joints'].values()])
+
+        # Landmark indices of the right and the left limb drawn on the frame
+        self.limbs = tuple(landmark_indices(limb) for limb in table['limbs'])
+
+        # Column names of the angles, e.g. in the results of video_analysis
+        self.angle_names = [f'{joint}_angle' for joint in self.joint_names]
+
+        # Every (joint, bound) check of every requirement of every phase in one flat array, grouped by requirement
+        # and the requirements grouped by phase, so each group can be reduced with one reduceat.
+        checks = []
+        requirement_starts = []
+        phase_starts = []
+
+        for requirements in table['phases'].values():
+            phase_starts.append(len(requirement_starts))
+
+            for joints, bounds in requirements:
+                requirement_starts.append(len(checks))
+                checks.extend((self.joint_names.index(joint), bounds) for joint in joints)
+
+        # The checks are done twice, on the angles as they are and on the mirrored angles, which follow them in
+        # the array the checks index, e.g. joint 1 mirrored is at len(joints) + 1.
+        joint_count = len(self.joint_names)
+        check_joints = [joint for joint, _ in checks]
+
+        self.check_joints = np.array(check_joints + [joint + joint_count for joint in check_joints])
+        self.check_lower = np.array([bounds[0] for _, bounds in checks] * 2, dtype=np.float64)
+        self.check_upper = np.array([bounds[1] for _, bounds in checks] * 2, dtype=np.float64)
+        self.requirement_starts = np.array(requirement_starts + [start + len(checks) for start in requirement_starts])
+        self.requirement_count = len(requirement_starts)
+        self.phase_starts = np.array(phase_starts)
+
+        progress = table['progress']
+
+        self.progress_joint = self.joint_names.index(progress['joint'])
+        self.progress_window = progress['window']
+        self.bar_range = ramp(progress['bar'])
+        self.percent_range = ramp(progress['percent'])
+
+    def match(self, angles):
+        '''
+        This function finds the phase the angles of a frame are in.
+        Args:
+            angles: The angles of the joints of the exercise, as returned by calculate_angles(landmarks, joints).
+        Returns:
+            phase: The index of the first phase whose requirements are all met, or None.
+        '''
+
+        # Every check with the angles as they are and with the angles mirrored.
+        checked = np.concatenate((angles, 360 - angles))[self.check_joints]
+        passed = (self.check_lower < checked) & (checked < self.check_upper)
+
+        # A requirement is met if all its checks pass in the same direction, a phase if all its requirements are.
+        met = np.logical_and.reduceat(passed, self.requirement_starts)
+        met = met[:self.requirement_count] | met[self.requirement_count:]
+        reached = np.logical_and.reduceat(met, self.phase_starts)
+
+        phase = reached.argmax()
+
+        return int(phase) if reached[phase] else None
+
+    def progress(self, angles):
+        '''
+        This function measures how far the current repetition got.
+        Args:
+            angles: The angles of the joints of the exercise.
+        Returns:
+            bar: The value of the progress bar between 0 and 100, or None if the angle is outside the window.
+            percent: The percentage shown next to the bar, or None as well.
+        '''
+
+        angle = float(angles[self.progress_joint])
+        lower, upper = self.progress_window
+
+        # The progress joint is measured in the direction in which it lies within the window.
+        if not lower < angle < upper:
+            angle = 360 - angle
+
+            if not lower < angle < upper:
+                return None, None
+
+        return interpolate(angle, self.bar_range), interpolate(angle, self.percent_range)
+
+
+def landmark_indices(names):
+    '''
+    This function returns the Mediapipe indices of landmarks given by name, e.g. 'left_elbow'.
+
+    '''
+
+    return [PoseLandmark[name.upper()].value for name in names]
+
+
+def ramp(angles):
+    '''
+    This function turns the angles at 0 and 100 % into increasing sample points, the way np.interp takes them.
+    Args:
+        angles: The (angle at 0 %, angle at 100 %) pair, in either order.
+    Returns:
+        xp: The angles in increasing order.
+        fp: The matching percentages.
+    '''
+
+    start, end = angles
+
+    return ((start, end), (0, 100)) if start < end else ((end, start), (100, 0))
+
+
+def interpolate(angle, ramp):
+    '''
+    This function maps an angle onto a ramp like np.interp, which is slower on a single number.
+
+    '''
+
+    (x0, x1), (f0, f1) = ramp
+
+    if angle <= x0:
+        return float(f0)
+
+    if angle >= x1:
+        return float(f1)
+
+    return (f1 - f0) / (x1 - x0) * (angle - x0) + f0
+
+
+# Every exercise compiled once when the module is imported
+EXERCISES = {name: Exercise(name, table) for name, table in EXERCISE_TABLES.items()}
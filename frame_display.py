@@ -0,0 +1,87 @@
+'''
+Display path of the camera and video frames, from OpenCV to a Tk label.
+
+A decoded frame is mirrored and converted from BGR into RGB once, into a reused buffer. Pose detection, the
+drawing of the arms and the display all work on that RGB frame. For the display it is resized into a
+preallocated buffer which a PIL image reads without copying, and pasted into the one PhotoImage of the label,
+instead of creating a new PIL image and a new PhotoImage for every frame.
+'''
+
+# Importing necessary Libraries
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+
+def to_rgb(frame, out=None, flip=True):
+    '''
+    This function mirrors a decoded frame, the same way the screens show it, and converts it from BGR into RGB.
+    Args:
+        frame: The BGR frame read from a cv2.VideoCapture.
+        out: The buffer the RGB frame is written to, reused as long as it has the shape of the frame.
+        flip: A boolean value that is if set to true mirrors the frame.
+    Returns:
+        rgb: The RGB frame, which is out unless a new buffer had to be allocated.
+    '''
+
+    if out is None or out.shape != frame.shape:
+        out = np.empty_like(frame)
+
+    if flip:
+        cv2.flip(frame, 1, dst=out)
+        cv2.cvtColor(out, cv2.COLOR_BGR2RGB, dst=out)
+    else:
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=out)
+
+    return out
+
+
+class FrameDisplay:
+    '''
+    This class shows RGB frames on a Tk label through a single PhotoImage, which is updated in place.
+    '''
+
+    def __init__(self, label, size):
+        '''
+        Args:
+            label: The Tk label showing the frames, or None to only prepare them (e.g. without a display).
+            size: The (width, height) in pixels the frames are shown at.
+        '''
+
+        width, height = size
+
+        self.size = size
+        self._resized = np.zeros((height, width, 3), dtype=np.uint8)
+        self._rgba = np.full((height, width, 4), 255, dtype=np.uint8)
+
+        # PIL only maps buffers with 4 bytes per pixel without copying them, hence the RGBA buffer.
+        self._image = Image.frombuffer('RGBA', size, self._rgba, 'raw', 'RGBA', 0, 1)
+
+        self.photo = None
+
+        if label is not None:
+            self.photo = ImageTk.PhotoImage('RGB', size)
+            label.configure(image=self.photo)
+            label.image = self.photo
+
+    def prepare(self, rgb):
+        '''
+        This function resizes an RGB frame into the display buffers.
+        Args:
+            rgb: The RGB frame, of any size.
+        Returns:
+            image: The PIL image of the display buffer, valid until the next call.
+        '''
+
+        cv2.resize(rgb, self.size, dst=self._resized)
+        cv2.cvtColor(self._resized, cv2.COLOR_RGB2RGBA, dst=self._rgba)
+
+        return self._image
+
+    def show(self, rgb):
+        '''
+        This function shows an RGB frame on the label.
+
+        '''
+
+        self.photo.paste(self.prepare(rgb))
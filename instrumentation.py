@@ -0,0 +1,317 @@
+'''
+Instrumentation of the frame loops of the trainer.
+
+Every loop (the Video screen, the Live screen) records how long each stage of a frame took, e.g. reading the
+frame, pose detection, classification, drawing and the display, into a StageMetrics. It keeps the durations of
+the last frames in fixed ring buffers, so measuring costs a few microseconds per stage and the memory
+does not grow however long the trainer runs. From those it reports the frame rate and the latency percentiles
+of every stage, and the resident memory of the process, which can be:
+
+    shown on the screen:           overlay_text
+    written to a file:             MetricsFileWriter, as JSON or as Prometheus text for a .prom file
+    scraped by Prometheus:         serve_metrics, http://127.0.0.1:<port>/metrics
+
+The metrics of the live loop are recorded from its capture and inference threads as well, so every method
+holds a lock.
+'''
+
+# Importing necessary Libraries
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Number of frames the rolling statistics are computed over
+WINDOW = 300
+
+# Seconds between two writes of the metrics file
+EXPORT_INTERVAL = 5
+
+# Latency quantiles reported for every stage
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Size of a memory page, for the resident memory read from /proc
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def resident_memory():
+    '''
+    This function returns the memory of the process which is in RAM, so its growth over a long session can be
+    followed in the metrics.
+    Returns:
+        bytes: The resident memory in bytes, or None where /proc/self/statm does not exist.
+    '''
+
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class StageMetrics:
+    '''
+    This class collects the duration of every stage of the frames of one loop, over a rolling window.
+    '''
+
+    def __init__(self, loop, window=WINDOW):
+        '''
+        Args:
+            loop: The name of the loop, e.g. 'video' or 'live'.
+            window: The number of most recent durations kept per stage.
+        '''
+
+        self.loop = loop
+        self.window = window
+
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        '''
+        This function forgets everything measured so far, e.g. when another video starts.
+
+        '''
+
+        with self._lock:
+            # Ring buffer of the last durations, number of durations ever added and their sum, by stage
+            self._samples = {}
+            self._counts = {}
+            self._totals = {}
+
+            # End times of the last frames, for the frame rate
+            self._frame_times = np.zeros(self.window)
+            self._frames = 0
+
+    @contextmanager
+    def measure(self, stage):
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def add(self, stage, seconds):
+        with self._lock:
+            samples = self._samples.get(stage)
+
+            if samples is None:
+                samples = self._samples[stage] = np.zeros(self.window)
+                self._counts[stage] = 0
+                self._totals[stage] = 0.0
+
+            samples[self._counts[stage] % self.window] = seconds
+            self._counts[stage] += 1
+            self._totals[stage] += seconds
+
+    def tick(self):
+        '''
+        This function is called once per finished frame, for the frame rate.
+
+        '''
+
+        with self._lock:
+            self._frame_times[self._frames % self.window] = time.perf_counter()
+            self._frames += 1
+
+    def snapshot(self):
+        '''
+        This function summarises the rolling window.
+        Returns:
+            snapshot: A dictionary with the loop name, the frame rate, the number of frames, the resident memory of
+                      the process in MB (None if unknown) and, for every stage, the total count and seconds and the
+                      mean/p50/p90/p99/max latency of the window in ms.
+        '''
+
+        with self._lock:
+            frames = self._frames
+            frame_times = self._frame_times[:min(frames, self.window)].copy()
+            samples = {stage: values[:min(self._counts[stage], self.window)].copy()
+                       for stage, values in self._samples.items()}
+            counts = dict(self._counts)
+            totals = dict(self._totals)
+
+        fps = 0.0
+
+        if len(frame_times) > 1:
+            span = frame_times.max() - frame_times.min()
+            fps = (len(frame_times) - 1) / span if span > 0 else 0.0
+
+        stages = {}
+
+        for stage, values in samples.items():
+            milliseconds = values * 1000
+            quantiles = np.quantile(milliseconds, QUANTILES)
+
+            stages[stage] = {'count': counts[stage], 'total_s': round(totals[stage], 6),
+                             'mean_ms': round(float(milliseconds.mean()), 4),
+                             'p50_ms': round(float(quantiles[0]), 4), 'p90_ms': round(float(quantiles[1]), 4),
+                             'p99_ms': round(float(quantiles[2]), 4), 'max_ms': round(float(milliseconds.max()), 4)}
+
+        memory = resident_memory()
+
+        return {'loop': self.loop, 'fps': round(fps, 2), 'frames': frames,
+                'rss_mb': None if memory is None else round(memory / 2 ** 20, 1), 'stages': stages}
+
+
+class NullMetrics:
+    '''
+    This class takes the place of a StageMetrics where nothing is measured.
+    '''
+
+    @contextmanager
+    def measure(self, stage):
+        yield
+
+    def add(self, stage, seconds):
+        pass
+
+    def tick(self):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+def overlay_text(snapshot):
+    '''
+    This function formats a snapshot as the few lines shown over the picture.
+
+    '''
+
+    lines = [f'{snapshot["loop"]}: {snapshot["fps"]:.1f} FPS', f'{"stage":<9}{"p50":>7}{"p90":>7}  ms']
+
+    if snapshot.get('rss_mb') is not None:
+        lines[0] += f', {snapshot["rss_mb"]:.0f} MB'
+
+    for stage, stats in snapshot['stages'].items():
+        lines.append(f'{stage:<9}{stats["p50_ms"]:>7.1f}{stats["p90_ms"]:>7.1f}')
+
+    return '\n'.join(lines)
+
+
+def prometheus_text(snapshots):
+    '''
+    This function formats snapshots in the text format scraped by Prometheus.
+    Args:
+        snapshots: The snapshots of the loops.
+    Returns:
+        text: The metrics, one per line.
+    '''
+
+    lines = ['# HELP trainer_fps Frames per second of the loop over the last frames.',
+             '# TYPE trainer_fps gauge']
+    lines += [f'trainer_fps{{loop="{snapshot["loop"]}"}} {snapshot["fps"]}' for snapshot in snapshots]
+
+    lines += ['# HELP trainer_frames_total Frames processed by the loop.',
+              '# TYPE trainer_frames_total counter']
+    lines += [f'trainer_frames_total{{loop="{snapshot["loop"]}"}} {snapshot["frames"]}' for snapshot in snapshots]
+
+    memory = resident_memory()
+
+    if memory is not None:
+        lines += ['# HELP trainer_resident_memory_bytes Memory of the trainer process which is in RAM.',
+                  '# TYPE trainer_resident_memory_bytes gauge',
+                  f'trainer_resident_memory_bytes {memory}']
+
+    lines += ['# HELP trainer_stage_seconds Latency of a stage of the loop, quantiles over the last frames.',
+              '# TYPE trainer_stage_seconds summary']
+
+    for snapshot in snapshots:
+        for stage, stats in snapshot['stages'].items():
+            labels = f'loop="{snapshot["loop"]}",stage="{stage}"'
+
+            for quantile, key in zip(QUANTILES, ('p50_ms', 'p90_ms', 'p99_ms')):
+                lines.append(f'trainer_stage_seconds{{{labels},quantile="{quantile}"}} {stats[key] / 1000:.7f}')
+
+            lines.append(f'trainer_stage_seconds_sum{{{labels}}} {stats["total_s"]}')
+            lines.append(f'trainer_stage_seconds_count{{{labels}}} {stats["count"]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsFileWriter(threading.Thread):
+    '''
+    This class writes the metrics of some loops to a file at a fixed interval, in a background thread.
+    '''
+
+    def __init__(self, metrics, path, interval=EXPORT_INTERVAL):
+        '''
+        Args:
+            metrics: The StageMetrics of the loops.
+            path: The file written, as Prometheus text if it ends with .prom and as JSON otherwise.
+            interval: The seconds between two writes.
+        '''
+
+        super().__init__(name='MetricsFileWriter', daemon=True)
+
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            self.write()
+
+    def write(self):
+        '''
+        This function writes the current metrics, replacing the file at once so a reader never sees half of it.
+
+        '''
+
+        snapshots = [metrics.snapshot() for metrics in self.metrics]
+
+        if self.path.endswith('.prom'):
+            text = prometheus_text(snapshots)
+        else:
+            text = json.dumps({'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'loops': snapshots}, indent=2)
+
+        temporary = f'{self.path}.tmp'
+
+        with open(temporary, 'w') as file:
+            file.write(text)
+
+        os.replace(temporary, self.path)
+
+
+def serve_metrics(metrics, port, host='127.0.0.1'):
+    '''
+    This function serves the metrics of some loops as Prometheus text on /metrics, in a background thread.
+    Args:
+        metrics: The StageMetrics of the loops.
+        port: The TCP port.
+        host: The address listened on, only the local machine by default.
+    Returns:
+        server: The running ThreadingHTTPServer.
+    '''
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+
+            body = prometheus_text([loop.snapshot() for loop in metrics]).encode()
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            # Every scrape would otherwise print a line.
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+
+    threading.Thread(target=server.serve_forever, name='serve_metrics', daemon=True).start()
+
+    return server
@@ -0,0 +1,181 @@
+'''
+Content-addressed cache of the landmarks of analysed videos.
+
+An entry is the landmark track of a whole video, stored under a key made from the SHA-256 of the video file,
+the pose settings, the Mediapipe version and the way the frames were analysed. Analysing or playing the same
+file again with the same settings replays the entry instead of running the pose model, whatever the file is
+called or wherever it was copied to. New entries only become visible once the whole video was analysed, and
+the least recently used entries are deleted when the cache grows beyond its size limit.
+'''
+
+# Importing necessary Libraries
+import hashlib
+import json
+import os
+
+import mediapipe as mp
+
+from landmark_track import MAGIC, TRACK_EXTENSION, TrackWriter
+
+# Default folder and size limit of the cache
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'ai_gym_trainer', 'landmarks')
+DEFAULT_MAX_MB = 1024
+
+# Size of the pieces in which video files are hashed
+HASH_CHUNK = 1024 * 1024
+
+
+def file_digest(path):
+    '''
+    This function returns the SHA-256 of the content of a file as a hex string.
+
+    '''
+
+    digest = hashlib.sha256()
+
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class PendingEntry(TrackWriter):
+    '''
+    This class writes a new cache entry into a temporary file, which becomes the entry when it is committed.
+    '''
+
+    def __init__(self, cache, key, metadata=None):
+        self.cache = cache
+        self.key = key
+
+        super().__init__(f'{cache.entry_path(key)}.{os.getpid()}.tmp', metadata)
+
+    def commit(self):
+        '''
+        This function closes the entry once every frame of the video was written and adds it to the cache.
+
+        '''
+
+        self.close()
+        os.replace(self.path, self.cache.entry_path(self.key))
+        self.cache.evict()
+
+    def discard(self):
+        '''
+        This function closes and deletes an entry which is incomplete, e.g. because the video was stopped.
+
+        '''
+
+        self.close()
+
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class LandmarkCache:
+    '''
+    This class finds and adds the landmark tracks of videos in a cache folder, which it keeps below a size limit.
+    '''
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_mb=DEFAULT_MAX_MB):
+        '''
+        Args:
+            directory: The cache folder, created if it does not exist.
+            max_mb: The size in MB beyond which the least recently used entries are deleted.
+        '''
+
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+
+        # SHA-256 of the files hashed before, by (path, size, modification time)
+        self._digests = {}
+
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, path, settings, flip=True, mode='every frame'):
+        '''
+        This function builds the cache key of a video analysed in a certain way.
+        Args:
+            path: The path of the video file.
+            settings: The pose settings from pose_settings. The name of the profile does not matter.
+            flip: A boolean value that is true if the frames are mirrored before the detection.
+            mode: How the frames are analysed, e.g. 'every frame' or 'every 3rd frame'. Only analyses which give
+                  the same landmarks every time may be cached, not those whose frames depend on the timing.
+        Returns:
+            key: A hex string.
+        '''
+
+        stat = os.stat(path)
+        file_id = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+
+        digest = self._digests.get(file_id)
+
+        if digest is None:
+            digest = self._digests[file_id] = file_digest(path)
+
+        analysis = {'settings': {name: value for name, value in settings.items() if name != 'profile'},
+                    'flip': bool(flip), 'mode': mode, 'mediapipe': mp.__version__, 'format': MAGIC.decode()}
+
+        return hashlib.sha256((digest + json.dumps(analysis, sort_keys=True)).encode()).hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key + TRACK_EXTENSION)
+
+    def lookup(self, key):
+        '''
+        This function finds an entry and marks it as the most recently used one.
+        Returns:
+            path: The path of the track file of the entry, or None if the cache has no such entry.
+        '''
+
+        path = self.entry_path(key)
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        return path
+
+    def begin(self, key, metadata=None):
+        '''
+        This function starts a new entry, which has to be committed or discarded at the end.
+        Returns:
+            entry: The PendingEntry, a TrackWriter.
+        '''
+
+        return PendingEntry(self, key, metadata)
+
+    def evict(self):
+        '''
+        This function deletes the least recently used entries until the cache is within its size limit.
+
+        '''
+
+        entries = []
+
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(TRACK_EXTENSION):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Another process evicted it at the same time.
+                pass
+
+            total -= size
@@ -0,0 +1,202 @@
+'''
+Temporal smoothing of the landmarks between pose detection and classification.
+
+The landmarks of a single frame jitter by a few pixels, more so with the lighter pose profiles, and
+classify_pose decides the posture and counts half repetitions from the angles of that single frame. Near a
+threshold the jitter makes the label flicker and can add or miss half repetitions. A smoother keeps the state
+of the previous frames and filters x, y and z of all 33 landmarks at once with a few numpy operations on
+preallocated buffers; the visibility is passed through unchanged.
+
+Two filters are available:
+    ema:      an exponential moving average with a fixed weight, simple but it always lags behind.
+    one-euro: the One Euro filter, which smooths strongly while a landmark stands still and follows it with
+              little lag while it moves fast.
+
+Usage:
+    smoother = create_smoother('one-euro')
+    landmarks = smoother.filter(landmarks, timestamp)
+'''
+
+# Importing necessary Libraries
+import math
+
+import numpy as np
+
+from pose_estimation import NUM_LANDMARKS
+
+# Smoothing filter used unless another one is chosen
+DEFAULT_SMOOTHING = 'one-euro'
+
+# Time between two frames assumed when the timestamps do not increase
+DEFAULT_INTERVAL = 1 / 30
+
+
+class ExponentialSmoother:
+    '''
+    This class smooths the landmarks of a stream with an exponential moving average.
+    '''
+
+    def __init__(self, alpha=0.5):
+        '''
+        Args:
+            alpha: The weight of the newest frame, between 0 (never moves) and 1 (no smoothing).
+        '''
+
+        self.alpha = alpha
+
+        self._value = np.zeros((NUM_LANDMARKS, 3), dtype=np.float32)
+        self._out = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+        self._started = False
+
+    def reset(self):
+        '''
+        This function forgets the previous frames, e.g. when the person was lost or a new video starts.
+
+        '''
+
+        self._started = False
+
+    def filter(self, landmarks, timestamp=None):
+        '''
+        This function smooths the landmarks of the next frame.
+        Args:
+            landmarks: The landmarks of the frame, an array of shape (33, 4), or None if no person was detected.
+            timestamp: The time of the frame in seconds, not needed by this filter.
+        Returns:
+            landmarks: The smoothed landmarks, valid until the next call, or None if landmarks is None.
+        '''
+
+        if landmarks is None:
+            self.reset()
+            return None
+
+        if self._started:
+            self._value += self.alpha * (landmarks[:, :3] - self._value)
+        else:
+            self._value[:] = landmarks[:, :3]
+            self._started = True
+
+        self._out[:, :3] = self._value
+        self._out[:, 3] = landmarks[:, 3]
+
+        return self._out
+
+
+class OneEuroSmoother:
+    '''
+    This class smooths the landmarks of a stream with the One Euro filter, whose cut-off frequency rises with
+    the speed of every landmark.
+    '''
+
+    def __init__(self, min_cutoff=1.0, beta=0.01, derivative_cutoff=1.0):
+        '''
+        Args:
+            min_cutoff: The cut-off frequency in Hz of a landmark standing still. Lower values remove more jitter.
+            beta: How fast the cut-off frequency rises with the speed of a landmark, in Hz per pixel per second.
+                  Higher values reduce the lag during fast movements.
+            derivative_cutoff: The cut-off frequency in Hz of the filtered speed.
+        '''
+
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.derivative_cutoff = derivative_cutoff
+
+        shape = (NUM_LANDMARKS, 3)
+
+        self._value = np.zeros(shape, dtype=np.float32)
+        self._speed = np.zeros(shape, dtype=np.float32)
+        self._delta = np.zeros(shape, dtype=np.float32)
+        self._alpha = np.zeros(shape, dtype=np.float32)
+        self._out = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+        self._timestamp = None
+
+    def reset(self):
+        '''
+        This function forgets the previous frames, e.g. when the person was lost or a new video starts.
+
+        '''
+
+        self._timestamp = None
+
+    def filter(self, landmarks, timestamp):
+        '''
+        This function smooths the landmarks of the next frame.
+        Args:
+            landmarks: The landmarks of the frame, an array of shape (33, 4), or None if no person was detected.
+            timestamp: The time of the frame in seconds.
+        Returns:
+            landmarks: The smoothed landmarks, valid until the next call, or None if landmarks is None.
+        '''
+
+        if landmarks is None:
+            self.reset()
+            return None
+
+        if self._timestamp is None:
+            self._value[:] = landmarks[:, :3]
+            self._speed[:] = 0
+        else:
+            interval = timestamp - self._timestamp
+
+            if interval <= 0:
+                interval = DEFAULT_INTERVAL
+
+            # Speed of every coordinate since the previous frame, smoothed with a fixed cut-off.
+            np.subtract(landmarks[:, :3], self._value, out=self._delta)
+            self._delta /= interval
+            self._delta -= self._speed
+            self._speed += smoothing_factor(interval, self.derivative_cutoff) * self._delta
+
+            # The faster a coordinate moves, the higher its cut-off: alpha = 1 / (1 + 1 / (2 pi cutoff interval)).
+            np.abs(self._speed, out=self._alpha)
+            self._alpha *= self.beta
+            self._alpha += self.min_cutoff
+            self._alpha *= 2 * math.pi * interval
+            np.divide(self._alpha, self._alpha + 1, out=self._alpha)
+
+            np.subtract(landmarks[:, :3], self._value, out=self._delta)
+            self._delta *= self._alpha
+            self._value += self._delta
+
+        self._timestamp = timestamp
+
+        self._out[:, :3] = self._value
+        self._out[:, 3] = landmarks[:, 3]
+
+        return self._out
+
+
+def smoothing_factor(interval, cutoff):
+    '''
+    This function returns the weight of a new sample in a low-pass filter with the given cut-off frequency.
+
+    '''
+
+    rate = 2 * math.pi * cutoff * interval
+
+    return rate / (rate + 1)
+
+
+# Smoothing filters by name, None means the landmarks are classified as they were detected
+SMOOTHING_FILTERS = {
+    'none': None,
+    'ema': ExponentialSmoother,
+    'one-euro': OneEuroSmoother,
+}
+
+
+def create_smoother(name=DEFAULT_SMOOTHING):
+    '''
+    This function creates the smoother of one stream or video.
+    Args:
+        name: The name of one of the SMOOTHING_FILTERS.
+    Returns:
+        smoother: A new smoother with its default settings, or None for 'none'.
+    '''
+
+    if name not in SMOOTHING_FILTERS:
+        raise ValueError(f'Unknown smoothing filter: {name} (choose from {", ".join(SMOOTHING_FILTERS)})')
+
+    smoother = SMOOTHING_FILTERS[name]
+
+    return smoother() if smoother is not None else None
@@ -0,0 +1,123 @@
+'''
+Landmark tracks: the landmarks found in every frame of a video or live session, recorded to disk.
+
+A track file starts with a small header (a magic string, its length and JSON metadata such as the source and
+the pose settings) followed by one fixed-size record per frame: the timestamp, the 33 x 4 landmarks (x, y, z in
+pixels and visibility) and whether a person was detected and whether the landmarks were interpolated. Records
+are appended as the frames arrive, so a session which ends abruptly keeps everything written so far, and
+read_track maps the records into memory instead of loading them.
+
+Usage:
+    with TrackWriter('session.lmt', {'source': 'camera'}) as track:
+        track.write(timestamp, landmarks)
+
+    metadata, records = read_track('session.lmt')
+'''
+
+# Importing necessary Libraries
+import json
+import os
+import struct
+
+import numpy as np
+
+from pose_estimation import NUM_LANDMARKS
+
+# File extension of track files
+TRACK_EXTENSION = '.lmt'
+
+# First bytes of every track file, the last digit is the version of the format
+MAGIC = b'LMTRACK1'
+
+# The records start at a multiple of this many bytes, so they are aligned when mapped into memory
+HEADER_ALIGNMENT = 64
+
+# One record per frame
+TRACK_DTYPE = np.dtype([('timestamp', '<f8'), ('landmarks', '<f4', (NUM_LANDMARKS, 4)), ('detected', 'u1'),
+                        ('interpolated', 'u1')], align=True)
+
+
+class TrackWriter:
+    '''
+    This class appends the landmarks of every frame of a session to a track file.
+    '''
+
+    def __init__(self, path, metadata=None):
+        '''
+        Args:
+            path: The path of the track file, which is overwritten if it exists.
+            metadata: A JSON serializable dictionary stored in the header, e.g. the source and the pose settings.
+        '''
+
+        self.path = path
+        self.frames = 0
+
+        # The record of the current frame, written to the file without copying
+        self._record = np.zeros(1, dtype=TRACK_DTYPE)
+
+        header = json.dumps(metadata or {}).encode('utf-8')
+        header += b' ' * (-(len(MAGIC) + 4 + len(header)) % HEADER_ALIGNMENT)
+
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC + struct.pack('<I', len(header)) + header)
+
+    def write(self, timestamp, landmarks, interpolated=False):
+        '''
+        This function appends the record of one frame.
+        Args:
+            timestamp: The position of the frame in the video or session in seconds.
+            landmarks: The landmarks of the frame, an array of shape (33, 4), or None if no person was detected.
+            interpolated: A boolean value that is true if the landmarks were interpolated instead of detected.
+
+        '''
+
+        record = self._record
+
+        record['timestamp'] = timestamp
+        record['detected'] = landmarks is not None
+        record['interpolated'] = interpolated
+
+        if landmarks is None:
+            record['landmarks'] = 0
+        else:
+            record['landmarks'] = landmarks
+
+        self._file.write(record.data)
+        self.frames += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_track(path):
+    '''
+    This function opens a track file.
+    Args:
+        path: The path of the track file.
+    Returns:
+        metadata: The dictionary stored in the header.
+        records: A read-only array of TRACK_DTYPE records, one per frame, mapped from the file.
+    '''
+
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'Not a landmark track: {path}')
+
+        length, = struct.unpack('<I', file.read(4))
+        metadata = json.loads(file.read(length))
+
+    offset = len(MAGIC) + 4 + length
+
+    # A record cut off by an abrupt end of the session is ignored.
+    frames = (os.path.getsize(path) - offset) // TRACK_DTYPE.itemsize
+
+    if frames == 0:
+        return metadata, np.zeros(0, dtype=TRACK_DTYPE)
+
+    return metadata, np.memmap(path, dtype=TRACK_DTYPE, mode='r', offset=offset, shape=(frames,))
@@ -0,0 +1,336 @@
+'''
+Threaded capture -> inference -> display pipeline for the Live Trainer.
+
+A capture thread keeps reading the camera and holds only the newest frame, an inference thread runs pose
+detection and classification on whatever frame is newest when it becomes free, and the Tk thread only
+copies the newest finished result into its display. Stale frames are dropped instead of queued, so a slow
+inference step never makes the picture fall behind the camera.
+'''
+
+# Importing necessary Libraries
+import threading
+import time
+
+from adaptive_inference import detect_pose_adaptive
+from frame_display import to_rgb
+from instrumentation import NULL_METRICS
+from pose_estimation import create_landmarks, classify_pose, draw_pose
+from region_tracking import detect_pose_region
+
+
+class FpsMeter:
+    '''
+    This class measures a frame rate from the moving average of the time between frames.
+    '''
+
+    def __init__(self, smoothing=0.9):
+        self.smoothing = smoothing
+        self.interval = 0.0
+        self._last = None
+
+    @property
+    def fps(self):
+        return 1 / self.interval if self.interval else 0.0
+
+    def tick(self):
+        '''
+        This function is called once per processed frame.
+        Returns:
+            fps: The smoothed number of frames per second.
+        '''
+
+        now = time.perf_counter()
+
+        if self._last is not None:
+            interval = now - self._last
+            self.interval = interval if self.interval == 0 else \
+                self.smoothing * self.interval + (1 - self.smoothing) * interval
+
+        self._last = now
+
+        return self.fps
+
+
+class FrameGrabber(threading.Thread):
+    '''
+    This class reads frames from a capture source in a background thread and keeps only the latest one.
+    '''
+
+    def __init__(self, cap, metrics=NULL_METRICS, clock=None, listener=None):
+        '''
+        Args:
+            cap: The opened cv2.VideoCapture.
+            metrics: The StageMetrics the reads are measured in.
+            clock: A PlaybackClock pacing the reads, so a video file stands in for a camera. Cameras need none.
+            listener: A function called after every new frame and at the end, e.g. to wake up a StreamPool.
+        '''
+
+        super().__init__(name='FrameGrabber', daemon=True)
+
+        self.cap = cap
+        self.metrics = metrics
+        self.clock = clock
+        self.listener = listener
+        self.running = True
+
+        self._condition = threading.Condition()
+        self._frame = None
+        self._frame_id = 0
+
+    def run(self):
+        if self.clock is not None:
+            self.clock.start()
+
+        while self.running:
+            with self.metrics.measure('read'):
+                ok, frame = self.cap.read()
+
+            if not ok:
+                # The camera is gone (or the file ended), nothing more will arrive.
+                break
+
+            with self._condition:
+                self._frame = frame
+                self._frame_id += 1
+                self._condition.notify_all()
+
+            if self.listener is not None:
+                self.listener()
+
+            if self.clock is not None:
+                time.sleep(self.clock.delay() / 1000)
+
+        self.running = False
+
+        with self._condition:
+            self._condition.notify_all()
+
+        if self.listener is not None:
+            self.listener()
+
+    @property
+    def frame_id(self):
+        return self._frame_id
+
+    def latest(self, last_id=0, timeout=None):
+        '''
+        This function waits for a frame newer than the one already seen.
+        Args:
+            last_id: The id of the frame the caller got last time.
+            timeout: The maximum number of seconds to wait, or None to wait until a frame arrives.
+        Returns:
+            frame_id: The id of the returned frame.
+            frame: The newest frame, or None if no newer frame arrived in time.
+        '''
+
+        with self._condition:
+            self._condition.wait_for(lambda: self._frame_id != last_id or not self.running, timeout)
+
+            if self._frame_id == last_id:
+                return last_id, None
+
+            return self._frame_id, self._frame
+
+    def stop(self):
+        self.running = False
+
+
+class PoseWorker(threading.Thread):
+    '''
+    This class runs pose detection and classification on the newest frame of a FrameGrabber, and records the
+    landmarks of every processed frame if it is given a TrackWriter.
+    '''
+
+    def __init__(self, grabber, pose, counter, flip=True, scale=1.0, scheduler=None, track=None, smoother=None,
+                 metrics=NULL_METRICS, region=None):
+        super().__init__(name='PoseWorker', daemon=True)
+
+        self.grabber = grabber
+        self.pose = pose
+        self.counter = counter
+        self.flip = flip
+        self.scale = scale
+        self.scheduler = scheduler
+        self.track = track
+        self.smoother = smoother
+        self.metrics = metrics
+        self.region = region
+        self.running = True
+        self.landmarks = create_landmarks()
+        self.meter = FpsMeter()
+
+        self._lock = threading.Lock()
+        self._result_id = 0
+        self._next_pose = None
+        self._start = None
+
+        # The newest finished RGB frame, and the buffer the next one is prepared in
+        self._front = None
+        self._back = None
+
+    def run(self):
+        frame_id = 0
+
+        while self.running:
+            frame_id, frame = self.grabber.latest(frame_id, timeout=0.5)
+
+            if frame is None:
+                if not self.grabber.running:
+                    break
+
+                continue
+
+            self.process(frame)
+
+        self.running = False
+
+        # The worker closes the track itself, so no frame is written after it is closed.
+        if self.track is not None:
+            self.track.close()
+
+    def process(self, frame):
+        '''
+        This function analyses one frame of the grabber and makes it the newest result. It is called by run, or
+        by the threads of a StreamPool for a worker which is not started as a thread of its own.
+
+        '''
+
+        self._swap_pose()
+
+        if self._start is None:
+            self._start = time.perf_counter()
+
+        measure = self.metrics.measure
+
+        # The only colour conversion of the frame, the model, the drawing and the display all use RGB.
+        with measure('to_rgb'):
+            self._back = frame = to_rgb(frame, self._back, self.flip)
+
+        with measure('detect'):
+            if self.scheduler is None:
+                frame, landmarks = detect_pose_region(frame, self.pose, self.region, out=self.landmarks,
+                                                      scale=self.scale, rgb=True)
+            else:
+                # Under load only every Nth frame goes through the model, the others get estimated landmarks.
+                frame, landmarks = detect_pose_adaptive(frame, self.pose, self.scheduler, out=self.landmarks,
+                                                        scale=self.scale, rgb=True, region=self.region)
+
+        timestamp = time.perf_counter() - self._start
+
+        if self.track is not None:
+            self.track.write(timestamp, landmarks, self.scheduler is not None and self.scheduler.estimated)
+
+        if self.smoother is not None:
+            with measure('smooth'):
+                landmarks = self.smoother.filter(landmarks, timestamp)
+
+        if landmarks is not None:
+            # Perform the Pose Classification.
+            with measure('classify'):
+                classify_pose(landmarks, frame, self.counter, display=False, draw=False)
+
+            with measure('draw'):
+                draw_pose(landmarks, frame, self.counter, rgb=True)
+
+        with self._lock:
+            self._front, self._back = self._back, self._front
+            self._result_id += 1
+
+        self.meter.tick()
+        self.metrics.tick()
+
+    def set_pose(self, pose, scale=1.0):
+        '''
+        This function hands a new Pose instance to the worker, e.g. after the user chose another profile.
+        The worker switches to it before its next frame and closes the previous one.
+
+        '''
+
+        with self._lock:
+            self._next_pose = (pose, scale)
+
+    def _swap_pose(self):
+        with self._lock:
+            next_pose, self._next_pose = self._next_pose, None
+
+        if next_pose is not None:
+            self.pose.close()
+            self.pose, self.scale = next_pose
+            self.meter = FpsMeter()
+
+    def show(self, display, last_id=0):
+        '''
+        This function shows the newest processed frame on a FrameDisplay if it is newer than the one already shown.
+        The frame is copied while the lock is held, so the worker cannot write into it at the same time.
+        Args:
+            display: The FrameDisplay of the Tk label.
+            last_id: The id of the frame the caller showed last time.
+        Returns:
+            result_id: The id of the frame shown now, or last_id if nothing new was ready.
+        '''
+
+        with self._lock:
+            if self._result_id != last_id:
+                display.show(self._front)
+
+            return self._result_id
+
+    def stop(self):
+        self.running = False
+
+
+class LivePipeline:
+    '''
+    This class starts and stops the capture and inference threads of one camera.
+    '''
+
+    def __init__(self, cap, pose, counter, flip=True, scale=1.0, scheduler=None, track=None, smoother=None,
+                 metrics=NULL_METRICS, region=None, clock=None):
+        self.cap = cap
+        self.metrics = metrics
+        self.grabber = FrameGrabber(cap, metrics, clock)
+        self.worker = PoseWorker(self.grabber, pose, counter, flip, scale, scheduler, track, smoother, metrics,
+                                 region)
+        self.shown_id = 0
+
+    def start(self):
+        self.grabber.start()
+        self.worker.start()
+
+    def show(self, display):
+        '''
+        This function is polled from the Tk thread and shows the newest processed frame on a FrameDisplay.
+        Returns:
+            A boolean value that is true if a new frame was shown.
+        '''
+
+        start = time.perf_counter()
+
+        last_id, self.shown_id = self.shown_id, self.worker.show(display, self.shown_id)
+
+        if self.shown_id != last_id:
+            self.metrics.add('display', time.perf_counter() - start)
+
+        return self.shown_id != last_id
+
+    @property
+    def fps(self):
+        return self.worker.meter.fps
+
+    @property
+    def counters(self):
+        return (self.worker.counter,)
+
+    def stop(self):
+        '''
+        This function stops both threads and releases the capture source.
+
+        '''
+
+        self.worker.stop()
+        self.grabber.stop()
+
+        self.worker.join(timeout=2)
+        self.grabber.join(timeout=2)
+
+        self.cap.release()
@@ -0,0 +1,508 @@
+'''
+Multi-camera live mode: several capture sources analysed at once and shown in one grid.
+
+Every source (a camera index, or a video file standing in for a camera) is a CameraStream with a capture thread,
+a Pose instance, a RepCounter, a smoother and a region tracker of its own, so the trainees in front of different
+cameras are counted separately. The pose inference of all streams shares one StreamPool of threads, at most one
+per core by default, so the CPU used stays bounded however many cameras are opened. A free thread always takes
+the newest frame of the stream which got the least inference time so far, divided by its priority, so the
+streams share the threads in proportion to their priorities. Frames arriving while a stream waits replace each
+other, so a slow stream drops frames instead of falling behind.
+
+CameraGrid composites the newest result of every stream into one picture, with the frame rate, the posture and
+the reps of every stream in its corner. It has the interface of LivePipeline, so the Live screen shows either.
+
+Usage:
+    python multi_camera.py 0 1 2 --seconds 60
+    python multi_camera.py front.mp4 side.mp4 --priority 2 1 -o grid.mp4
+'''
+
+# Importing necessary Libraries
+import argparse
+import math
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from adaptive_inference import AdaptiveScheduler, frame_budget
+from instrumentation import StageMetrics
+from landmark_smoothing import DEFAULT_SMOOTHING, create_smoother
+from live_pipeline import FrameGrabber, PoseWorker
+from playback import PlaybackClock
+from pose_estimation import RepCounter, create_pose
+from region_tracking import RegionTracker
+from results_stream import NULL_PUBLISHER, ResultPublisher
+from video_analysis import add_pose_arguments, settings_from_arguments
+
+# Size of the grid picture
+GRID_SIZE = (1280, 720)
+
+# Frames per second the grid is composed at by the command line
+GRID_FPS = 15
+
+
+def open_source(source):
+    '''
+    This function opens a capture source given on the command line.
+    Args:
+        source: The index of a camera, as a number or a string of digits, or the path of a video file.
+    Returns:
+        cap: The opened cv2.VideoCapture.
+        camera: A boolean value that is true if the source is a camera.
+    '''
+
+    camera = isinstance(source, int) or source.isdigit()
+    cap = cv2.VideoCapture(int(source) if camera else source)
+
+    if not cap.isOpened():
+        raise IOError(f'Could not open capture source: {source}')
+
+    return cap, camera
+
+
+class CameraStream:
+    '''
+    This class holds one capture source with its capture thread and everything its frames are analysed with.
+    '''
+
+    def __init__(self, source, settings, counter=None, priority=1, smoothing=DEFAULT_SMOOTHING, flip=True,
+                 metrics=None, track=None):
+        '''
+        Args:
+            source: The index of a camera or the path of a video file, which is read at its own frame rate.
+            settings: The pose settings from pose_settings.
+            counter: The RepCounter of the stream, a new one counting the default exercise if not given.
+            priority: The share of the inference threads the stream gets compared to the others, e.g. 2 for twice
+                      as many frames as a stream of priority 1 when the threads cannot keep up with all cameras.
+            smoothing: The name of the landmark smoothing filter, see SMOOTHING_FILTERS.
+            flip: A boolean value that is if set to true mirrors the frames the same way the screens do.
+            metrics: The StageMetrics of the stream, a new one named after the source if not given.
+            track: A TrackWriter the landmarks of the stream are recorded to, or None.
+        '''
+
+        # The pool divides the inference time of the stream by its priority.
+        if not priority > 0:
+            raise ValueError(f'The priority of a stream must be positive, not {priority}')
+
+        self.cap, camera = open_source(source)
+
+        # The source is released again if the rest of the stream cannot be created, e.g. the pose model.
+        try:
+            self.name = f'camera {source}' if camera else os.path.basename(source)
+            self.priority = priority
+            self.metrics = metrics or StageMetrics(self.name)
+
+            budget = frame_budget(self.cap)
+
+            self.grabber = FrameGrabber(self.cap, self.metrics, clock=None if camera else PlaybackClock(budget))
+            self.worker = PoseWorker(self.grabber, create_pose(settings), counter or RepCounter(), flip,
+                                     settings['scale'], AdaptiveScheduler(budget), track, create_smoother(smoothing),
+                                     self.metrics, RegionTracker() if settings['roi'] else None)
+
+        except BaseException:
+            self.cap.release()
+            raise
+
+        # Id of the last frame analysed and number of frames analysed
+        self.frame_id = 0
+        self.frames = 0
+
+        # Inference time the stream got, divided by its priority, as counted by the pool
+        self.virtual_time = 0.0
+
+        # Whether a thread of the pool is analysing a frame of the stream
+        self.busy = False
+
+    @property
+    def counter(self):
+        return self.worker.counter
+
+    @property
+    def fps(self):
+        return self.worker.meter.fps
+
+    @property
+    def ready(self):
+        '''
+        A boolean value that is true if a frame newer than the last analysed one is waiting.
+        '''
+
+        return not self.busy and self.grabber.frame_id != self.frame_id
+
+    def step(self):
+        '''
+        This function analyses the newest frame of the stream, called by a thread of the pool.
+
+        '''
+
+        frame_id, frame = self.grabber.latest(self.frame_id, timeout=0)
+
+        if frame is None:
+            return
+
+        self.frame_id = frame_id
+        self.worker.process(frame)
+        self.frames += 1
+
+    def set_profile(self, settings):
+        '''
+        This function switches the stream to other pose settings before its next frame.
+
+        '''
+
+        self.worker.set_pose(create_pose(settings), settings['scale'])
+
+    def close(self):
+        '''
+        This function stops the capture thread and releases the source, once the pool does not use it anymore.
+
+        '''
+
+        self.grabber.stop()
+
+        # A stream which failed to open with the others was never started.
+        if self.grabber.is_alive():
+            self.grabber.join(timeout=2)
+
+        self.cap.release()
+        self.worker.pose.close()
+
+        if self.worker.track is not None:
+            self.worker.track.close()
+
+
+def open_streams(create, count):
+    '''
+    This function opens several streams one after the other, and closes those already opened if one of them fails.
+    Args:
+        create: A function creating the CameraStream of an index.
+        count: The number of streams.
+    Returns:
+        streams: The list of the opened streams.
+    '''
+
+    streams = []
+
+    try:
+        for index in range(count):
+            streams.append(create(index))
+
+    except BaseException:
+        for stream in streams:
+            stream.close()
+
+        raise
+
+    return streams
+
+
+class StreamPool:
+    '''
+    This class runs the pose inference of several streams on a fixed number of threads.
+    '''
+
+    def __init__(self, streams, workers=None):
+        '''
+        Args:
+            streams: The CameraStreams.
+            workers: The number of inference threads, by default one per core but no more than streams.
+        '''
+
+        self.streams = list(streams)
+        self.workers = workers or min(len(self.streams), os.cpu_count() or 1)
+        self.running = False
+
+        # Virtual time of the last stream picked, streams which had no frames for a while start from there
+        self._virtual_time = 0.0
+
+        self._condition = threading.Condition()
+        self._threads = [threading.Thread(target=self._run, name=f'StreamPool-{index}', daemon=True)
+                         for index in range(self.workers)]
+
+        for stream in self.streams:
+            stream.grabber.listener = self._wake
+
+    def start(self):
+        self.running = True
+
+        for stream in self.streams:
+            stream.grabber.start()
+
+        for thread in self._threads:
+            thread.start()
+
+    def _wake(self):
+        with self._condition:
+            self._condition.notify()
+
+    def _next_stream(self):
+        '''
+        This function picks the stream analysed next, the ready one with the smallest virtual time. It is called
+        with the condition held.
+
+        '''
+
+        ready = [stream for stream in self.streams if stream.ready]
+
+        if not ready:
+            return None
+
+        stream = min(ready, key=lambda stream: max(stream.virtual_time, self._virtual_time))
+
+        # A stream which had no frames does not save up inference time for later.
+        stream.virtual_time = self._virtual_time = max(stream.virtual_time, self._virtual_time)
+
+        return stream
+
+    def _run(self):
+        while True:
+            with self._condition:
+                stream = self._next_stream()
+
+                while self.running and stream is None:
+                    self._condition.wait(0.5)
+                    stream = self._next_stream()
+
+                if not self.running:
+                    return
+
+                stream.busy = True
+
+            start = time.perf_counter()
+
+            try:
+                stream.step()
+            finally:
+                with self._condition:
+                    stream.busy = False
+                    stream.virtual_time += (time.perf_counter() - start) / stream.priority
+
+                    # A newer frame of the stream may have arrived in the meantime.
+                    self._condition.notify()
+
+    @property
+    def finished(self):
+        '''
+        A boolean value that is true once every source ended and its last frame was analysed.
+        '''
+
+        return all(not stream.grabber.running and not stream.ready and not stream.busy for stream in self.streams)
+
+    def stop(self):
+        '''
+        This function stops the inference threads, then the streams.
+
+        '''
+
+        with self._condition:
+            self.running = False
+            self._condition.notify_all()
+
+        for thread in self._threads:
+            thread.join(timeout=2)
+
+        for stream in self.streams:
+            stream.close()
+
+
+class GridCell:
+    '''
+    This class is the part of the grid picture one stream is shown in. It takes the place of a FrameDisplay for
+    PoseWorker.show.
+    '''
+
+    def __init__(self, grid, stream, x, y, width, height):
+        self.stream = stream
+        self.view = grid[y:y + height, x:x + width]
+        self.shown_id = 0
+
+        self._resized = np.zeros((height, width, 3), dtype=np.uint8)
+
+    def show(self, rgb):
+        '''
+        This function resizes an RGB frame into the cell and writes the state of the stream in its corner.
+
+        '''
+
+        cv2.resize(rgb, (self._resized.shape[1], self._resized.shape[0]), dst=self._resized)
+
+        stream = self.stream
+        counter = stream.counter
+
+        cv2.rectangle(self._resized, (0, 0), (self._resized.shape[1], 26), (0, 0, 0), -1)
+        cv2.putText(self._resized, f'{stream.name}  {stream.fps:.1f} FPS  {counter.label or "--"}  '
+                                   f'{int(counter.reps)} reps', (6, 18), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                    (255, 255, 255), 1, cv2.LINE_AA)
+
+        self.view[:] = self._resized
+
+
+class CameraGrid:
+    '''
+    This class starts and stops the streams of several cameras and composites their results into one picture.
+    '''
+
+    def __init__(self, streams, size=GRID_SIZE, workers=None, columns=None):
+        '''
+        Args:
+            streams: The CameraStreams, shown row by row.
+            size: The (width, height) of the grid picture.
+            workers: The number of inference threads shared by the streams, see StreamPool.
+            columns: The number of columns of the grid, by default as many as make it square.
+        '''
+
+        self.streams = list(streams)
+        self.pool = StreamPool(self.streams, workers)
+
+        # The same video twice would otherwise be shown and published under the same name.
+        names = [stream.name for stream in self.streams]
+
+        for index, stream in enumerate(self.streams):
+            if names.count(stream.name) > 1:
+                stream.name = f'{stream.name} ({names[:index].count(stream.name) + 1})'
+
+        width, height = size
+        columns = columns or math.ceil(math.sqrt(len(self.streams)))
+        rows = math.ceil(len(self.streams) / columns)
+        cell_width, cell_height = width // columns, height // rows
+
+        # The picture every stream is composited into, in RGB order like the frames of the workers
+        self.image = np.zeros((height, width, 3), dtype=np.uint8)
+
+        self._cells = [GridCell(self.image, stream, index % columns * cell_width, index // columns * cell_height,
+                                cell_width, cell_height) for index, stream in enumerate(self.streams)]
+
+    def start(self):
+        self.pool.start()
+
+    def compose(self):
+        '''
+        This function copies the newest result of every stream into the grid picture.
+        Returns:
+            A boolean value that is true if the picture changed.
+        '''
+
+        changed = False
+
+        for cell in self._cells:
+            last_id, cell.shown_id = cell.shown_id, cell.stream.worker.show(cell, cell.shown_id)
+            changed |= cell.shown_id != last_id
+
+        return changed
+
+    def show(self, display):
+        '''
+        This function is polled from the Tk thread and shows the grid on a FrameDisplay if any stream has a new
+        result.
+        Returns:
+            A boolean value that is true if a new picture was shown.
+        '''
+
+        changed = self.compose()
+
+        if changed:
+            display.show(self.image)
+
+        return changed
+
+    @property
+    def fps(self):
+        '''
+        The frames analysed per second over all streams.
+        '''
+
+        return sum(stream.fps for stream in self.streams)
+
+    @property
+    def counters(self):
+        return tuple(stream.counter for stream in self.streams)
+
+    def set_profile(self, settings):
+        for stream in self.streams:
+            stream.set_profile(settings)
+
+    def stop(self):
+        self.pool.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analyse several cameras or videos at once and show them in a grid.')
+    parser.add_argument('sources', nargs='+', help='camera indices or video files standing in for cameras')
+    parser.add_argument('--priority', type=float, nargs='+', metavar='P',
+                        help='priority of every source, in the same order (default: 1 for all)')
+    parser.add_argument('-j', '--workers', type=int,
+                        help='inference threads shared by the sources (default: the CPU count or the number of '
+                             'sources, whichever is smaller)')
+    parser.add_argument('--seconds', type=float, help='stop after this many seconds (default: when every video ended)')
+    parser.add_argument('-o', '--output', help='write the grid to this video file')
+    parser.add_argument('--no-flip', action='store_true', help='do not mirror the frames before analysis')
+    parser.add_argument('--results-port', type=int, metavar='PORT',
+                        help='stream the results of every source as JSON lines to the clients of 127.0.0.1:PORT')
+    add_pose_arguments(parser)
+    args = parser.parse_args(argv)
+
+    priorities = args.priority or [1] * len(args.sources)
+
+    if len(priorities) != len(args.sources):
+        parser.error('--priority needs one value per source')
+
+    if min(priorities) <= 0:
+        parser.error('--priority values must be positive')
+
+    settings = settings_from_arguments(args)
+
+    streams = open_streams(lambda index: CameraStream(args.sources[index], settings, RepCounter(args.exercise),
+                                                      priorities[index], args.smoothing, not args.no_flip),
+                           len(args.sources))
+    grid = CameraGrid(streams, workers=args.workers)
+
+    publisher = ResultPublisher(args.results_port).start() if args.results_port is not None else NULL_PUBLISHER
+    writer = None
+
+    if args.output:
+        writer = cv2.VideoWriter(args.output, cv2.VideoWriter_fourcc(*'mp4v'), GRID_FPS, GRID_SIZE)
+
+    print(f'{len(streams)} sources on {grid.pool.workers} inference threads', file=sys.stderr)
+
+    start = time.perf_counter()
+    clock = PlaybackClock(1 / GRID_FPS)
+
+    grid.start()
+    clock.start()
+
+    try:
+        while not grid.pool.finished and (args.seconds is None or time.perf_counter() - start < args.seconds):
+            if grid.compose():
+                for stream in streams:
+                    publisher.frame(stream.name, stream.counter)
+
+            if writer is not None:
+                writer.write(cv2.cvtColor(grid.image, cv2.COLOR_RGB2BGR))
+
+            time.sleep(clock.delay() / 1000)
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        grid.stop()
+        publisher.close()
+
+        if writer is not None:
+            writer.release()
+
+    elapsed = time.perf_counter() - start
+
+    for stream in streams:
+        print(f'  {stream.name}: priority {stream.priority:g}, {stream.frames} frames analysed, '
+              f'{stream.frames / elapsed:.1f} FPS, {int(stream.counter.reps)} reps', file=sys.stderr)
+
+    print(f'total: {sum(stream.frames for stream in streams) / elapsed:.1f} FPS', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
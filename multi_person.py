@@ -0,0 +1,470 @@
+'''
+Multi-person mode: several trainees in one camera picture or video.
+
+Mediapipe Pose follows a single person, so the people are found first and every person is then analysed on a
+crop of the frame around them, with a Pose instance, a landmark smoother and a RepCounter of their own:
+
+    1. Every few frames (and whenever nobody is followed) OpenCV's HOG people detector looks for people. A
+       detection on a person already followed (see same_person) is that person, the others become new people.
+    2. Pose detection runs on the crop of every person, the crops on a pool of threads. The landmarks are
+       moved back into the coordinates of the whole frame and classified with the person's own counter.
+    3. The box of every person follows their landmarks from frame to frame, so the detector is not needed
+       between its runs. A person whose crop shows nobody for a few frames in a row is dropped, and so is a person
+       whose landmarks ended up on someone followed for longer.
+
+The throughput is reported in persons x FPS, the number of person crops analysed per second.
+
+Usage:
+    python multi_person.py group_class.mp4 -o group_class.csv
+    python multi_person.py 0 --max-persons 6    (camera 0)
+'''
+
+# Importing necessary Libraries
+import argparse
+import csv
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from exercises import DEFAULT_EXERCISE, EXERCISES
+from frame_display import to_rgb
+from landmark_smoothing import DEFAULT_SMOOTHING, create_smoother
+from pose_estimation import RepCounter, classify_pose, create_landmarks, create_pose, detect_pose, pose_settings
+from video_analysis import add_pose_arguments, settings_from_arguments
+
+# Frames between two runs of the people detector
+DETECT_EVERY = 10
+
+# Largest number of people followed at the same time
+MAX_PERSONS = 6
+
+# Frames are shrunk to this width for the people detector
+DETECTION_WIDTH = 960
+
+# Smallest HOG score of a detection, and the overlap above which two detections are the same person
+MIN_DETECTION_SCORE = 0.5
+DETECTION_OVERLAP = 0.3
+
+# Overlap above which two boxes are the same person, whatever their centres
+MATCH_OVERLAP = 0.3
+
+# Frames in a row without landmarks after which a person is dropped
+MAX_MISSED = 5
+
+# Margin added around a detection or the landmarks of a person, as a fraction of the size of the box
+CROP_MARGIN = 0.35
+
+# Landmarks at least this visible decide the box of a person
+MIN_VISIBILITY = 0.5
+
+
+def box_overlap(box1, box2):
+    '''
+    This function returns the intersection over union of two (x0, y0, x1, y1) boxes.
+
+    '''
+
+    width = min(box1[2], box2[2]) - max(box1[0], box2[0])
+    height = min(box1[3], box2[3]) - max(box1[1], box2[1])
+
+    if width <= 0 or height <= 0:
+        return 0.0
+
+    intersection = width * height
+    union = (box1[2] - box1[0]) * (box1[3] - box1[1]) + (box2[2] - box2[0]) * (box2[3] - box2[1]) - intersection
+
+    return intersection / union
+
+
+def box_contains(box, point):
+    '''
+    This function returns whether an (x, y) point lies inside an (x0, y0, x1, y1) box.
+
+    '''
+
+    return box[0] <= point[0] <= box[2] and box[1] <= point[1] <= box[3]
+
+
+def same_person(box1, box2):
+    '''
+    This function decides whether two boxes show the same person. The box of a detection and the box of the landmarks
+    of the same person often overlap little, the detector frames the whole body and the landmarks leave out the
+    head and the feet, but the centre of one of them lies inside the other.
+    Args:
+        box1, box2: The (x0, y0, x1, y1) boxes, e.g. a detection and the body of a person.
+    Returns:
+        A boolean value that is true if they show the same person.
+    '''
+
+    centre1 = ((box1[0] + box1[2]) / 2, (box1[1] + box1[3]) / 2)
+    centre2 = ((box2[0] + box2[2]) / 2, (box2[1] + box2[3]) / 2)
+
+    return box_contains(box1, centre2) or box_contains(box2, centre1) or box_overlap(box1, box2) > MATCH_OVERLAP
+
+
+def expand_box(box, shape, margin=CROP_MARGIN):
+    '''
+    This function adds a margin around a box and clips it to the frame.
+    Args:
+        box: The (x0, y0, x1, y1) box in pixels.
+        shape: The shape of the frame.
+        margin: The margin added on every side, as a fraction of the width and height of the box.
+    Returns:
+        box: The (x0, y0, x1, y1) box in whole pixels.
+    '''
+
+    height, width = shape[:2]
+    x0, y0, x1, y1 = box
+    dx = (x1 - x0) * margin
+    dy = (y1 - y0) * margin
+
+    return (max(0, int(x0 - dx)), max(0, int(y0 - dy)), min(width, int(x1 + dx)), min(height, int(y1 + dy)))
+
+
+class PersonDetector:
+    '''
+    This class finds the people in a frame with the HOG people detector of OpenCV.
+    '''
+
+    def __init__(self, width=DETECTION_WIDTH, min_score=MIN_DETECTION_SCORE):
+        '''
+        Args:
+            width: The width frames are shrunk to before the detection.
+            min_score: The smallest HOG score of a detection.
+        '''
+
+        self.width = width
+        self.min_score = min_score
+
+        self.hog = cv2.HOGDescriptor()
+        self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+
+    def detect(self, image):
+        '''
+        This function finds the people in an image.
+        Args:
+            image: The frame, in RGB or BGR order.
+        Returns:
+            boxes: A list of (x0, y0, x1, y1) boxes in the pixels of the frame, the most certain first.
+        '''
+
+        scale = min(1.0, self.width / image.shape[1])
+        small = image if scale == 1.0 else cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        rects, scores = self.hog.detectMultiScale(small, winStride=(8, 8), padding=(8, 8), scale=1.05)
+
+        if len(rects) == 0:
+            return []
+
+        scores = np.ravel(scores)
+        keep = cv2.dnn.NMSBoxes(rects.tolist(), scores.tolist(), self.min_score, DETECTION_OVERLAP)
+
+        return [tuple(int(value / scale) for value in (x, y, x + w, y + h))
+                for x, y, w, h in (rects[index] for index in sorted(np.ravel(keep), key=lambda index: -scores[index]))]
+
+
+class Person:
+    '''
+    This class holds everything followed about one person: their box, Pose instance, smoother and counter.
+    '''
+
+    def __init__(self, person_id, body, shape, settings, exercise, smoothing):
+        self.id = person_id
+
+        # The box of the body, from the detection and then from the landmarks, and the crop analysed around it
+        self.body = body
+        self.box = expand_box(body, shape)
+        self.pose = create_pose(settings)
+        self.counter = RepCounter(exercise)
+        self.smoother = create_smoother(smoothing)
+        self.buffer = create_landmarks()
+        self.landmarks = None
+
+        # Frames the crop showed nobody in a row, the frames it showed the person in and the frames their results
+        # were returned in
+        self.missed = 0
+        self.seen = 0
+        self.frames = 0
+
+    def analyse(self, image, timestamp, scale=1.0):
+        '''
+        This function detects and classifies the pose of the person on the crop of their box, and moves the box
+        along with their landmarks.
+        Args:
+            image: The whole RGB frame.
+            timestamp: The time of the frame in seconds.
+            scale: The inference downscale factor passed on to detect_pose.
+        Returns:
+            landmarks: The landmarks in the pixels of the whole frame, or None if the crop shows nobody.
+        '''
+
+        x0, y0, x1, y1 = self.box
+
+        # Mediapipe needs the crop as a contiguous image.
+        crop = np.ascontiguousarray(image[y0:y1, x0:x1])
+
+        _, landmarks = detect_pose(crop, self.pose, display=False, out=self.buffer, scale=scale, rgb=True)
+
+        if landmarks is not None:
+            landmarks[:, 0] += x0
+            landmarks[:, 1] += y0
+
+        if self.smoother is not None:
+            landmarks = self.smoother.filter(landmarks, timestamp)
+
+        self.landmarks = landmarks
+
+        if landmarks is None:
+            self.missed += 1
+            return None
+
+        self.missed = 0
+        self.seen += 1
+
+        classify_pose(landmarks, None, self.counter, display=False, draw=False)
+
+        visible = landmarks[landmarks[:, 3] >= MIN_VISIBILITY]
+
+        if len(visible):
+            self.body = (*visible[:, :2].min(axis=0), *visible[:, :2].max(axis=0))
+            self.box = expand_box(self.body, image.shape)
+
+        return landmarks
+
+    def close(self):
+        self.pose.close()
+
+
+class MultiPersonTracker:
+    '''
+    This class finds, follows and analyses several people in the frames of one camera or video.
+    '''
+
+    def __init__(self, settings=None, exercise=DEFAULT_EXERCISE, smoothing=DEFAULT_SMOOTHING, detect_every=DETECT_EVERY,
+                 max_persons=MAX_PERSONS, workers=None):
+        '''
+        Args:
+            settings: The pose settings from pose_settings, used for every person.
+            exercise: The name of the exercise every person does.
+            smoothing: The name of the landmark smoothing filter of every person.
+            detect_every: The number of frames between two runs of the people detector.
+            max_persons: The largest number of people followed at the same time.
+            workers: The number of threads analysing the crops, by default one per core up to max_persons.
+        '''
+
+        self.settings = settings or pose_settings()
+        self.exercise = exercise
+        self.smoothing = smoothing
+        self.detect_every = detect_every
+        self.max_persons = max_persons
+
+        self.detector = PersonDetector()
+        self.persons = []
+        self.frames = 0
+        self.person_frames = 0
+
+        # The (id, reps, id of the person they were merged into or None) of the people no longer followed
+        self.dropped = []
+
+        self._ids = itertools.count(1)
+        self._pool = ThreadPoolExecutor(max_workers=workers or min(max_persons, os.cpu_count() or 1),
+                                        thread_name_prefix='PersonPose')
+
+    def process(self, image, timestamp):
+        '''
+        This function analyses the next frame.
+        Args:
+            image: The RGB frame.
+            timestamp: The time of the frame in seconds.
+        Returns:
+            persons: The people followed, with the landmarks of this frame (None if not found in it) and counters.
+        '''
+
+        if self.frames % self.detect_every == 0 or not self.persons:
+            self._add_detections(image)
+
+        self.frames += 1
+
+        scale = self.settings['scale']
+
+        # The people are independent of each other, every crop is analysed on its own thread.
+        list(self._pool.map(lambda person: person.analyse(image, timestamp, scale), self.persons))
+
+        # The people lost in this frame are dropped before anybody sees its results.
+        self._drop_lost()
+
+        for person in self.persons:
+            if person.landmarks is not None:
+                person.frames += 1
+                self.person_frames += 1
+
+        return self.persons
+
+    def results(self):
+        '''
+        This function returns the reps of everybody whose results were returned, also of the people no longer
+        followed.
+        Returns:
+            results: A list of (id, reps, state) tuples ordered by id, the state is 'followed', 'lost' or
+                     'merged into person <id>'.
+        '''
+
+        results = [(person.id, person.counter.reps, 'followed') for person in self.persons if person.frames]
+        results += [(person_id, reps, 'lost' if merged is None else f'merged into person {merged}')
+                    for person_id, reps, merged in self.dropped]
+
+        return sorted(results)
+
+    def _add_detections(self, image):
+        for box in self.detector.detect(image):
+            if len(self.persons) >= self.max_persons:
+                break
+
+            # A detection on a person already followed is that person.
+            if any(same_person(box, person.body) for person in self.persons):
+                continue
+
+            self.persons.append(Person(next(self._ids), box, image.shape, self.settings, self.exercise,
+                                       self.smoothing))
+
+    def _drop_lost(self):
+        kept = []
+
+        # Two people whose landmarks ended up on the same body, the one whose landmarks were found more often is
+        # kept. A false detection next to somebody, whose crop catches a part of them now and then, never wins.
+        for person in sorted(self.persons, key=lambda person: (-person.seen, person.id)):
+            merged = next((other for other in kept if same_person(person.body, other.body)), None)
+
+            if merged is None and person.missed <= MAX_MISSED:
+                kept.append(person)
+                continue
+
+            person.close()
+
+            # A person never returned with landmarks has no results to keep.
+            if person.frames:
+                self.dropped.append((person.id, person.counter.reps, merged and merged.id))
+
+        self.persons = sorted(kept, key=lambda person: person.id)
+
+    def close(self):
+        self._pool.shutdown()
+
+        for person in self.persons:
+            person.close()
+
+        self.persons = []
+
+
+def analyse_group(source, tracker, flip=True, max_frames=None):
+    '''
+    This function analyses every person in the frames of a video or camera.
+    Args:
+        source: The path of a video file, or the index of a camera.
+        tracker: The MultiPersonTracker.
+        flip: A boolean value that is if set to true mirrors every frame the same way the screens do.
+        max_frames: The number of frames after which to stop, or None to read the whole source.
+    Returns:
+        A generator yielding one dictionary per person found in every frame, with the frame number, timestamp,
+        person id, angles, label and reps.
+    '''
+
+    cap = cv2.VideoCapture(source)
+
+    if not cap.isOpened():
+        raise IOError(f'Could not open video: {source}')
+
+    frame = None
+    rgb = None
+    index = 0
+
+    start = time.perf_counter()
+
+    try:
+        while max_frames is None or index < max_frames:
+            ok, frame = cap.read(frame)
+
+            if not ok:
+                break
+
+            rgb = to_rgb(frame, rgb, flip)
+
+            # Cameras report no position, their frames are timed by the clock.
+            timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000 if isinstance(source, str) else \
+                time.perf_counter() - start
+
+            for person in tracker.process(rgb, timestamp):
+                if person.landmarks is None:
+                    continue
+
+                row = {'frame': index, 'timestamp': round(timestamp, 3), 'person': person.id,
+                       'label': person.counter.label, 'reps': person.counter.reps}
+                row.update(person.counter.angles)
+
+                yield row
+
+            index += 1
+
+    finally:
+        cap.release()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analyse several people in one video or camera picture.')
+    parser.add_argument('source', help='path of the video file, or the index of a camera')
+    parser.add_argument('-o', '--output', help='CSV file for the per-person results (default: standard output)')
+    parser.add_argument('--no-flip', action='store_true', help='do not mirror the frames before analysis')
+    parser.add_argument('--frames', type=int, help='stop after this many frames')
+    parser.add_argument('--max-persons', type=int, default=MAX_PERSONS, help='largest number of people followed')
+    parser.add_argument('--detect-every', type=int, default=DETECT_EVERY, metavar='N',
+                        help='run the people detector on every Nth frame')
+    parser.add_argument('-j', '--workers', type=int,
+                        help='threads analysing the crops (default: the CPU count or --max-persons, whichever is '
+                             'smaller)')
+    # The crop of every person is the region the model sees, --roi has no meaning here.
+    add_pose_arguments(parser, roi=False)
+    args = parser.parse_args(argv)
+
+    source = int(args.source) if args.source.isdigit() else args.source
+
+    tracker = MultiPersonTracker(settings_from_arguments(args), args.exercise, args.smoothing, args.detect_every,
+                                 args.max_persons, args.workers)
+
+    fields = ('frame', 'timestamp', 'person', *EXERCISES[args.exercise].angle_names, 'label', 'reps')
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+
+    start = time.perf_counter()
+
+    try:
+        writer = csv.DictWriter(output, fieldnames=fields)
+        writer.writeheader()
+
+        for row in analyse_group(source, tracker, not args.no_flip, args.frames):
+            writer.writerow(row)
+
+        results = tracker.results()
+
+    finally:
+        tracker.close()
+
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    persons = tracker.person_frames / max(tracker.frames, 1)
+
+    print(f'{args.source}: {tracker.frames} frames, {tracker.person_frames} person frames, '
+          f'{tracker.frames / elapsed:.1f} FPS x {persons:.1f} persons = '
+          f'{tracker.person_frames / elapsed:.1f} persons x FPS', file=sys.stderr)
+
+    for person_id, reps, state in results:
+        print(f'  person {person_id}: {int(reps)} reps{"" if state == "followed" else f" ({state})"}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+'''
+Pacing of the Video and Live loops.
+
+Instead of rescheduling themselves after a fixed 2 ms, the loops ask a PlaybackClock how long to wait before the
+next frame. The clock knows when every frame is due from the frame rate of the source and the playback speed,
+and subtracts the time already spent on the current frame, so a video plays at its own speed whether a frame
+took 5 ms or 30 ms to analyse, and the loop sleeps instead of spinning when it is ahead.
+
+A loop which falls behind (inference slower than the frame rate) continues from the current time instead of
+rushing through a backlog of late frames; no frame is skipped, so a video is analysed the same way every time.
+'''
+
+# Importing necessary Libraries
+import time
+
+# Playback speeds offered on the Video screen, None plays the frames as fast as they can be analysed
+PLAYBACK_SPEEDS = {
+    'Real time': 1.0,
+    '0.5x': 0.5,
+    '2x': 2.0,
+    'As fast as possible': None,
+}
+
+DEFAULT_SPEED = 'Real time'
+
+# Number of frame intervals a loop may be late before the clock gives up catching up
+MAX_LAG_FRAMES = 2
+
+
+class PlaybackClock:
+    '''
+    This class tells a frame loop how long to wait before its next frame.
+    '''
+
+    def __init__(self, frame_interval, speed=1.0):
+        '''
+        Args:
+            frame_interval: The seconds between two frames of the source, e.g. from frame_budget.
+            speed: The playback speed, 1.0 for real time, or None to play as fast as possible.
+        '''
+
+        self.interval = frame_interval / speed if speed else 0.0
+
+        # Frames which were due before the previous one was finished
+        self.late_frames = 0
+
+        self._due = None
+
+    def start(self):
+        '''
+        This function is called right before the first frame is read, the next frames are due from then on.
+
+        '''
+
+        self._due = time.perf_counter()
+
+    def delay(self):
+        '''
+        This function is called once the current frame is finished.
+        Returns:
+            delay: The milliseconds to wait before the next frame, as taken by after().
+        '''
+
+        if not self.interval:
+            return 0
+
+        now = time.perf_counter()
+
+        if self._due is None:
+            self._due = now
+
+        self._due += self.interval
+
+        if self._due < now:
+            self.late_frames += 1
+
+            # Far behind, continue from now instead of showing the late frames without any pause.
+            if self._due < now - MAX_LAG_FRAMES * self.interval:
+                self._due = now
+
+            return 0
+
+        return int((self._due - now) * 1000)
@@ -0,0 +1,380 @@
+# Importing necessary Libraries
+import math
+import time
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from exercises import DEFAULT_EXERCISE, EXERCISES
+
+# Initiating Pose Solutions of Mediapipe
+mp_pose = mp.solutions.pose
+
+
+# Pose model profiles trading accuracy for speed:
+#   model_complexity: 0 (lite), 1 (full) or 2 (heavy) Mediapipe pose landmark model
+#   scale: factor by which frames are downscaled before inference (landmarks stay in full-frame pixels)
+#   min_detection_confidence / min_tracking_confidence: thresholds of the Mediapipe person detector and tracker
+#   roi: whether the model only sees the region around the person of the previous frame, see region_tracking.py
+POSE_PROFILES = {
+    'lite': {'model_complexity': 0, 'scale': 0.5, 'min_detection_confidence': 0.5, 'min_tracking_confidence': 0.5,
+             'roi': True},
+    'full': {'model_complexity': 1, 'scale': 1.0, 'min_detection_confidence': 0.5, 'min_tracking_confidence': 0.5,
+             'roi': True},
+    'heavy': {'model_complexity': 2, 'scale': 1.0, 'min_detection_confidence': 0.5, 'min_tracking_confidence': 0.5,
+              'roi': True},
+}
+
+DEFAULT_PROFILE = 'full'
+
+
+def pose_settings(profile=DEFAULT_PROFILE, **overrides):
+    '''
+    This function returns the settings of a pose profile, optionally with some of them changed.
+    Args:
+        profile: The name of one of the POSE_PROFILES.
+        overrides: Settings replacing those of the profile, e.g. scale=0.75. Values of None are ignored.
+    Returns:
+        settings: A new dictionary with the profile name and its settings.
+    '''
+
+    if profile not in POSE_PROFILES:
+        raise ValueError(f'Unknown pose profile: {profile} (choose from {", ".join(POSE_PROFILES)})')
+
+    settings = dict(POSE_PROFILES[profile], profile=profile)
+    settings.update((key, value) for key, value in overrides.items() if value is not None)
+
+    return settings
+
+
+def create_pose(settings=None):
+    '''
+    This function creates the Pose instance used for analysing video streams.
+    Args:
+        settings: The settings from pose_settings. The default profile is used if not given.
+    Returns:
+        pose: A Mediapipe Pose object configured for video (tracking) mode.
+    '''
+
+    if settings is None:
+        settings = pose_settings()
+
+    return mp_pose.Pose(static_image_mode=False, model_complexity=settings['model_complexity'],
+                        min_detection_confidence=settings['min_detection_confidence'],
+                        min_tracking_confidence=settings['min_tracking_confidence'])
+
+
+# Number of landmarks returned by Mediapipe Pose for one person
+NUM_LANDMARKS = 33
+
+
+def create_landmarks():
+    '''
+    This function allocates a landmark buffer which detect_pose can fill in place frame after frame.
+    Returns:
+        landmarks: A zeroed float32 array of shape (33, 4) holding x, y, z and visibility per landmark.
+    '''
+
+    return np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+
+
+def detect_pose(image, pose, display=True, out=None, scale=1.0, rgb=False):
+    '''
+    This function performs pose detection on an image.
+    Args:
+        image: The input image with a prominent person whose pose landmarks need to be detected.
+        pose: The pose setup function required to perform the pose detection.
+        display: A boolean value that is if set to true the function displays the original input image, the resultant image,
+                 and the pose landmarks in 3D plot and returns nothing.
+        out: A buffer from create_landmarks to fill in place. A new one is allocated if not given; pass the same
+             buffer every frame to avoid allocations in the video loop.
+        scale: A factor by which the image is downscaled before inference, e.g. 0.5 for half resolution.
+        rgb: A boolean value that is if set to true tells that the image is already in RGB order, so it is not
+             converted again.
+    Returns:
+        output_image: The input image with the detected pose landmarks drawn.
+        landmarks: A float32 array of shape (33, 4) with the x, y, z coordinates converted into their original
+                   scale and the visibility of every landmark, or None if no person is found.
+    '''
+
+    # Shrink the image handed to the model. Landmarks are normalized, so they still map onto the full image.
+    small = image if scale == 1.0 else cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    # Convert the image from BGR into RGB format.
+    imageRGB = small if rgb else cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+
+    # Perform the Pose Detection.
+    results = pose.process(imageRGB)
+
+    # Check if any landmarks are detected.
+    if not results.pose_landmarks:
+        # No person found in this frame.
+        return image, None
+
+    # Retrieve the height and width of the input image.
+    height, width, _ = image.shape
+
+    if out is None:
+        out = create_landmarks()
+
+    # Copy the normalized landmarks into the buffer.
+    for row, landmark in zip(out, results.pose_landmarks.landmark):
+        row[0] = landmark.x
+        row[1] = landmark.y
+        row[2] = landmark.z
+        row[3] = landmark.visibility
+
+    # Convert x, y and z into their original scale with one multiply.
+    np.multiply(out[:, :3], (width, height, width), out=out[:, :3])
+
+    # Return the output image and the found landmarks.
+    return image, out
+
+
+def calculate_angle(landmark1, landmark2, landmark3):
+    '''
+    This function calculates angle between three different landmarks.
+    Args:
+        landmark1: The first landmark containing the x,y and z coordinates.
+        landmark2: The second landmark containing the x,y and z coordinates.
+        landmark3: The third landmark containing the x,y and z coordinates.
+    Returns:
+        angle: The calculated angle between the three landmarks.
+
+    '''
+
+    # Get the required landmarks coordinates.
+    x1, y1, _ = landmark1
+    x2, y2, _ = landmark2
+    x3, y3, _ = landmark3
+
+    # Calculate the angle between the three points
+    angle = math.degrees(math.atan2(y3 - y2, x3 - x2) - math.atan2(y1 - y2, x1 - x2))
+
+    # Check if the angle is less than zero.
+    if angle < 0:
+        # Add 360 to the found angle.
+        angle += 360
+
+    # Return the calculated angle.
+    return angle
+
+
+# Joint triplets (first point, vertex, third point) of the shoulder press angles, in this order:
+# left elbow, right elbow, left shoulder and right shoulder angle.
+SHOULDER_PRESS_JOINTS = EXERCISES['shoulder_press'].joints
+
+
+def calculate_angles(landmarks, joints):
+    '''
+    This function calculates the angles of many joints at once, the same way calculate_angle does for one.
+    Args:
+        landmarks: The detected landmarks, an array-like of shape (33, 3) or more columns (x, y, ...). Extra
+                   leading dimensions are kept, so a (frames, 33, 3) sequence works as well.
+        joints: An integer array of shape (joints, 3) with the (first, vertex, third) landmark indices.
+    Returns:
+        angles: The angles in degrees within [0, 360), of shape (joints,) or (frames, joints).
+    '''
+
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+
+    # Gather the x and y coordinates of every triplet in one go: shape (..., joints, 3, 2).
+    points = landmarks[..., joints, :2]
+
+    first = points[..., 0, :] - points[..., 1, :]
+    third = points[..., 2, :] - points[..., 1, :]
+
+    # Calculate the angle between the three points
+    angles = np.degrees(np.arctan2(third[..., 1], third[..., 0]) - np.arctan2(first[..., 1], first[..., 0]))
+
+    # Add 360 to the negative angles.
+    angles[angles < 0] += 360
+
+    return angles
+
+
+def calculate_angles_batch(sequence, joints):
+    '''
+    This function calculates the joint angles of a whole landmark sequence, e.g. of a recorded video.
+    Args:
+        sequence: An array of shape (frames, 33, 3) or (frames, 33, 4) with the landmarks of every frame.
+        joints: An integer array of shape (joints, 3) with the (first, vertex, third) landmark indices.
+    Returns:
+        angles: An array of shape (frames, joints) with the angles in degrees.
+    '''
+
+    sequence = np.asarray(sequence)
+
+    if sequence.ndim != 3:
+        raise ValueError(f'Expected a (frames, landmarks, coordinates) array, got shape {sequence.shape}')
+
+    return calculate_angles(sequence, joints)
+
+
+class RepCounter:
+    '''
+    This class holds the repetition counting state of one person doing one exercise, so several streams or
+    videos can be classified side by side, each with its own counter.
+    '''
+
+    __slots__ = ('exercise', 'reps', 'phases', 'bar', 'percent', 'update_reps', 'label', 'color', 'angles',
+                 'rep_times')
+
+    def __init__(self, exercise=DEFAULT_EXERCISE):
+        '''
+        Args:
+            exercise: The name of one of the EXERCISES, it can be changed with set_exercise.
+        '''
+
+        self.set_exercise(exercise)
+
+    def set_exercise(self, exercise):
+        '''
+        This function switches to another exercise and resets the counter. A paused counter stays paused.
+
+        '''
+
+        if exercise not in EXERCISES:
+            raise ValueError(f'Unknown exercise: {exercise} (choose from {", ".join(EXERCISES)})')
+
+        # Not set yet while the counter is being created
+        update_reps = getattr(self, 'update_reps', 1)
+
+        self.exercise = exercise
+        self.reset()
+
+        self.update_reps = update_reps
+
+    def reset(self):
+        '''
+        This function resets the repetition counter and the phases reached since the last half repetition.
+
+        '''
+
+        # Initial Value of Reps and flags for updating the data
+        self.reps = 0
+        self.phases = [False] * len(EXERCISES[self.exercise].phase_names)
+        self.bar = 0
+        self.percent = 0
+        self.update_reps = 1
+        self.label = 'WRONG'
+        self.color = "red"
+        self.angles = {}
+
+        # time.perf_counter() of every whole repetition
+        self.rep_times = []
+
+
+# Colours of the right limb, the left limb and the rings around the joints drawn by draw_limbs, in BGR order
+ARM_COLORS = ((255, 0, 0), (0, 255, 0), (0, 0, 255))
+
+
+def draw_limbs(landmarks, output_image, limbs, rgb=False):
+    '''
+    This function draws the right and the left limb of an exercise on an image.
+    Args:
+        landmarks: The detected landmarks of the person, an array of shape (33, 4) as returned by detect_pose.
+        output_image: The image on which the limbs are drawn in place.
+        limbs: The landmark indices of the right and the left limb, e.g. the limbs of an Exercise.
+        rgb: A boolean value that is if set to true tells that the image is in RGB order instead of BGR.
+    Returns:
+        output_image: The image with the limbs drawn.
+    '''
+
+    # Pixel positions of the landmarks as integer (x, y) tuples, as OpenCV expects them.
+    points = [tuple(point) for point in landmarks[:, :2].astype(np.int32).tolist()]
+
+    right, left, ring = [color[::-1] for color in ARM_COLORS] if rgb else ARM_COLORS
+
+    for limb, color in zip(limbs, (right, left)):
+        for start, end in zip(limb, limb[1:]):
+            cv2.line(output_image, points[start], points[end], color, 3)
+
+    for limb, color in zip(limbs, (right, left)):
+        for joint in limb:
+            cv2.circle(output_image, points[joint], 10, color, cv2.FILLED)
+            cv2.circle(output_image, points[joint], 15, ring, 2)
+
+    return output_image
+
+
+def draw_arms(landmarks, output_image, rgb=False):
+    '''
+    This function draws both arms (shoulder, elbow and wrist) on an image.
+
+    '''
+
+    return draw_limbs(landmarks, output_image, EXERCISES['shoulder_press'].limbs, rgb)
+
+
+def draw_pose(landmarks, output_image, counter, rgb=False):
+    '''
+    This function draws the limbs of the exercise of a RepCounter on an image, see draw_limbs.
+
+    '''
+
+    return draw_limbs(landmarks, output_image, EXERCISES[counter.exercise].limbs, rgb)
+
+
+def classify_pose(landmarks, output_image, counter, display=False, draw=True, rgb=False):
+    '''
+    This function classifies the posture of the exercise of a counter depending upon the angles of its joints,
+    and counts the repetitions.
+    Args:
+        landmarks: The detected landmarks of the person whose pose needs to be classified, an array of shape
+                   (33, 4) as returned by detect_pose.
+        output_image: A image of the person with the detected pose landmarks drawn.
+        counter: The RepCounter of the person, updated in place with the label, progress bar and reps. Its
+                 exercise decides which joints are looked at, see exercises.py.
+        display: Not used, the callers show the output_image themselves.
+        draw: A boolean value that is if set to false skips drawing the limbs on the output_image (headless analysis).
+        rgb: A boolean value that is if set to true tells that the output_image is in RGB order instead of BGR.
+    Returns:
+        output_image: The image with the limbs of the exercise drawn.
+        label: The classified pose label of the person in the output_image.
+
+    '''
+
+    exercise = EXERCISES[counter.exercise]
+
+    if draw:
+        draw_pose(landmarks, output_image, counter, rgb)
+
+    # Calculate the angles of all joints of the exercise at once.
+    angles = calculate_angles(landmarks, exercise.joints)
+
+    # Keep the angles of this frame for the headless analysis.
+    counter.angles = dict(zip(exercise.angle_names, angles.tolist()))
+
+    bar, percent = exercise.progress(angles)
+
+    # The bar keeps its last value while the joint is outside of the angles it is shown for.
+    if bar is not None:
+        counter.bar = bar
+        counter.percent = percent
+
+    # The posture is correct while the angles are within one of the phases of a repetition.
+    phase = exercise.match(angles)
+
+    if phase is None:
+        label = 'WRONG'
+        color = "red"
+    else:
+        label = 'CORRECT'
+        color = "green"
+        counter.phases[phase] = True
+
+    # Count half a repetition once every phase was reached.
+    if all(counter.phases) and counter.update_reps == 1:
+        counter.reps += 0.5
+        counter.phases = [False] * len(counter.phases)
+
+        if counter.reps.is_integer():
+            counter.rep_times.append(time.perf_counter())
+
+    counter.label = label
+    counter.color = color
+
+    # Return the output image and the classified label.
+    return output_image, label
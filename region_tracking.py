@@ -0,0 +1,185 @@
+'''
+Region of interest of the pose model.
+
+The person usually fills a small part of the frame and moves little between two frames, yet detect_pose hands
+the whole frame to Mediapipe, which converts and resizes all of it before the model sees it. RegionTracker keeps
+a square region around the landmarks of the previous frame, padded by a margin, and detect_pose_region runs the
+model on that crop only and moves the landmarks back into the pixels of the whole frame.
+
+The region only moves when the landmarks come close to its border or the person became much smaller, so the
+crop is the same from one frame to the next most of the time and the tracking of Mediapipe is not disturbed.
+When nobody is found in the region, the whole frame is searched again in the same frame.
+
+Usage:
+    region = RegionTracker()
+    _, landmarks = detect_pose_region(frame, pose, region, out=buffer)
+'''
+
+# Importing necessary Libraries
+import numpy as np
+
+from pose_estimation import detect_pose
+
+# Margin added around the landmarks, as a fraction of the size of the region
+REGION_MARGIN = 0.25
+
+# The region is kept while the landmarks stay this far from its border, as a fraction of its size
+REGION_SLACK = 0.08
+
+# The region is made smaller once the landmarks need less than this fraction of its size
+REGION_SHRINK = 0.6
+
+# Smallest region, as a fraction of the shorter side of the frame
+MIN_REGION = 0.25
+
+# Largest region, as a fraction of the area of the frame. A crop this large saves next to nothing, the whole
+# frame is analysed instead.
+MAX_REGION = 0.6
+
+# Landmarks at least this visible decide the region
+MIN_VISIBILITY = 0.5
+
+
+class RegionTracker:
+    '''
+    This class follows the region of a frame the person of a stream is in.
+    '''
+
+    def __init__(self, margin=REGION_MARGIN, slack=REGION_SLACK):
+        '''
+        Args:
+            margin: The margin added around the landmarks, as a fraction of the size of the region.
+            slack: How close to the border of the region the landmarks may come before it moves, as a fraction
+                   of its size.
+        '''
+
+        self.margin = margin
+        self.slack = slack
+
+        # The (x0, y0, x1, y1) region searched in the next frame, None for the whole frame
+        self.region = None
+
+        # Frames analysed on a crop, and searches of the whole frame
+        self.crops = 0
+        self.searches = 0
+
+    def reset(self):
+        '''
+        This function forgets the region, e.g. when a new video starts, so the next frame is searched whole.
+
+        '''
+
+        self.region = None
+
+    def update(self, landmarks, shape):
+        '''
+        This function moves the region along with the landmarks of the current frame.
+        Args:
+            landmarks: The landmarks of the frame in the pixels of the whole frame, or None if nobody was found.
+            shape: The shape of the frame.
+        '''
+
+        if landmarks is None:
+            self.region = None
+            return
+
+        points = landmarks[landmarks[:, 3] >= MIN_VISIBILITY, :2]
+
+        if len(points) < 2:
+            points = landmarks[:, :2]
+
+        height, width = shape[:2]
+        x0, y0 = np.maximum(points.min(axis=0), 0)
+        x1, y1 = np.minimum(points.max(axis=0), (width, height))
+
+        size = max(x1 - x0, y1 - y0) / (1 - 2 * self.margin)
+
+        if self.region is not None and self._contains(x0, y0, x1, y1, width, height) and \
+                size > REGION_SHRINK * (self.region[2] - self.region[0]):
+            return
+
+        region = square_region((x0 + x1) / 2, (y0 + y1) / 2, max(size, MIN_REGION * min(width, height)), shape)
+
+        if region is not None and (region[2] - region[0]) * (region[3] - region[1]) > MAX_REGION * width * height:
+            region = None
+
+        self.region = region
+
+    def _contains(self, x0, y0, x1, y1, width, height):
+        rx0, ry0, rx1, ry1 = self.region
+        slack = self.slack * (rx1 - rx0)
+
+        # A border of the region on the border of the frame cannot move any further.
+        return (x0 >= rx0 + slack or rx0 == 0) and (y0 >= ry0 + slack or ry0 == 0) and \
+            (x1 <= rx1 - slack or rx1 == width) and (y1 <= ry1 - slack or ry1 == height)
+
+
+def square_region(x, y, size, shape):
+    '''
+    This function places a square region on a frame, shifted or clipped where it would leave the frame.
+    Args:
+        x, y: The centre of the region in pixels.
+        size: The side of the region in pixels.
+        shape: The shape of the frame.
+    Returns:
+        region: The (x0, y0, x1, y1) region in whole pixels, or None if it would cover the whole frame.
+    '''
+
+    height, width = shape[:2]
+
+    x0 = int(min(max(x - size / 2, 0), max(width - size, 0)))
+    y0 = int(min(max(y - size / 2, 0), max(height - size, 0)))
+    x1 = int(min(x0 + size, width))
+    y1 = int(min(y0 + size, height))
+
+    if x1 - x0 == width and y1 - y0 == height:
+        return None
+
+    return x0, y0, x1, y1
+
+
+def detect_pose_region(image, pose, region, out=None, scale=1.0, rgb=False):
+    '''
+    This function performs pose detection on the region of the image the person was in, and on the whole
+    image if it is not known or the person left it.
+    Args:
+        image: The input image with a prominent person whose pose landmarks need to be detected.
+        pose: The pose setup function required to perform the pose detection.
+        region: The RegionTracker of the stream, or None to always analyse the whole image.
+        out: The landmark buffer passed on to detect_pose.
+        scale: The inference downscale factor passed on to detect_pose, applied to the crop.
+        rgb: Whether the image is already in RGB order, passed on to detect_pose.
+    Returns:
+        output_image: The input image.
+        landmarks: The landmarks in the pixels of the whole image, or None if no person is found.
+    '''
+
+    if region is None:
+        return detect_pose(image, pose, display=False, out=out, scale=scale, rgb=rgb)
+
+    landmarks = None
+
+    if region.region is not None:
+        x0, y0, x1, y1 = region.region
+
+        # Mediapipe needs the crop as a contiguous image, a BGR crop is made one by the colour conversion.
+        crop = image[y0:y1, x0:x1]
+        crop = np.ascontiguousarray(crop) if rgb else crop
+
+        _, landmarks = detect_pose(crop, pose, display=False, out=out, scale=scale, rgb=rgb)
+
+        region.crops += 1
+
+        if landmarks is not None:
+            landmarks[:, 0] += x0
+            landmarks[:, 1] += y0
+
+    if landmarks is None:
+        # Nobody in the region, search the whole frame.
+        _, landmarks = detect_pose(image, pose, display=False, out=out, scale=scale, rgb=rgb)
+
+        region.searches += 1
+
+    region.update(landmarks, image.shape)
+
+    return image, landmarks
@@ -0,0 +1,345 @@
+'''
+Streaming results API of the trainer, for wall displays and coach tablets.
+
+The Video and Live screens publish what they show (the posture, the reps, the progress bar, the workout clock
+and the calories) as a stream of compact events on a local socket, so any number of displays can follow a
+session without running inference themselves. Every event is one JSON object on its own line:
+
+    {"type":"frame","source":"live","t":1718000000.123,"exercise":"shoulder_press","label":"CORRECT","reps":3.5,
+     "bar":57.0,"percent":62.1}
+    {"type":"rep","source":"live","t":1718000000.123,"reps":4.0}
+    {"type":"timer","t":1718000001.0,"clock":"00:01:12","sets":1,"goal":3,"calories":4.21}
+    {"type":"results","t":1718000060.0,"reps":24,"sets":3,"goal":3,"calories":12.6,"achieved":true}
+
+The goal and the calories of the timer events are null while the user did not set a goal.
+
+The server runs on an asyncio loop in a thread of its own. Publishing only hands the event to that loop, and
+nothing at all while nobody is connected, so the frame loops never wait for a client. A client which reads
+slower than the events arrive gets only the newest frame and timer events (older ones are replaced while it is
+still busy with the previous write), while rep and results events are queued for it; a client which does not read
+at all for a while is disconnected.
+
+Usage:
+    python "AI trainer_spa.py" --results-port 8765
+    python results_stream.py --port 8765    (prints the events of a running trainer)
+'''
+
+# Importing necessary Libraries
+import argparse
+import asyncio
+import json
+import socket
+import sys
+import threading
+import time
+from collections import deque
+
+# Events which are never replaced by newer ones, queued per client; the oldest are dropped beyond this
+MAX_QUEUED = 256
+
+# Seconds a client may keep its socket buffer full before it is disconnected
+DRAIN_TIMEOUT = 10
+
+# Bytes buffered per client before publishing to it waits for the client to read
+WRITE_BUFFER = 64 * 1024
+
+# Version of the event format, sent in the first line to every client
+PROTOCOL_VERSION = 1
+
+
+def encode(event):
+    '''
+    This function turns an event into the compact line sent to the clients.
+
+    '''
+
+    return (json.dumps(event, separators=(',', ':')) + '\n').encode()
+
+
+class Subscriber:
+    '''
+    This class holds the events waiting to be sent to one client.
+    '''
+
+    def __init__(self, writer):
+        self.writer = writer
+
+        # The newest event of every key, and the events which are never replaced, in order
+        self.latest = {}
+        self.queue = deque(maxlen=MAX_QUEUED)
+        self.dropped = 0
+
+        self.wakeup = asyncio.Event()
+        self.closed = False
+
+    def push(self, line, key=None):
+        '''
+        This function adds an encoded event for the client.
+        Args:
+            line: The encoded event.
+            key: The key of an event which replaces the waiting one of the same key, or None to queue it.
+        '''
+
+        if key is None:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+
+            self.queue.append(line)
+        else:
+            self.latest[key] = line
+
+        self.wakeup.set()
+
+    def take(self):
+        '''
+        This function removes the waiting events.
+        Returns:
+            data: The encoded events, the queued ones first.
+        '''
+
+        lines = list(self.queue) + list(self.latest.values())
+
+        if self.dropped:
+            lines.insert(0, encode({'type': 'dropped', 'events': self.dropped}))
+            self.dropped = 0
+
+        self.queue.clear()
+        self.latest.clear()
+        self.wakeup.clear()
+
+        return b''.join(lines)
+
+
+class ResultPublisher:
+    '''
+    This class serves the results of the trainer to the clients of a local TCP or UNIX socket.
+    '''
+
+    def __init__(self, port=None, path=None, host='127.0.0.1'):
+        '''
+        Args:
+            port: The TCP port, 0 for any free one. Not used if path is given.
+            path: The path of a UNIX socket, on systems which have them.
+            host: The address listened on, only the local machine by default.
+        '''
+
+        if port is None and path is None:
+            raise ValueError('ResultPublisher needs a port or a socket path')
+
+        self.port = port
+        self.path = path
+        self.host = host
+
+        # The address the server listens on once started, (host, port) or the socket path
+        self.address = None
+
+        self._subscribers = set()
+        self._reps = {}
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._error = None
+
+    @property
+    def clients(self):
+        return len(self._subscribers)
+
+    def start(self):
+        '''
+        This function starts the server in a background thread.
+        Returns:
+            publisher: The publisher itself.
+        '''
+
+        started = threading.Event()
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, args=(started,), name='ResultPublisher', daemon=True)
+        self._thread.start()
+
+        started.wait()
+
+        if self._error is not None:
+            raise self._error
+
+        return self
+
+    def _run(self, started):
+        asyncio.set_event_loop(self._loop)
+
+        try:
+            if self.path is not None:
+                self._server = self._loop.run_until_complete(asyncio.start_unix_server(self._serve, self.path))
+                self.address = self.path
+            else:
+                self._server = self._loop.run_until_complete(asyncio.start_server(self._serve, self.host, self.port))
+                self.address = self._server.sockets[0].getsockname()[:2]
+
+        except OSError as error:
+            self._error = error
+            started.set()
+            return
+
+        started.set()
+
+        self._loop.run_forever()
+
+    async def _serve(self, reader, writer):
+        subscriber = Subscriber(writer)
+
+        # A client which does not read makes drain() wait once this much is buffered for it.
+        writer.transport.set_write_buffer_limits(high=WRITE_BUFFER)
+
+        subscriber.push(encode({'type': 'hello', 'version': PROTOCOL_VERSION}))
+        self._subscribers.add(subscriber)
+
+        watcher = asyncio.ensure_future(self._watch(reader, subscriber))
+
+        try:
+            while not subscriber.closed:
+                await subscriber.wakeup.wait()
+
+                data = subscriber.take()
+
+                if data:
+                    writer.write(data)
+
+                    # Events published in the meantime replace each other in the subscriber.
+                    await asyncio.wait_for(writer.drain(), DRAIN_TIMEOUT)
+
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+
+        finally:
+            self._subscribers.discard(subscriber)
+            watcher.cancel()
+            writer.close()
+
+    async def _watch(self, reader, subscriber):
+        # Clients send nothing, the end of their stream means they are gone.
+        try:
+            while await reader.read(4096):
+                pass
+
+        except ConnectionError:
+            pass
+
+        subscriber.closed = True
+        subscriber.wakeup.set()
+
+    def _dispatch(self, event, key):
+        line = encode(event)
+
+        for subscriber in self._subscribers:
+            subscriber.push(line, key)
+
+    def publish(self, event, key=None):
+        '''
+        This function sends an event to every client, from any thread and without waiting for them.
+        Args:
+            event: A dictionary which can be encoded as JSON.
+            key: The key of an event which only matters until the next one of the same key, e.g. the state of a
+                 source, or None for an event every client has to receive.
+        '''
+
+        if not self._subscribers:
+            return
+
+        self._loop.call_soon_threadsafe(self._dispatch, event, key)
+
+    def frame(self, source, counter):
+        '''
+        This function publishes the state of a counter after a frame, and a rep event if its reps increased.
+        Args:
+            source: The name of the screen or camera, e.g. 'video' or 'live'.
+            counter: The RepCounter of the source.
+        '''
+
+        reps = counter.reps
+        previous = self._reps.get(source)
+        self._reps[source] = reps
+
+        if not self._subscribers:
+            return
+
+        now = round(time.time(), 3)
+
+        if previous is not None and reps > previous:
+            self.publish({'type': 'rep', 'source': source, 't': now, 'reps': reps})
+
+        self.publish({'type': 'frame', 'source': source, 't': now, 'exercise': counter.exercise,
+                      'label': counter.label, 'reps': reps, 'bar': round(counter.bar, 1),
+                      'percent': round(counter.percent, 1)}, key=('frame', source))
+
+    def close(self):
+        '''
+        This function disconnects the clients and stops the server.
+
+        '''
+
+        if self._loop is None or not self._loop.is_running():
+            return
+
+        async def shutdown():
+            self._server.close()
+
+            for subscriber in list(self._subscribers):
+                subscriber.closed = True
+                subscriber.wakeup.set()
+
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=5)
+
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+class NullPublisher:
+    '''
+    This class takes the place of a ResultPublisher when the results are not served.
+    '''
+
+    clients = 0
+
+    def publish(self, event, key=None):
+        pass
+
+    def frame(self, source, counter):
+        pass
+
+    def close(self):
+        pass
+
+
+NULL_PUBLISHER = NullPublisher()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Print the results events of a running trainer.')
+    parser.add_argument('--port', type=int, help='TCP port of the trainer on this machine')
+    parser.add_argument('--socket', metavar='PATH', help='UNIX socket of the trainer')
+    args = parser.parse_args(argv)
+
+    if args.socket:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(args.socket)
+    elif args.port:
+        client = socket.create_connection(('127.0.0.1', args.port))
+    else:
+        parser.error('--port or --socket is required')
+
+    try:
+        for line in client.makefile('r', encoding='utf-8'):
+            sys.stdout.write(line)
+            sys.stdout.flush()
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
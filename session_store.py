@@ -0,0 +1,360 @@
+'''
+Local store of the workout sessions of the Live screen.
+
+Every session shown on the Results screen is kept in a SQLite database: who trained, the goal, the reps and the
+duration of every set, the calories and the time of every repetition. The history of a user is read through an
+index on (user, started), so it is as fast with millions of sessions as with a few.
+
+The Tk thread only hands a finished session to SessionStore.save; a writer thread of the store writes the
+sessions saved shortly after each other in one transaction. Sessions still waiting are written before the
+interpreter exits.
+
+Usage:
+    python session_store.py history "Jane Doe"
+    python session_store.py summary "Jane Doe"
+    python session_store.py show 42
+'''
+
+# Importing necessary Libraries
+import argparse
+import atexit
+import os
+import pathlib
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+# Database the sessions are stored in unless another one is given
+DEFAULT_DB = './sessions.db'
+
+# Seconds the writer waits for more sessions before writing a batch, and the largest batch
+BATCH_INTERVAL = 0.5
+MAX_BATCH = 500
+
+# Sessions returned by history unless another limit is given
+HISTORY_LIMIT = 20
+
+# Version of the tables below, kept in PRAGMA user_version
+SCHEMA_VERSION = 1
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    user TEXT NOT NULL,
+    exercise TEXT NOT NULL,
+    started REAL NOT NULL,
+    duration_s REAL NOT NULL,
+    goal_sets INTEGER,
+    goal_reps INTEGER,
+    goal_duration_s REAL,
+    weight_kg REAL,
+    sets INTEGER NOT NULL,
+    reps INTEGER NOT NULL,
+    calories REAL NOT NULL,
+    achieved INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS sessions_by_user ON sessions (user, started);
+
+CREATE TABLE IF NOT EXISTS session_sets (
+    session_id INTEGER NOT NULL REFERENCES sessions (id),
+    set_index INTEGER NOT NULL,
+    reps INTEGER NOT NULL,
+    duration_s REAL NOT NULL,
+    PRIMARY KEY (session_id, set_index)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS session_reps (
+    session_id INTEGER NOT NULL REFERENCES sessions (id),
+    rep_index INTEGER NOT NULL,
+    set_index INTEGER NOT NULL,
+    at_s REAL NOT NULL,
+    PRIMARY KEY (session_id, rep_index)
+) WITHOUT ROWID;
+'''
+
+# Columns of a session, in the order of the INSERT
+SESSION_FIELDS = ('user', 'exercise', 'started', 'duration_s', 'goal_sets', 'goal_reps', 'goal_duration_s',
+                  'weight_kg', 'sets', 'reps', 'calories', 'achieved')
+
+
+class SessionStore:
+    '''
+    This class writes sessions into the database in a background thread and reads the history of the users.
+    '''
+
+    def __init__(self, path=DEFAULT_DB, batch_interval=BATCH_INTERVAL, readonly=False):
+        '''
+        Args:
+            path: The SQLite database file, created with its tables if it does not exist.
+            batch_interval: The seconds the writer waits for more sessions before it writes a batch.
+            readonly: A boolean value that is if set to true only reads an existing database, without a writer
+                      thread, e.g. for the command line.
+        '''
+
+        self.path = path
+        self.batch_interval = batch_interval
+        self.readonly = readonly
+
+        # Every thread reading the history gets a connection of its own.
+        self._local = threading.local()
+        self._writer = None
+
+        try:
+            connection = self._connection()
+            version = connection.execute('PRAGMA user_version').fetchone()[0]
+
+            if version > SCHEMA_VERSION:
+                raise RuntimeError(f'{path} was written by a newer version of the trainer (schema {version})')
+
+            if not readonly:
+                with connection:
+                    connection.executescript(SCHEMA)
+                    connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+        except sqlite3.Error as error:
+            raise OSError(f'Could not open the session database {path}: {error}') from error
+
+        if readonly:
+            return
+
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_batches, name='SessionStore', daemon=True)
+        self._writer.start()
+
+        atexit.register(self.close)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+
+        if connection is None:
+            if self.readonly:
+                # Opening a file which does not exist fails instead of creating it.
+                uri = f'{pathlib.Path(self.path).resolve().as_uri()}?mode=ro'
+                connection = self._local.connection = sqlite3.connect(uri, timeout=30, uri=True)
+            else:
+                connection = self._local.connection = sqlite3.connect(self.path, timeout=30)
+
+                # Readers do not wait for the writer, and a commit does not wait for the disk more than it must.
+                connection.execute('PRAGMA journal_mode = WAL')
+                connection.execute('PRAGMA synchronous = NORMAL')
+
+            connection.row_factory = sqlite3.Row
+
+        return connection
+
+    def save(self, session, sets=(), rep_times=()):
+        '''
+        This function hands a finished session to the writer thread, it returns at once.
+        Args:
+            session: A dictionary with the SESSION_FIELDS of the session. started is a Unix time, achieved a
+                     boolean value, the goal_* fields and weight_kg may be None.
+            sets: The (reps, duration in seconds) of every finished set, in order.
+            rep_times: The (set index, seconds since the start of the session) of every repetition, in order.
+        '''
+
+        self._queue.put((tuple(session[field] for field in SESSION_FIELDS), list(sets), list(rep_times)))
+
+    def _write_batches(self):
+        connection = self._connection()
+        running = True
+
+        while running:
+            item = self._queue.get()
+            batch = []
+
+            # Sessions saved shortly after each other are written in one transaction.
+            deadline = time.monotonic() + self.batch_interval
+
+            while item is not None:
+                batch.append(item)
+
+                if len(batch) == MAX_BATCH:
+                    break
+
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+
+            running = item is not None
+
+            if batch:
+                self._write(connection, batch)
+
+            for _ in range(len(batch) + (not running)):
+                self._queue.task_done()
+
+        connection.close()
+
+    def _write(self, connection, batch):
+        try:
+            with connection:
+                for session, sets, rep_times in batch:
+                    session_id = connection.execute(
+                        f'INSERT INTO sessions ({", ".join(SESSION_FIELDS)}) '
+                        f'VALUES ({", ".join("?" * len(SESSION_FIELDS))})', session).lastrowid
+
+                    connection.executemany('INSERT INTO session_sets VALUES (?, ?, ?, ?)',
+                                           [(session_id, index, reps, duration)
+                                            for index, (reps, duration) in enumerate(sets)])
+                    connection.executemany('INSERT INTO session_reps VALUES (?, ?, ?, ?)',
+                                           [(session_id, index, set_index, at)
+                                            for index, (set_index, at) in enumerate(rep_times)])
+
+        except sqlite3.Error as error:
+            # The trainer keeps running, only these sessions are lost.
+            print(f'Could not store {len(batch)} sessions in {self.path}: {error}', file=sys.stderr)
+
+    def flush(self):
+        '''
+        This function waits until every session saved so far is written.
+
+        '''
+
+        self._queue.join()
+
+    def close(self):
+        '''
+        This function writes the sessions still waiting and stops the writer thread.
+
+        '''
+
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+
+    def history(self, user, limit=HISTORY_LIMIT, before=None):
+        '''
+        This function returns the latest sessions of a user.
+        Args:
+            user: The name of the user.
+            limit: The largest number of sessions returned.
+            before: The last session of the previous page, only the sessions after it are returned. Sessions
+                    started at the same time are ordered by their id.
+        Returns:
+            sessions: A list of dictionaries with the id and SESSION_FIELDS of every session, the newest first.
+        '''
+
+        # The index on (user, started) also holds the id of every row, it gives the order without sorting.
+        started, session_id = (float('inf'), 0) if before is None else (before['started'], before['id'])
+
+        rows = self._connection().execute(
+            f'SELECT id, {", ".join(SESSION_FIELDS)} FROM sessions WHERE user = ? AND (started, id) < (?, ?) '
+            f'ORDER BY started DESC, id DESC LIMIT ?', (user, started, session_id, limit))
+
+        return [dict(row) for row in rows]
+
+    def summary(self, user):
+        '''
+        This function sums up all sessions of a user.
+        Returns:
+            summary: A dictionary with the number of sessions, the total reps, duration and calories, the most reps
+                     of a session and the times of the first and the last session.
+        '''
+
+        row = self._connection().execute(
+            'SELECT COUNT(*) AS sessions, COALESCE(SUM(reps), 0) AS reps, COALESCE(SUM(duration_s), 0) AS duration_s, '
+            'COALESCE(SUM(calories), 0) AS calories, MAX(reps) AS best_reps, MIN(started) AS first, '
+            'MAX(started) AS last FROM sessions WHERE user = ?', (user,)).fetchone()
+
+        return dict(row, user=user)
+
+    def session_sets(self, session_id):
+        '''
+        This function returns the sets of a session, as dictionaries with the set index, reps and duration.
+
+        '''
+
+        rows = self._connection().execute(
+            'SELECT set_index, reps, duration_s FROM session_sets WHERE session_id = ? ORDER BY set_index',
+            (session_id,))
+
+        return [dict(row) for row in rows]
+
+    def session_reps(self, session_id):
+        '''
+        This function returns the repetitions of a session, as dictionaries with the rep index, set index and the
+        seconds since the start of the session.
+
+        '''
+
+        rows = self._connection().execute(
+            'SELECT rep_index, set_index, at_s FROM session_reps WHERE session_id = ? ORDER BY rep_index',
+            (session_id,))
+
+        return [dict(row) for row in rows]
+
+
+class NullSessionStore:
+    '''
+    This class takes the place of a SessionStore when the sessions cannot be stored.
+    '''
+
+    def save(self, session, sets=(), rep_times=()):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+NULL_SESSION_STORE = NullSessionStore()
+
+
+def format_time(timestamp):
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp)) if timestamp else '--'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Show the workout sessions stored by the trainer.')
+    parser.add_argument('--db', default=DEFAULT_DB, help=f'session database (default: {DEFAULT_DB})')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    history = commands.add_parser('history', help='latest sessions of a user')
+    history.add_argument('user')
+    history.add_argument('-n', '--limit', type=int, default=HISTORY_LIMIT, help='number of sessions shown')
+
+    summary = commands.add_parser('summary', help='totals of all sessions of a user')
+    summary.add_argument('user')
+
+    show = commands.add_parser('show', help='sets and repetitions of one session')
+    show.add_argument('session_id', type=int)
+
+    args = parser.parse_args(argv)
+
+    # Looking at the history never creates a database.
+    if not os.path.exists(args.db):
+        parser.error(f'{args.db} does not exist, no session was stored yet')
+
+    store = SessionStore(args.db, readonly=True)
+
+    if args.command == 'history':
+        for session in store.history(args.user, args.limit):
+            print(f'{session["id"]:>8}  {format_time(session["started"])}  {session["exercise"]:<15}'
+                  f'{session["sets"]:>3} sets {session["reps"]:>4} reps {session["duration_s"] / 60:6.1f} min '
+                  f'{session["calories"]:7.1f} kcal{"  achieved" if session["achieved"] else ""}')
+
+    elif args.command == 'summary':
+        totals = store.summary(args.user)
+
+        print(f'{totals["user"]}: {totals["sessions"]} sessions from {format_time(totals["first"])} to '
+              f'{format_time(totals["last"])}, {totals["reps"]} reps (best {totals["best_reps"] or 0}), '
+              f'{totals["duration_s"] / 3600:.1f} h, {totals["calories"]:.0f} kcal')
+
+    else:
+        for row in store.session_sets(args.session_id):
+            print(f'set {row["set_index"] + 1}: {row["reps"]} reps in {row["duration_s"]:.1f} s')
+
+        times = [f'{row["at_s"]:.1f}' for row in store.session_reps(args.session_id)]
+        print(f'reps at (s): {", ".join(times) if times else "--"}')
+
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
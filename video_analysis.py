@@ -0,0 +1,415 @@
+'''
+Headless analysis of recorded exercise videos.
+
+Runs the same pose detection and classification as the Video screen of the trainer, but without any
+Tkinter window, so a clip is processed as fast as it can be decoded and analysed.
+
+Usage:
+    python video_analysis.py asset/vid/Shoulder_Press.mp4 -o shoulder_press.csv
+    python video_analysis.py asset/vid/Shoulder_Press.mp4 --sample-every 3    (fast scan)
+    python video_analysis.py asset/vid/Shoulder_Press.mp4 --record shoulder_press.lmt
+    python video_analysis.py shoulder_press.lmt    (replay a recorded landmark track)
+    python video_analysis.py asset/vid/Shoulder_Press.mp4 --cache    (reuse the landmarks of an earlier run)
+    python video_analysis.py asset/vid/Shoulder_Press.mp4 --smoothing none    (classify the raw landmarks)
+    python video_analysis.py squats.mp4 --exercise squat
+'''
+
+# Importing necessary Libraries
+import argparse
+import csv
+import sys
+import time
+
+import cv2
+
+from adaptive_inference import interpolate_landmarks
+from exercises import DEFAULT_EXERCISE, EXERCISES
+from landmark_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_MB, LandmarkCache
+from landmark_smoothing import DEFAULT_SMOOTHING, SMOOTHING_FILTERS, create_smoother
+from landmark_track import TRACK_EXTENSION, TrackWriter, read_track
+from pose_estimation import (POSE_PROFILES, DEFAULT_PROFILE, RepCounter, pose_settings, create_landmarks, create_pose,
+                             classify_pose)
+from region_tracking import RegionTracker, detect_pose_region
+
+
+def result_fields(exercise=DEFAULT_EXERCISE):
+    '''
+    This function returns the columns written for every analysed frame, which include the angles of the exercise.
+
+    '''
+
+    return ('frame', 'timestamp', *EXERCISES[exercise].angle_names, 'label', 'reps', 'interpolated')
+
+
+# Columns written for every analysed frame of the default exercise
+FIELDS = result_fields()
+
+
+def frame_result(index, timestamp, landmarks, counter, interpolated=False, track=None, smoother=None):
+    '''
+    This function classifies the landmarks of one frame and builds its result row.
+    Args:
+        index: The number of the frame in the video.
+        timestamp: The position of the frame in the video in seconds.
+        landmarks: The landmarks of the frame, or None if no person was detected.
+        counter: The RepCounter of the video.
+        interpolated: A boolean value that is true if the landmarks were interpolated instead of detected.
+        track: A TrackWriter the landmarks of the frame are recorded to, or None.
+        smoother: The smoother of the video from create_smoother, or None to classify the landmarks as they are.
+    Returns:
+        row: A dictionary with the keys listed by result_fields, without the angles if no person was detected.
+    '''
+
+    # The track keeps the landmarks as detected, so it can be replayed with any smoothing.
+    if track is not None:
+        track.write(timestamp, landmarks, interpolated)
+
+    if smoother is not None:
+        landmarks = smoother.filter(landmarks, timestamp)
+
+    row = {'frame': index, 'timestamp': round(timestamp, 3), 'label': None, 'interpolated': int(interpolated)}
+
+    if landmarks is not None:
+        # Perform the Pose Classification.
+        _, label = classify_pose(landmarks, None, counter, display=False, draw=False)
+
+        row.update(counter.angles)
+        row['label'] = label
+
+    row['reps'] = counter.reps
+
+    return row
+
+
+def analyse_video(path, pose=None, flip=True, counter=None, settings=None, sample_every=1, track=None,
+                  smoothing=DEFAULT_SMOOTHING):
+    '''
+    This function analyses a recorded video frame by frame without any GUI.
+    Args:
+        path: The path of the video file to be analysed.
+        pose: The pose setup function required to perform the pose detection. A new one is created if not given.
+        flip: A boolean value that is if set to true mirrors every frame the same way the Video screen does.
+        counter: The RepCounter updated while analysing, which also decides the exercise. A new one counting the
+                 default exercise is created if not given.
+        settings: The pose settings from pose_settings, used to create the pose and for the inference scale.
+        sample_every: Fast scan mode: only every Nth frame goes through the model and the landmarks of the frames
+                      in between are interpolated, so every frame is still classified and no rep is missed.
+        track: A TrackWriter the landmarks of every frame are recorded to, or None.
+        smoothing: The name of the filter smoothing the landmarks before the classification, see SMOOTHING_FILTERS.
+    Returns:
+        A generator yielding one dictionary per frame with the keys listed by result_fields. The label is None
+        and the angles are missing for frames in which no person was detected.
+    '''
+
+    if sample_every < 1:
+        raise ValueError(f'sample_every must be at least 1, got {sample_every}')
+
+    cap = cv2.VideoCapture(path)
+
+    if not cap.isOpened():
+        raise IOError(f'Could not open video: {path}')
+
+    if settings is None:
+        settings = pose_settings()
+
+    owns_pose = pose is None
+
+    if owns_pose:
+        pose = create_pose(settings)
+    else:
+        # A reused Pose still tracks the person of the previous video, so the result would depend on it.
+        pose.reset()
+
+    # Every video starts with a fresh repetition counter.
+    if counter is None:
+        counter = RepCounter()
+
+    smoother = create_smoother(smoothing)
+
+    # The model only sees the region around the person once they are found.
+    region = RegionTracker() if settings['roi'] else None
+
+    # Landmark buffer filled in place for every frame, and a copy of the last analysed frame's landmarks
+    buffer = create_landmarks()
+    previous = create_landmarks()
+    has_previous = False
+
+    # Frames read since the last analysed frame, as (index, timestamp)
+    skipped = []
+
+    try:
+        index = 0
+
+        while cap.grab():
+            timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+
+            # Skipped frames are only grabbed, not converted into images.
+            if index % sample_every != 0:
+                skipped.append((index, timestamp))
+                index += 1
+                continue
+
+            ok, frame = cap.retrieve()
+
+            if not ok:
+                break
+
+            if flip:
+                frame = cv2.flip(frame, 1)
+
+            _, landmarks = detect_pose_region(frame, pose, region, out=buffer, scale=settings['scale'])
+
+            # Fill in the frames between the previous analysed frame and this one.
+            if skipped:
+                if has_previous and landmarks is not None:
+                    filled = interpolate_landmarks(previous, landmarks, len(skipped))
+                else:
+                    filled = [None] * len(skipped)
+
+                for (skipped_index, skipped_timestamp), skipped_landmarks in zip(skipped, filled):
+                    yield frame_result(skipped_index, skipped_timestamp, skipped_landmarks, counter, True, track,
+                                       smoother)
+
+                skipped.clear()
+
+            yield frame_result(index, timestamp, landmarks, counter, track=track, smoother=smoother)
+
+            has_previous = landmarks is not None
+
+            if has_previous:
+                previous[:] = landmarks
+
+            index += 1
+
+        # Frames after the last analysed one have nothing to be interpolated towards.
+        for skipped_index, skipped_timestamp in skipped:
+            yield frame_result(skipped_index, skipped_timestamp, None, counter, True, track, smoother)
+
+    finally:
+        cap.release()
+
+        if owns_pose:
+            pose.close()
+
+
+def analysis_mode(sample_every=1):
+    '''
+    This function names the way the frames of a video are analysed, as part of the landmark cache key.
+
+    '''
+
+    return 'every frame' if sample_every == 1 else f'every {sample_every} frames'
+
+
+def analyse_video_cached(path, cache, pose=None, flip=True, counter=None, settings=None, sample_every=1,
+                         smoothing=DEFAULT_SMOOTHING):
+    '''
+    This function analyses a video like analyse_video, but replays its landmarks from a LandmarkCache if the same
+    file was analysed the same way before, and adds them to the cache otherwise.
+    Args:
+        path: The path of the video file to be analysed.
+        cache: The LandmarkCache.
+        pose, flip, counter, settings, sample_every, smoothing: See analyse_video.
+    Returns:
+        A generator yielding one dictionary per frame, as analyse_video does.
+    '''
+
+    if settings is None:
+        settings = pose_settings()
+
+    # The smoothing is not part of the key, the entries hold the landmarks as detected.
+    key = cache.key(path, settings, flip, analysis_mode(sample_every))
+    cached = cache.lookup(key)
+
+    if cached is not None:
+        yield from replay_track(cached, counter, smoothing)
+        return
+
+    entry = cache.begin(key, track_metadata(path, settings, flip))
+
+    try:
+        yield from analyse_video(path, pose, flip, counter, settings, sample_every, track=entry, smoothing=smoothing)
+    except BaseException:
+        # Also when the caller stops early, only complete videos are cached.
+        entry.discard()
+        raise
+
+    entry.commit()
+
+
+def track_metadata(path, settings, flip=True):
+    '''
+    This function describes the session of a landmark track, stored in the header of the track file.
+    Args:
+        path: The path of the analysed video, or the name of the camera.
+        settings: The pose settings the landmarks were detected with.
+        flip: A boolean value that is true if the frames were mirrored before the detection.
+    Returns:
+        metadata: A JSON serializable dictionary.
+    '''
+
+    return {'source': path, 'settings': settings, 'flip': flip, 'created': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def replay_track(path, counter=None, smoothing=DEFAULT_SMOOTHING):
+    '''
+    This function classifies the frames of a recorded landmark track without decoding any video or running the
+    pose model, e.g. to try out new angle thresholds of classify_pose on an archive of recordings.
+    Args:
+        path: The path of the track file.
+        counter: The RepCounter updated while replaying, which also decides the exercise. A new one counting the
+                 default exercise is created if not given.
+        smoothing: The name of the filter smoothing the landmarks before the classification, see SMOOTHING_FILTERS.
+    Returns:
+        A generator yielding one dictionary per frame, as analyse_video does.
+    '''
+
+    _, records = read_track(path)
+
+    if counter is None:
+        counter = RepCounter()
+
+    smoother = create_smoother(smoothing)
+
+    for index, (timestamp, landmarks, detected, interpolated) in enumerate(zip(
+            records['timestamp'].tolist(), records['landmarks'], records['detected'].tolist(),
+            records['interpolated'].tolist())):
+        yield frame_result(index, timestamp, landmarks if detected else None, counter, interpolated,
+                           smoother=smoother)
+
+
+def write_results(rows, output, fields=FIELDS):
+    '''
+    This function writes the per-frame results of analyse_video as CSV.
+    Args:
+        rows: An iterable of per-frame result dictionaries.
+        output: A writable text file object.
+        fields: The columns, from result_fields of the analysed exercise.
+    Returns:
+        count: The number of frames written.
+    '''
+
+    writer = csv.DictWriter(output, fieldnames=fields)
+    writer.writeheader()
+
+    count = 0
+
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+
+    return count
+
+
+def add_pose_arguments(parser, roi=True):
+    '''
+    This function adds the options choosing the pose profile, the landmark smoothing and the exercise to a command
+    line parser.
+    Args:
+        parser: The argparse parser.
+        roi: A boolean value that is if set to false leaves out --roi, for the tools which choose the region of the
+             model themselves.
+    '''
+
+    parser.add_argument('--profile', choices=list(POSE_PROFILES), default=DEFAULT_PROFILE,
+                        help=f'pose model profile (default: {DEFAULT_PROFILE})')
+    parser.add_argument('--scale', type=float, help='inference downscale factor, overrides the profile')
+    parser.add_argument('--tracking-confidence', type=float, help='minimum tracking confidence, overrides the profile')
+    if roi:
+        parser.add_argument('--roi', action=argparse.BooleanOptionalAction,
+                            help='run the model on the region around the person only, overrides the profile')
+    parser.add_argument('--smoothing', choices=list(SMOOTHING_FILTERS), default=DEFAULT_SMOOTHING,
+                        help=f'filter smoothing the landmarks before the classification (default: {DEFAULT_SMOOTHING})')
+    parser.add_argument('--exercise', choices=list(EXERCISES), default=DEFAULT_EXERCISE,
+                        help=f'exercise whose repetitions are counted (default: {DEFAULT_EXERCISE})')
+
+
+def add_cache_arguments(parser):
+    '''
+    This function adds the options of the landmark cache to a command line parser.
+
+    '''
+
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_CACHE_DIR, metavar='DIR',
+                        help=f'reuse the landmarks of videos analysed before (DIR defaults to {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--cache-size', type=float, default=DEFAULT_MAX_MB, metavar='MB',
+                        help=f'size of the landmark cache (default: {DEFAULT_MAX_MB} MB)')
+
+
+def cache_from_arguments(args):
+    '''
+    This function opens the landmark cache chosen with the options added by add_cache_arguments.
+    Returns:
+        cache: The LandmarkCache, or None if no cache is used.
+    '''
+
+    return LandmarkCache(args.cache, args.cache_size) if args.cache else None
+
+
+def settings_from_arguments(args):
+    '''
+    This function builds the pose settings from the options added by add_pose_arguments.
+
+    '''
+
+    return pose_settings(args.profile, scale=args.scale, min_tracking_confidence=args.tracking_confidence,
+                         roi=getattr(args, 'roi', None))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analyse a recorded exercise video without the GUI.')
+    parser.add_argument('video', help=f'path of the video file to analyse, or of a {TRACK_EXTENSION} track to replay')
+    parser.add_argument('-o', '--output', help='CSV file for the per-frame results (default: standard output)')
+    parser.add_argument('--no-flip', action='store_true', help='do not mirror the frames before analysis')
+    parser.add_argument('--sample-every', type=int, default=1, metavar='N',
+                        help='fast scan: run the pose model on every Nth frame only and interpolate the others')
+    parser.add_argument('--record', metavar='TRACK', help='also record the landmarks of every frame to this track file')
+    add_cache_arguments(parser)
+    add_pose_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.cache and args.record:
+        parser.error('--record cannot be combined with --cache, the cache entries are landmark tracks already')
+
+    settings = settings_from_arguments(args)
+    cache = cache_from_arguments(args)
+
+    start = time.perf_counter()
+
+    counter = RepCounter(args.exercise)
+    track = None
+
+    if args.video.endswith(TRACK_EXTENSION):
+        # No video is decoded and no model runs, the recorded landmarks are classified again.
+        rows = replay_track(args.video, counter=counter, smoothing=args.smoothing)
+        source = 'replayed track'
+    elif cache is not None:
+        rows = analyse_video_cached(args.video, cache, flip=not args.no_flip, counter=counter, settings=settings,
+                                    sample_every=args.sample_every, smoothing=args.smoothing)
+        source = f'{settings["profile"]} profile, landmark cache'
+    else:
+        if args.record:
+            track = TrackWriter(args.record, track_metadata(args.video, settings, not args.no_flip))
+
+        rows = analyse_video(args.video, flip=not args.no_flip, counter=counter, settings=settings,
+                             sample_every=args.sample_every, track=track, smoothing=args.smoothing)
+        source = f'{settings["profile"]} profile'
+
+    try:
+        if args.output:
+            with open(args.output, 'w', newline='') as output:
+                count = write_results(rows, output, result_fields(args.exercise))
+        else:
+            count = write_results(rows, sys.stdout, result_fields(args.exercise))
+    finally:
+        if track is not None:
+            track.close()
+
+    elapsed = time.perf_counter() - start
+
+    print(f'{args.video}: {count} frames, {int(counter.reps)} reps, '
+          f'{count / elapsed if elapsed else 0:.1f} FPS ({source})', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()